@@ -1,4 +1,6 @@
 # app/config.py
+from typing import Optional
+
 from pydantic_settings import BaseSettings  # instead of pydantic
 
 
@@ -9,10 +11,100 @@ class Settings(BaseSettings):
     jwt_algorithm: str
     jwt_expire_minutes: int
 
+    # pbkdf2_sha256 iterations for new hashes; weaker stored hashes are
+    # upgraded on login. Hashing runs on password_hash_workers threads.
+    password_hash_rounds: int = 29000
+    password_hash_workers: int = 4
+
+    # get_current_user cache of resolved users (0 disables it)
+    principal_cache_ttl_seconds: float = 30.0
+    principal_cache_max_entries: int = 10000
+
     email_user: str
     email_pass: str
     smtp_server: str = "smtp.office365.com"
     smtp_port: int = 587
+    smtp_starttls: bool = True
+    smtp_timeout: float = 30.0
+
+    # Outgoing mail queue (app/services/mail_dispatcher.py)
+    mail_pool_size: int = 2
+    mail_queue_size: int = 1000
+    mail_batch_size: int = 20
+    mail_max_attempts: int = 4
+    mail_retry_base_seconds: float = 2.0
+    # An idle pooled SMTP connection is NOOP-checked before its next send
+    mail_noop_after_idle_seconds: float = 30.0
+    # Send OTP mail through the durable task queue instead of straight to the
+    # in-process mail queue (needs task workers, see below)
+    mail_via_task_queue: bool = False
+
+    # Durable task queue (app/services/task_queue.py)
+    task_visibility_seconds: float = 60.0
+    task_max_attempts: int = 5
+    task_retry_base_seconds: float = 5.0
+    task_poll_seconds: float = 1.0
+    task_worker_concurrency: int = 4
+    # Run that many task slots inside each API process (0 = separate workers only)
+    task_workers_in_app: int = 0
+    task_retention_seconds: int = 7 * 24 * 3600
+
+    # Mongo client. The pool is per process: size it to the concurrency one
+    # API worker needs, times the number of workers, within the server's limits.
+    mongo_max_pool_size: int = 100
+    mongo_min_pool_size: int = 0
+    mongo_max_idle_time_ms: Optional[int] = None
+    # Longest an operation waits for a free pooled connection. pymongo's own
+    # default (None) waits forever; with a limit, an exhausted pool fails the
+    # operation with WaitQueueTimeoutError instead of queueing it
+    mongo_wait_queue_timeout_ms: Optional[int] = 10000
+    mongo_connect_timeout_ms: int = 10000
+    mongo_server_selection_timeout_ms: int = 10000
+    mongo_socket_timeout_ms: Optional[int] = None
+    # Wire compression in order of preference, e.g. "zstd,zlib" once
+    # backports.zstd (pymongo[zstd]) is installed
+    mongo_compressors: str = "zlib"
+    mongo_read_preference: str = "primary"
+
+    # Fail startup when a registered query shape would COLLSCAN (test/CI mode)
+    index_check_on_startup: bool = False
+
+    # In-process cache of projected loan documents (per worker)
+    loan_cache_max_entries: int = 512
+    loan_cache_max_mb: float = 256.0
+
+    # Worker processes for CPU-bound cleaning (0 = one per CPU). Request
+    # bodies smaller than process_offload_min_bytes are cleaned inline.
+    process_pool_workers: int = 0
+    process_offload_min_bytes: int = 256 * 1024
+    process_task_timeout: float = 120.0
+    # /bulk-clean-json: loans per insert_many batch, and per request
+    bulk_insert_batch: int = 50
+    bulk_max_loans: int = 1000
+
+    # Rule registry (requirements.yaml)
+    requirements_file: str = "requirements.yaml"
+    rules_poll_seconds: float = 2.0
+
+    # MCP server connection
+    mcp_server_url: str = "http://localhost:8000/mcp"
+    mcp_call_timeout: float = 300.0
+    mcp_connect_timeout: float = 10.0
+    mcp_failure_threshold: int = 5
+    mcp_reset_timeout: float = 30.0
+
+    # LLM token ledger (app/services/token_ledger.py): prices used for the
+    # cost column, and how long entries are kept
+    llm_prompt_cost_per_1k: float = 0.0
+    llm_completion_cost_per_1k: float = 0.0
+    llm_usage_retention_seconds: int = 180 * 24 * 3600
+
+    # OpenTelemetry: "none", "file" (JSON lines), "otlp" or "console".
+    # sample ratio applies to new traces; the MCP server follows our decision.
+    tracing_exporter: str = "none"
+    tracing_file: str = "traces.jsonl"
+    tracing_sample_ratio: float = 1.0
+    tracing_otlp_endpoint: str = ""
 
     class Config:
         env_file = ".env"
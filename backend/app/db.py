@@ -1,16 +1,134 @@
+import logging
+
 from motor.motor_asyncio import AsyncIOMotorClient
 from app.config import settings
-from pymongo import ASCENDING
+from pymongo import ASCENDING, DESCENDING
+
+from app.utils.metrics import mongo_command_metrics
+from app.utils.pool_telemetry import PoolTelemetry
+
+logger = logging.getLogger(__name__)
+
+pool_telemetry = PoolTelemetry(max_pool_size=settings.mongo_max_pool_size)
+
+
+def client_options() -> dict:
+    """Pool, timeout, compression and read-preference options from Settings."""
+    return {
+        "maxPoolSize": settings.mongo_max_pool_size,
+        "minPoolSize": settings.mongo_min_pool_size,
+        "maxIdleTimeMS": settings.mongo_max_idle_time_ms,
+        "waitQueueTimeoutMS": settings.mongo_wait_queue_timeout_ms,
+        "connectTimeoutMS": settings.mongo_connect_timeout_ms,
+        "serverSelectionTimeoutMS": settings.mongo_server_selection_timeout_ms,
+        "socketTimeoutMS": settings.mongo_socket_timeout_ms,
+        "readPreference": settings.mongo_read_preference,
+        # pymongo warns about and skips codecs that are not installed
+        "compressors": settings.mongo_compressors,
+        "event_listeners": [pool_telemetry, mongo_command_metrics],
+    }
 
 
-client = AsyncIOMotorClient(settings.db_url)
+client = AsyncIOMotorClient(settings.db_url, **client_options())
 db = client[settings.db_name]
 
-# Create index on username + loanID for fast lookups
+# OTP records are kept this long past expiresAt, so a late attempt still
+# gets "expired" instead of "not found", then MongoDB's TTL monitor drops them.
+VERIFICATION_CODE_RETENTION_SECONDS = 3600
+
+# ---------------------------------------------------------------------
+# Index specs: (collection, keys, options).
+# Every query in the code base should be served by one of these; see
+# app/utils/index_advisor.py for the registry of query shapes.
+# ---------------------------------------------------------------------
+INDEXES = [
+    # Every loan read and write filters on (loanID, email); `version` makes the
+    # loan cache's version probe a covered query
+    ("uploadedData", [("loanID", ASCENDING), ("email", ASCENDING), ("version", ASCENDING)],
+     {"name": "loanID_email_version"}),
+    ("uploadedData", [("username", ASCENDING), ("loanID", ASCENDING)],
+     {"name": "username_loanID", "unique": True}),
+    # Login, signup, password update, current-user lookup
+    ("users", [("email", ASCENDING)], {"name": "email", "unique": True}),
+    # Admin user list: filter by status and/or type, keyset on _id; also counts
+    ("users", [("status", ASCENDING), ("_id", ASCENDING)], {"name": "status_id"}),
+    ("users", [("type", ASCENDING), ("_id", ASCENDING)], {"name": "type_id"}),
+    ("users", [("status", ASCENDING), ("type", ASCENDING), ("_id", ASCENDING)], {"name": "status_type_id"}),
+    # OTP upsert / verify (one live code per email)
+    ("verification_codes", [("email", ASCENDING)], {"name": "email", "unique": True}),
+    ("verification_codes", [("expiresAt", ASCENDING)],
+     {"name": "expiresAt_ttl", "expireAfterSeconds": VERIFICATION_CODE_RETENTION_SECONDS}),
+    # /uploaded-data/by-email: summary upserts and keyset pages in either sort order
+    ("loanSummaries", [("email", ASCENDING), ("loanID", ASCENDING)],
+     {"name": "email_loanID", "unique": True}),
+    ("loanSummaries", [("email", ASCENDING), ("updated_at", ASCENDING), ("loanID", ASCENDING)],
+     {"name": "email_updated_at_loanID"}),
+    # Raw payload chunks, read in order by get_blob()
+    ("rawBlobChunks", [("blob", ASCENDING), ("n", ASCENDING)], {"name": "blob_n"}),
+    ("auditLogs", [("loanID", ASCENDING), ("timestamp", DESCENDING)], {"name": "loanID_timestamp"}),
+    # Task queue claim (status in queued/running, oldest available_at first);
+    # finished tasks expire after task_retention_seconds
+    ("tasks", [("status", ASCENDING), ("available_at", ASCENDING)], {"name": "status_available_at"}),
+    ("tasks", [("finished_at", ASCENDING)],
+     {"name": "finished_at_ttl", "expireAfterSeconds": settings.task_retention_seconds}),
+    # LLM token ledger: per-loan and per-user summaries; entries expire after
+    # llm_usage_retention_seconds
+    ("llmUsage", [("loanID", ASCENDING), ("email", ASCENDING), ("created_at", ASCENDING)],
+     {"name": "loanID_email_created_at"}),
+    ("llmUsage", [("email", ASCENDING), ("created_at", ASCENDING)], {"name": "email_created_at"}),
+    ("llmUsage", [("created_at", ASCENDING)],
+     {"name": "created_at_ttl", "expireAfterSeconds": settings.llm_usage_retention_seconds}),
+]
+
+
+async def ensure_indexes() -> dict:
+    """
+    Create any missing index from INDEXES, then verify it exists.
+    A failure (e.g. duplicates blocking a unique index) is logged and
+    reported rather than stopping the app. An existing index whose keys or
+    uniqueness differ from the spec is reported as a mismatch; it has to
+    be dropped by hand before the spec can be applied.
+    """
+    report = {"created": [], "present": [], "mismatched": [], "failed": []}
+    for collection, keys, options in INDEXES:
+        name = f"{collection}.{options['name']}"
+        unique = options.get("unique", False)
+        try:
+            existing = await db[collection].index_information()
+            info = existing.get(options["name"])
+            if info is None:
+                # Same keys under another name (e.g. created by hand) also counts
+                info = next((i for i in existing.values() if list(i["key"]) == keys), None)
+            if info is not None:
+                if list(info["key"]) != keys or info.get("unique", False) != unique:
+                    logger.error(
+                        f"Index {name} differs from its spec: keys={list(info['key'])} "
+                        f"unique={info.get('unique', False)}, expected keys={keys} unique={unique}")
+                    report["mismatched"].append(name)
+                else:
+                    report["present"].append(name)
+                continue
+            await db[collection].create_index(keys, **options)
+            report["created"].append(name)
+        except Exception as e:
+            logger.error(f"Could not create index {name}: {e}")
+            report["failed"].append(name)
+
+    for name in list(report["created"]):
+        collection, index = name.split(".", 1)
+        if index not in await db[collection].index_information():
+            logger.error(f"Index {name} missing after creation")
+            report["created"].remove(name)
+            report["failed"].append(name)
+
+    logger.info(
+        f"Indexes: {len(report['created'])} created, {len(report['present'])} present, "
+        f"{len(report['mismatched'])} mismatched, {len(report['failed'])} failed")
+    return report
 
 
 async def init_db():
-    await db["uploadedData"].create_index([("username", ASCENDING), ("loanID", ASCENDING)], unique=True)
+    return await ensure_indexes()
 
 
 def get_db():
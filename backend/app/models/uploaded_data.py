@@ -1,10 +1,15 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from pydantic import BaseModel, EmailStr, Field
+from typing import Optional, List, Literal
 from datetime import datetime
 
 
 class EmailRequest(BaseModel):
     email: EmailStr
+    # Keyset pagination; without `limit` every loan is returned
+    limit: Optional[int] = Field(None, ge=1, le=1000)
+    cursor: Optional[str] = None   # X-Next-Cursor of the previous page
+    sort: Literal["updated_at", "loanID"] = "updated_at"
+    order: Literal["asc", "desc"] = "desc"
 
 
 class UploadedDataOut(BaseModel):
@@ -1,5 +1,8 @@
-from fastapi import APIRouter
-from app.services.admin_service import get_all_users, update_user_status, delete_user
+from typing import Optional
+from fastapi import APIRouter, Query
+from app.services.admin_service import get_all_users, count_users, update_user_status, delete_user, get_rules, reload_rules
+from app.services.token_ledger import usage_summary
+from app.db import db
 from pydantic import BaseModel
 
 router = APIRouter(prefix="/admin", tags=["admin"])
@@ -10,12 +13,25 @@ class UpdateStatusRequest(BaseModel):
 
 
 @router.get("/users")
-async def get_users():
+async def get_users(
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    type: Optional[str] = None,
+):
     """
-    Get all users from the database.
-    Returns list of users with their details.
+    Get one page of users, optionally filtered by status and type.
+    Returns the users and `next_cursor` for the following page.
     """
-    return await get_all_users()
+    return await get_all_users(limit=limit, cursor=cursor, status=status, user_type=type)
+
+
+@router.get("/users/count")
+async def get_users_count(status: Optional[str] = None, type: Optional[str] = None):
+    """
+    Count users, optionally filtered by status and type.
+    """
+    return await count_users(status=status, user_type=type)
 
 
 @router.put("/users/{user_id}/status")
@@ -36,3 +52,36 @@ async def delete_user_endpoint(user_id: str):
     """
     return await delete_user(user_id)
 
+
+@router.get("/rules")
+async def get_rules_endpoint():
+    """
+    Get the active rule set, its version and per-rule ids.
+    """
+    return get_rules()
+
+
+@router.post("/rules/reload")
+async def reload_rules_endpoint():
+    """
+    Reload requirements.yaml without restarting the worker.
+    Returns the new version and the rule ids that were added or removed.
+    """
+    return reload_rules()
+
+
+@router.get("/llm-usage")
+async def get_llm_usage(
+    group_by: str = Query("loan"),
+    loanID: Optional[str] = None,
+    email: Optional[str] = None,
+    tool: Optional[str] = None,
+    days: Optional[float] = Query(None, gt=0),
+    limit: int = Query(50, ge=1, le=500),
+):
+    """
+    LLM token usage per loan, rule, user, tool or model (`group_by`), most
+    tokens first, optionally limited to a loan, user, tool or the last `days`.
+    """
+    return await usage_summary(db, group_by=group_by, loanID=loanID, email=email,
+                               tool=tool, days=days, limit=limit)
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, BackgroundTasks, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from app.models.user import UserCreate, UserLogin, Token, SendCodeRequest, VerifyCodeRequest, SignupRequest, CheckEmailRequest, RefreshTokenRequest, UpdatePasswordRequest
 from app.services.auth_service import register_user, login_user, signup_user, check_email_exists
 from app.services.send_code import send_verification_code, verify_otp_code
@@ -32,12 +32,12 @@ async def read_me(current_user: dict = Depends(get_current_user)):
 
 
 @router.post('/send-code')
-async def send_code(user: SendCodeRequest, background_tasks: BackgroundTasks):
+async def send_code(user: SendCodeRequest):
     """
-    Quickly persist OTP and schedule email send in background.
+    Quickly persist OTP and queue the email for sending.
     Returns immediately with queued response.
     """
-    result = send_verification_code(user, background_tasks=background_tasks)
+    result = await send_verification_code(user)
     return result
 
 
@@ -1,5 +1,5 @@
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from app.models.uploaded_data import EmailRequest, UploadedDataOut
 from app.services.uploaded_data import get_uploaded_data_by_email
 from app.db import get_db
@@ -8,8 +8,14 @@ router = APIRouter(prefix="/uploaded-data", tags=["Uploaded Data"])
 
 
 @router.post("/by-email", response_model=List[UploadedDataOut])
-async def fetch_uploaded_data(request: EmailRequest, db=Depends(get_db)):
-    results = await get_uploaded_data_by_email(db, request.email)
-    if not results:
+async def fetch_uploaded_data(request: EmailRequest, response: Response, db=Depends(get_db)):
+    results, next_cursor = await get_uploaded_data_by_email(
+        db, request.email,
+        limit=request.limit, cursor=request.cursor,
+        sort=request.sort, order=request.order,
+    )
+    if not results and not request.cursor:
         raise HTTPException(status_code=404, detail="No records found for this email")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return results
@@ -1,25 +1,103 @@
 from app.db import db
+from app.services.rule_registry import rule_registry, RuleRegistryError
+from app.utils.deps import evict_principal
 from fastapi import HTTPException
 from bson import ObjectId
 from datetime import datetime
+from typing import Optional
 
 
-async def get_all_users():
+VALID_STATUSES = ["pending", "active", "inactive"]
+VALID_TYPES = ["company", "individual"]
+
+# Only what the admin table shows; never the password hash
+USER_LIST_PROJECTION = {
+    "email": 1,
+    "username": 1,
+    "role": 1,
+    "type": 1,
+    "status": 1,
+    "created_at": 1,
+    "approvedOn": 1,
+    "individualInfo.firstName": 1,
+    "individualInfo.lastName": 1,
+    "individualInfo.email": 1,
+    "individualInfo.phone": 1,
+    "companyInfo.companyName": 1,
+    "companyInfo.companyEmail": 1,
+    "companyInfo.companyPhone": 1,
+    "companyInfo.companySize": 1,
+}
+
+
+def _user_filter(status: Optional[str], user_type: Optional[str]) -> dict:
+    query = {}
+    if status is not None:
+        if status not in VALID_STATUSES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid status. Must be one of: {', '.join(VALID_STATUSES)}"
+            )
+        query["status"] = status
+    if user_type is not None:
+        if user_type not in VALID_TYPES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid type. Must be one of: {', '.join(VALID_TYPES)}"
+            )
+        query["type"] = user_type
+    return query
+
+
+async def get_all_users(
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    user_type: Optional[str] = None,
+):
     """
-    Fetch all users from the database.
-    Returns list of users with their details.
+    Fetch one page of users, oldest first, optionally filtered by status/type.
+    Pass the returned next_cursor back to get the following page; it is None
+    on the last page.
     """
+    query = _user_filter(status, user_type)
+    if cursor:
+        try:
+            query["_id"] = {"$gt": ObjectId(cursor)}
+        except Exception:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
     try:
-        users = await db["users"].find({}).to_list(length=None)
-        
-        # Convert ObjectId to string for JSON serialization
-        for user in users:
-            user["_id"] = str(user["_id"])
-            
-        return {"users": users}
+        # One extra row tells us whether another page exists
+        users = await db["users"].find(query, USER_LIST_PROJECTION) \
+            .sort("_id", 1).limit(limit + 1).to_list(length=limit + 1)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching users: {str(e)}")
 
+    next_cursor = None
+    if len(users) > limit:
+        users = users[:limit]
+        next_cursor = str(users[-1]["_id"])
+
+    # Convert ObjectId to string for JSON serialization
+    for user in users:
+        user["_id"] = str(user["_id"])
+
+    return {"users": users, "next_cursor": next_cursor}
+
+
+async def count_users(status: Optional[str] = None, user_type: Optional[str] = None):
+    """
+    Number of users matching the filters, answered from indexes.
+    """
+    query = _user_filter(status, user_type)
+    if query:
+        count = await db["users"].count_documents(query)
+    else:
+        # Collection metadata; no scan at all
+        count = await db["users"].estimated_document_count()
+    return {"count": count}
+
 
 async def update_user_status(user_id: str, new_status: str):
     """
@@ -27,11 +105,10 @@ async def update_user_status(user_id: str, new_status: str):
     Also updates the approvedOn timestamp if status is changed to active or inactive.
     """
     # Validate status
-    valid_statuses = ["pending", "active", "inactive"]
-    if new_status not in valid_statuses:
+    if new_status not in VALID_STATUSES:
         raise HTTPException(
             status_code=400, 
-            detail=f"Invalid status. Must be one of: {', '.join(valid_statuses)}"
+            detail=f"Invalid status. Must be one of: {', '.join(VALID_STATUSES)}"
         )
     
     try:
@@ -63,6 +140,7 @@ async def update_user_status(user_id: str, new_status: str):
     
     if result.matched_count == 0:
         raise HTTPException(status_code=400, detail="Failed to update user status")
+    evict_principal(user_id)
     
     return {
         "message": f"User status updated to {new_status}",
@@ -88,6 +166,7 @@ async def delete_user(user_id: str):
     
     # Delete user
     result = await db["users"].delete_one({"_id": object_id})
+    evict_principal(user_id)
     
     if result.deleted_count == 0:
         # If we passed the find_one check but failed here, it might be a race condition.
@@ -99,3 +178,20 @@ async def delete_user(user_id: str):
         "user_id": user_id
     }
 
+
+def get_rules():
+    """
+    Return the active rule set with per-rule ids and its version hash.
+    """
+    return rule_registry.describe()
+
+
+def reload_rules():
+    """
+    Re-read requirements.yaml and swap it in atomically.
+    A file that fails validation leaves the current version active.
+    """
+    try:
+        return rule_registry.reload()
+    except RuleRegistryError as e:
+        raise HTTPException(status_code=422, detail=str(e))
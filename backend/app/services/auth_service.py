@@ -1,5 +1,5 @@
 from app.db import db
-from app.utils.security import hash_password, verify_password, create_access_token, create_refresh_token
+from app.utils.security import hash_password_async, verify_and_update_password, create_access_token, create_refresh_token
 from app.models.user import UserCreate, UserLogin, SignupRequest
 from datetime import datetime
 from fastapi import HTTPException
@@ -10,7 +10,7 @@ async def register_user(user: UserCreate):
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    hashed = hash_password(user.password)
+    hashed = await hash_password_async(user.password)
     now = datetime.utcnow()
 
     new_user = {
@@ -31,8 +31,15 @@ async def login_user(user: UserLogin):
     if not db_user:
         raise HTTPException(status_code=400, detail="Invalid credentials")
 
-    if not verify_password(user.password, db_user["password"]):
+    valid, new_hash = await verify_and_update_password(user.password, db_user["password"])
+    if not valid:
         raise HTTPException(status_code=400, detail="Invalid credentials")
+    if new_hash:
+        # Only replace the hash we verified, never a password changed meanwhile
+        await db["users"].update_one(
+            {"_id": db_user["_id"], "password": db_user["password"]},
+            {"$set": {"password": new_hash}},
+        )
 
     token_data = {"sub": str(db_user["_id"]), "email": db_user["email"]}
     access_token = create_access_token(token_data)
@@ -63,7 +70,7 @@ async def signup_user(signup_data: SignupRequest):
 
     # Hash temporary password
     temp_password = "Test@123"
-    hashed_password = hash_password(temp_password)
+    hashed_password = await hash_password_async(temp_password)
     
     now = datetime.utcnow()
 
@@ -0,0 +1,188 @@
+"""
+Compressed, content-addressed storage for raw upload payloads.
+
+A payload is serialised to JSON, hashed (sha256 of the JSON bytes),
+compressed with zstd (gzip when zstandard is not installed) and split into
+chunks in `rawBlobChunks`. A manifest in `rawBlobs` (_id = hash) is written
+last, so a manifest only exists for a complete blob. Identical payloads are
+stored once.
+
+uploadedData keeps only a small `original_data_ref` instead of the payload.
+Move existing inline payloads with:
+
+    python -m app.services.blob_store migrate [--batch 100]
+"""
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import sys
+from datetime import datetime
+from typing import Any, Dict
+
+from fastapi import HTTPException
+
+from app.services.loan_cache import VERSION_BUMP
+
+try:
+    import zstandard
+except ImportError:  # optional; gzip is always available
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+BLOBS = "rawBlobs"
+CHUNKS = "rawBlobChunks"
+
+# Well under the 16 MB BSON document limit
+CHUNK_SIZE = 4 * 1024 * 1024
+ZSTD_LEVEL = 10
+GZIP_LEVEL = 6
+
+DEFAULT_CODEC = "zstd" if zstandard is not None else "gzip"
+
+
+def serialize(payload: Any) -> bytes:
+    # Key order is preserved so the payload reads back exactly as uploaded
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def compress(data: bytes, codec: str = DEFAULT_CODEC) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    if codec == "gzip":
+        return gzip.compress(data, compresslevel=GZIP_LEVEL)
+    raise ValueError(f"Unknown codec {codec}")
+
+
+def decompress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read zstd blobs")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == "gzip":
+        return gzip.decompress(data)
+    raise ValueError(f"Unknown codec {codec}")
+
+
+def encode_blob(payload: Any, codec: str = DEFAULT_CODEC):
+    """CPU-bound part of put_blob: (sha256, raw size, compressed bytes)."""
+    raw = serialize(payload)
+    return hashlib.sha256(raw).hexdigest(), len(raw), compress(raw, codec)
+
+
+async def put_blob(db, payload: Any, codec: str = DEFAULT_CODEC) -> Dict[str, Any]:
+    """Store `payload` (if not already stored) and return its reference."""
+    digest, size, packed = await asyncio.to_thread(encode_blob, payload, codec)
+    return await store_encoded_blob(db, digest, size, packed, codec)
+
+
+def encoded_blob_ref(digest: str, size: int, packed: bytes, codec: str = DEFAULT_CODEC) -> Dict[str, Any]:
+    """The reference store_encoded_blob() returns for a newly stored blob."""
+    return {"sha256": digest, "size": size, "codec": codec, "stored_size": len(packed)}
+
+
+async def store_encoded_blob(db, digest: str, size: int, packed: bytes, codec: str = DEFAULT_CODEC) -> Dict[str, Any]:
+    """Write an encode_blob() result computed elsewhere (e.g. in a worker process)."""
+    manifest = await db[BLOBS].find_one({"_id": digest}, {"codec": 1, "stored_size": 1})
+    if manifest:
+        return {"sha256": digest, "size": size, "codec": manifest["codec"], "stored_size": manifest["stored_size"]}
+
+    chunks = [packed[i:i + CHUNK_SIZE] for i in range(0, len(packed), CHUNK_SIZE)] or [b""]
+    for n, chunk in enumerate(chunks):
+        # Upsert keeps a retry after a half-written blob idempotent
+        await db[CHUNKS].replace_one(
+            {"_id": f"{digest}:{n}"},
+            {"blob": digest, "n": n, "data": chunk},
+            upsert=True,
+        )
+    await db[BLOBS].update_one(
+        {"_id": digest},
+        {"$setOnInsert": {
+            "codec": codec,
+            "size": size,
+            "stored_size": len(packed),
+            "chunks": len(chunks),
+            "created_at": datetime.utcnow(),
+        }},
+        upsert=True,
+    )
+    return encoded_blob_ref(digest, size, packed, codec)
+
+
+async def store_record_blob(db, record: dict, blob: tuple) -> None:
+    """
+    Store the encode_blob() result of an already inserted uploadedData
+    `record`, which was inserted with encoded_blob_ref(*blob). Inserting
+    first means a rejected record never leaves an orphaned blob behind.
+    """
+    ref = await store_encoded_blob(db, *blob)
+    if ref != record["original_data_ref"]:
+        # The same payload was stored earlier with another codec
+        record["original_data_ref"] = ref
+        await db["uploadedData"].update_one({"_id": record["_id"]}, {"$set": {"original_data_ref": ref}})
+
+
+async def get_blob(db, digest: str) -> Any:
+    manifest = await db[BLOBS].find_one({"_id": digest})
+    if not manifest:
+        raise HTTPException(status_code=404, detail="Raw payload not found")
+
+    chunks = await db[CHUNKS].find({"blob": digest}, {"data": 1, "n": 1}) \
+        .sort("n", 1).to_list(length=manifest["chunks"])
+    if len(chunks) != manifest["chunks"]:
+        raise HTTPException(status_code=500, detail="Raw payload is incomplete")
+
+    packed = b"".join(bytes(c["data"]) for c in chunks)
+    raw = await asyncio.to_thread(decompress, packed, manifest["codec"])
+    if hashlib.sha256(raw).hexdigest() != digest:
+        raise HTTPException(status_code=500, detail="Raw payload failed its checksum")
+    return json.loads(raw)
+
+
+# ---------- Migration of inline original_data ----------
+async def migrate_inline_payloads(db, batch: int = 100, codec: str = DEFAULT_CODEC) -> Dict[str, int]:
+    """Move uploadedData.original_data into the blob store, one loan at a time."""
+    moved, bytes_before, bytes_after = 0, 0, 0
+    while True:
+        docs = await db["uploadedData"].find(
+            {"original_data": {"$exists": True}},
+            {"original_data": 1},
+        ).limit(batch).to_list(length=batch)
+        if not docs:
+            break
+        for doc in docs:
+            ref = await put_blob(db, doc["original_data"], codec)
+            await db["uploadedData"].update_one(
+                {"_id": doc["_id"]},
+                # Loan caches drop views read before the move
+                {"$set": {"original_data_ref": ref}, "$unset": {"original_data": ""}, **VERSION_BUMP},
+            )
+            moved += 1
+            bytes_before += ref["size"]
+            bytes_after += ref["stored_size"]
+        logger.info(f"Migrated {moved} raw payloads so far")
+
+    return {"moved": moved, "json_bytes": bytes_before, "stored_bytes": bytes_after}
+
+
+async def _main(argv) -> int:
+    from app.db import db
+
+    parser = argparse.ArgumentParser(description="Raw payload blob store")
+    sub = parser.add_subparsers(dest="command", required=True)
+    migrate = sub.add_parser("migrate", help="move inline original_data into the blob store")
+    migrate.add_argument("--batch", type=int, default=100)
+    migrate.add_argument("--codec", choices=["zstd", "gzip"], default=DEFAULT_CODEC)
+    args = parser.parse_args(argv)
+
+    report = await migrate_inline_payloads(db, args.batch, args.codec)
+    print(json.dumps(report))
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(asyncio.run(_main(sys.argv[1:])))
@@ -0,0 +1,155 @@
+"""
+Bulk loan upload: many /clean-json payloads in one request.
+
+Loans are cleaned in the shared process pool, written to uploadedData with
+unordered insert_many batches (one failing loan does not stop the others)
+and reported back individually. A loan's raw payload goes to the blob
+store only once its record was inserted, so rejected duplicates leave no
+orphaned blobs behind.
+"""
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel
+from pymongo.errors import BulkWriteError
+
+from app.services.blob_store import encoded_blob_ref, store_record_blob
+from app.services.loan_cache import VERSION_FIELD
+from app.services.loan_ingest import prepare_upload
+from app.services.uploaded_data import TIMESTAMP_FORMAT, borrower_names, upsert_loan_summary
+from app.utils.process_pool import pool_size, run_offloaded
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY = 11000
+
+
+class BulkLoan(BaseModel):
+    """One loan of a bulk upload (same fields /clean-json takes)."""
+    username: str
+    email: str
+    loanID: str
+    file_name: str
+    raw_json: Dict[str, Any]
+
+
+def loan_status(index: int, loanID: Optional[str], status: str, detail: Optional[str] = None) -> dict:
+    result = {"index": index, "loanID": loanID, "status": status}
+    if detail:
+        result["detail"] = detail
+    return result
+
+
+def _error_detail(error: Exception) -> str:
+    return str(getattr(error, "detail", error))
+
+
+async def _write_batch(db, batch: List[tuple], report: Dict[int, dict]) -> None:
+    """Insert one batch of (index, loan, record, blob); fill in each loan's status."""
+    records = [record for _, _, record, _ in batch]
+    failed = {}
+    try:
+        await db["uploadedData"].insert_many(records, ordered=False)
+    except BulkWriteError as e:
+        for error in e.details.get("writeErrors", []):
+            failed[error["index"]] = error
+
+    inserted = []
+    for position, (index, loan, record, blob) in enumerate(batch):
+        error = failed.get(position)
+        if error is None:
+            inserted.append((index, loan, record, blob))
+        elif error.get("code") == DUPLICATE_KEY:
+            report[index] = loan_status(index, loan.loanID, "duplicate", "Loan ID already exists")
+        else:
+            report[index] = loan_status(index, loan.loanID, "failed", error.get("errmsg"))
+
+    stored = await asyncio.gather(*(store_record_blob(db, record, blob) for _, _, record, blob in inserted),
+                                  return_exceptions=True)
+    complete = []
+    for (index, loan, record, _), error in zip(inserted, stored):
+        if isinstance(error, Exception):
+            # Without its raw payload the loan is incomplete; take it back out
+            logger.error(f"Storing the raw payload of loan {loan.loanID} failed: {error}")
+            await db["uploadedData"].delete_one({"_id": record["_id"]})
+            report[index] = loan_status(index, loan.loanID, "failed", f"Storing raw payload failed: {error}")
+        else:
+            report[index] = loan_status(index, loan.loanID, "inserted")
+            complete.append(record)
+
+    await asyncio.gather(*(
+        upsert_loan_summary(
+            db, record["loanID"], record["email"], record["updated_at"],
+            file_name=record["file_name"], borrower=borrower_names(record["cleaned_data"]),
+            analyzed_data=False,
+        )
+        for record in complete
+    ))
+
+
+async def ingest_loans(db, loans: List[Any], batch_size: int) -> dict:
+    """
+    `loans` holds a BulkLoan, or an error message for an entry that could not
+    be parsed, per position. Returns the per-loan report and totals.
+    """
+    report: Dict[int, dict] = {}
+    seen = set()
+    pending = []
+    for index, loan in enumerate(loans):
+        if not isinstance(loan, BulkLoan):
+            report[index] = loan_status(index, None, "invalid", str(loan))
+        elif (loan.username, loan.loanID) in seen:
+            report[index] = loan_status(index, loan.loanID, "duplicate", "Loan ID repeated in this upload")
+        else:
+            seen.add((loan.username, loan.loanID))
+            pending.append((index, loan))
+
+    # At most one loan per worker is in the pool at a time, so process_task_timeout
+    # measures cleaning time rather than time queued behind the rest of the upload
+    slots = asyncio.Semaphore(pool_size())
+
+    async def prepare(raw_json):
+        async with slots:
+            return await run_offloaded(prepare_upload, raw_json)
+
+    # Start every loan up front; batches are written as they complete
+    futures = [asyncio.ensure_future(prepare(loan.raw_json)) for _, loan in pending]
+
+    try:
+        for start in range(0, len(pending), batch_size):
+            batch = []
+            for (index, loan), future in zip(pending[start:start + batch_size],
+                                             futures[start:start + batch_size]):
+                try:
+                    views, blob = await future
+                except Exception as e:
+                    logger.error(f"Cleaning loan {loan.loanID} failed: {_error_detail(e)}")
+                    report[index] = loan_status(index, loan.loanID, "failed", f"Cleaning failed: {_error_detail(e)}")
+                    continue
+
+                timestamp = datetime.now().strftime(TIMESTAMP_FORMAT)
+                batch.append((index, loan, {
+                    "username": loan.username,
+                    "email": loan.email,
+                    "loanID": loan.loanID,
+                    "file_name": loan.file_name,
+                    "original_data_ref": encoded_blob_ref(*blob),
+                    **views,
+                    "original_cleaned_data": views["cleaned_data"],
+                    "created_at": timestamp,
+                    "updated_at": timestamp,
+                    VERSION_FIELD: 1,
+                }, blob))
+            if batch:
+                await _write_batch(db, batch, report)
+    finally:
+        for future in futures:
+            future.cancel()
+
+    results = [report[i] for i in sorted(report)]
+    counts: Dict[str, int] = {}
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    return {"total": len(results), "counts": counts, "results": results}
@@ -0,0 +1,120 @@
+import logging
+from typing import Any, Dict, Optional
+
+import bson
+
+from app.config import settings
+from app.utils.lru_cache import LRUCache
+from app.utils.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+# True when the loan has a non-empty analyzed_data map; evaluated by MongoDB
+# so the (large) map itself never leaves the server
+ANALYZED_FLAG = {"$ne": [{"$ifNull": ["$analyzed_data", {}]}, {}]}
+
+# Every write to an uploadedData document must bump this field
+VERSION_FIELD = "version"
+VERSION_BUMP = {"$inc": {VERSION_FIELD: 1}}
+
+
+def _entry_size(entry: tuple) -> int:
+    # entry is (version, projected document)
+    return len(bson.encode(entry[1]))
+
+
+def _has_expressions(projection: dict) -> bool:
+    return any(isinstance(v, dict) for v in projection.values())
+
+
+class LoanCache:
+    """
+    Read-through cache of projected uploadedData views, keyed by
+    (loanID, email, view) and stamped with the document's `version`.
+
+    Each lookup first reads the current version with a covered query on
+    the (loanID, email, version) index. The cached view is served only if
+    its version matches, so a write by any worker is never masked by a
+    stale entry. Returned documents are shared; treat them as read-only.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self._lru = LRUCache(max_entries=max_entries, max_bytes=max_bytes, sizeof=_entry_size)
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    async def current_version(self, db, loanID: str, email: str) -> Optional[int]:
+        """None when the loan does not exist."""
+        doc = await db["uploadedData"].find_one(
+            {"loanID": loanID, "email": email}, {VERSION_FIELD: 1, "_id": 0})
+        if doc is None:
+            return None
+        return doc.get(VERSION_FIELD, 0)
+
+    async def get_view(self, db, loanID: str, email: str, view: str, projection: Dict[str, Any]) -> Optional[dict]:
+        """
+        The loan projected with `projection` (plus `version`), or None if the
+        loan does not exist. `view` names the projection in the cache key.
+        """
+        with tracer.start_as_current_span("loan_cache.get_view", attributes={"loan.view": view}) as span:
+            key = (loanID, email, view)
+            version = await self.current_version(db, loanID, email)
+            if version is None:
+                self.invalidate(loanID, email)
+                self.misses += 1
+                span.set_attribute("cache.outcome", "missing")
+                return None
+
+            entry = self._lru.get(key)
+            if entry is not None:
+                if entry[0] == version:
+                    self.hits += 1
+                    span.set_attribute("cache.outcome", "hit")
+                    return entry[1]
+                self.stale += 1
+            self.misses += 1
+            span.set_attribute("cache.outcome", "stale" if entry is not None else "miss")
+
+            with tracer.start_as_current_span("mongo.fetch_loan", attributes={"db.collection": "uploadedData"}):
+                doc = await self._fetch(db, loanID, email, {**projection, VERSION_FIELD: 1, "_id": 0})
+            if doc is not None:
+                # Stamp with the version the data was read at, not the probed one
+                self._lru.set(key, (doc.get(VERSION_FIELD, 0), doc))
+            return doc
+
+    async def _fetch(self, db, loanID: str, email: str, projection: dict) -> Optional[dict]:
+        query = {"loanID": loanID, "email": email}
+        if not _has_expressions(projection):
+            return await db["uploadedData"].find_one(query, projection)
+        # Computed fields (e.g. ANALYZED_FLAG) need an aggregate $project
+        docs = await db["uploadedData"].aggregate([
+            {"$match": query},
+            {"$limit": 1},
+            {"$project": projection},
+        ]).to_list(length=1)
+        return docs[0] if docs else None
+
+    def invalidate(self, loanID: str, email: str) -> int:
+        """Free this worker's entries for a loan right after writing it."""
+        return self._lru.evict_where(lambda k: k[0] == loanID and k[1] == email)
+
+    def stats(self) -> dict:
+        lru = self._lru.stats()
+        lookups = self.hits + self.misses
+        return {
+            "entries": lru["entries"],
+            "bytes": lru["bytes"],
+            "max_bytes": lru["max_bytes"],
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "evictions": lru["evictions"],
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+loan_cache = LoanCache(
+    max_entries=settings.loan_cache_max_entries,
+    max_bytes=int(settings.loan_cache_max_mb * 1024 * 1024),
+)
@@ -0,0 +1,94 @@
+"""
+CPU-bound part of a loan upload: cleaning the OCR export and deriving the
+filtered views stored on uploadedData.
+
+Everything here is a plain function of its arguments with no database or
+app state, so it can run in a worker process (see app/utils/process_pool.py).
+"""
+from typing import Any, Dict
+
+from app.services.blob_store import DEFAULT_CODEC, encode_blob
+from app.utils.borrower_cleanup_service import clean_borrower_documents_from_dict
+
+allowed_sections = ["BorrowerName", "W2", "VOE", "Paystubs", "Paystub"]
+bs_allowed_sections = ["BorrowerName", "W2",
+                       "VOE", "Paystubs", "Paystub", 'Bank Statement']
+bank_statement = ['Bank Statement']
+
+
+def clean_json_data(obj):
+    if isinstance(obj, dict):
+        # Remove unwanted keys
+        obj.pop("Link", None)
+        obj.pop("ConfidenceScore", None)
+        obj.pop("Url", None)
+        obj.pop("LabelOrder", None)
+        obj.pop("ScreenshotUrl", None)
+        obj.pop("GeneratedOn", None)
+        obj.pop("DocTitle", None)
+        obj.pop("PageNumber", None)
+        obj.pop("StageName", None)
+        obj.pop("Title", None)
+        obj.pop("SkillName", None)
+        # Recursively clean nested dicts
+        for key in list(obj.keys()):
+            clean_json_data(obj[key])
+    elif isinstance(obj, list):
+        for item in obj:
+            clean_json_data(item)
+    return obj
+
+
+def filter_documents_by_type(processed_data, document_types):
+    """
+    Filter processed borrower data to include only specified document types.
+
+    Args:
+        processed_data (dict): The processed JSON data with borrower names as keys
+        document_types (list): List of document types to keep (e.g., ['Paystubs', 'W2'])
+
+    Returns:
+        dict: Filtered data containing only the specified document types for each borrower
+    """
+    filtered_data = {}
+
+    # Iterate through each borrower
+    for borrower_name, documents in processed_data.items():
+        filtered_borrower_data = {}
+
+        # Iterate through each document type for this borrower
+        for doc_type, doc_list in documents.items():
+            # Check if this document type is in our filter list (case-insensitive)
+            if any(doc_type.lower() == filter_type.lower() for filter_type in document_types):
+                filtered_borrower_data[doc_type] = doc_list
+
+        # Only add borrower if they have at least one of the requested document types
+        if filtered_borrower_data:
+            filtered_data[borrower_name] = filtered_borrower_data
+
+    return filtered_data
+
+
+def document_views(cl_data: Dict[str, Any]) -> Dict[str, Any]:
+    """The cleaned_data plus the filtered views derived from it."""
+    return {
+        "cleaned_data": cl_data,
+        "filtered_data": filter_documents_by_type(cl_data, allowed_sections),
+        "only_bs": filter_documents_by_type(cl_data, bank_statement),
+        "filtered_data_with_bs": filter_documents_by_type(cl_data, bs_allowed_sections),
+    }
+
+
+def prepare_cleaned_update(raw_json: Dict[str, Any]) -> Dict[str, Any]:
+    """Views for /update-cleaned-data (the payload is already borrower-grouped)."""
+    return document_views(clean_json_data(raw_json))
+
+
+def prepare_upload(raw_json: Dict[str, Any], codec: str = DEFAULT_CODEC):
+    """
+    Everything /clean-json computes before writing: the document views and the
+    encoded raw payload as (sha256, size, compressed bytes) for the blob store.
+    """
+    blob = encode_blob(raw_json, codec)
+    cleaned = clean_json_data(clean_borrower_documents_from_dict(data=raw_json))
+    return document_views(cleaned), blob
@@ -0,0 +1,308 @@
+"""
+Async outgoing mail.
+
+Messages are put on a bounded in-process queue and sent by a few workers,
+each holding one persistent, authenticated SMTP connection (aiosmtplib).
+A worker takes up to `mail_batch_size` queued messages at a time and sends
+them back to back on its connection. A failed message is retried with
+exponential backoff (not on a permanent 5xx refusal); a connection error
+also drops the connection so the next send reconnects. A connection that
+sat idle for `noop_after_idle` seconds is checked with NOOP before it is
+used again, since relays close idle sessions without the client noticing.
+On stop() whatever could not be sent within the drain timeout (queued or
+waiting to be retried) is logged and counted as failed.
+
+For local testing point SMTP_SERVER/SMTP_PORT at the sink in
+app/utils/smtp_sink.py (with SMTP_STARTTLS=false).
+"""
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from email.message import EmailMessage
+from typing import Dict, List, Optional
+
+import aiosmtplib
+from fastapi import HTTPException
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Send latencies kept for the percentiles in stats()
+LATENCY_WINDOW = 1024
+
+
+def _percentile(values, q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def build_message(to_email: str, subject: str, html_body: str) -> EmailMessage:
+    msg = EmailMessage()
+    msg["From"] = settings.email_user
+    msg["To"] = to_email
+    msg["Subject"] = subject
+    msg.set_content("This message requires an HTML-capable email client.")
+    msg.add_alternative(html_body, subtype="html")
+    return msg
+
+
+class _Job:
+    __slots__ = ("message", "attempts", "enqueued_at", "done")
+
+    def __init__(self, message: EmailMessage, done: Optional[asyncio.Future] = None):
+        self.message = message
+        self.attempts = 0
+        self.enqueued_at = time.perf_counter()
+        # Resolved when the message is accepted or given up on (send() only)
+        self.done = done
+
+    def resolve(self, error: Optional[Exception] = None) -> None:
+        if self.done is None or self.done.done():
+            return
+        if error is None:
+            self.done.set_result(None)
+        else:
+            self.done.set_exception(error)
+
+
+class MailDispatcher:
+    def __init__(
+        self,
+        pool_size: int,
+        queue_size: int,
+        batch_size: int,
+        max_attempts: int,
+        retry_base_seconds: float,
+        noop_after_idle: float = 30.0,
+    ):
+        self.pool_size = pool_size
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.noop_after_idle = noop_after_idle
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers = []
+        # requeue task -> the job it will put back on the queue
+        self._retries: Dict[asyncio.Task, _Job] = {}
+        self._counters = {"queued": 0, "sent": 0, "failed": 0, "retried": 0, "rejected": 0,
+                          "connections": 0, "stale_connections": 0, "batches": 0}
+        # enqueue -> accepted by the server, and SMTP time per message (ms)
+        self._latency = deque(maxlen=LATENCY_WINDOW)
+        self._smtp_latency = deque(maxlen=LATENCY_WINDOW)
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._workers = [asyncio.create_task(self._worker(n), name=f"mail-worker-{n}")
+                         for n in range(self.pool_size)]
+        logger.info(f"Mail dispatcher started with {self.pool_size} SMTP connections")
+
+    async def stop(self, drain_timeout: float = 10.0) -> None:
+        """
+        Send what is queued or waiting to be retried (up to drain_timeout),
+        then close connections. Messages still unsent count as failed.
+        """
+        if not self.running:
+            return
+        try:
+            await asyncio.wait_for(self._drain(), drain_timeout)
+        except asyncio.TimeoutError:
+            pass
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+
+        # A retry whose task already finished has put its job back on the queue
+        retries = {task: job for task, job in self._retries.items() if not task.done()}
+        for task in retries:
+            task.cancel()
+        await asyncio.gather(*retries, return_exceptions=True)
+        queued = []
+        while not self._queue.empty():
+            queued.append(self._queue.get_nowait())
+        self._abandon([*queued, *retries.values()])
+        self._workers, self._retries = [], {}
+
+    async def _drain(self) -> None:
+        # A pending retry puts its job back on the queue once its backoff ends
+        while True:
+            await self._queue.join()
+            if not self._retries:
+                return
+            await asyncio.wait(list(self._retries))
+
+    def _abandon(self, jobs: List[_Job]) -> None:
+        if not jobs:
+            return
+        error = RuntimeError("Mail dispatcher stopped before the message was sent")
+        for job in jobs:
+            self._counters["failed"] += 1
+            job.resolve(error)
+        logger.error(f"Mail dispatcher stopped with {len(jobs)} messages unsent: "
+                     f"{', '.join(job.message['To'] for job in jobs)}")
+
+    def submit(self, to_email: str, subject: str, html_body: str) -> None:
+        """Queue a message; 503 when the queue is full."""
+        self._put(_Job(build_message(to_email, subject, html_body)))
+
+    async def send(self, to_email: str, subject: str, html_body: str) -> None:
+        """Queue a message and wait until the server accepts it; raises when it is given up on."""
+        done = asyncio.get_running_loop().create_future()
+        self._put(_Job(build_message(to_email, subject, html_body), done))
+        await done
+
+    def _put(self, job: _Job) -> None:
+        self.start()
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self._counters["rejected"] += 1
+            logger.error(f"Mail queue full ({self.queue_size}); rejected message to {job.message['To']}")
+            raise HTTPException(status_code=503, detail="Email service is busy, please retry")
+        self._counters["queued"] += 1
+
+    # ---------- workers ----------
+    async def _connect(self) -> aiosmtplib.SMTP:
+        smtp = aiosmtplib.SMTP(
+            hostname=settings.smtp_server,
+            port=settings.smtp_port,
+            timeout=settings.smtp_timeout,
+            start_tls=settings.smtp_starttls,
+        )
+        await smtp.connect()
+        if settings.email_user and settings.email_pass:
+            await smtp.login(settings.email_user, settings.email_pass)
+        self._counters["connections"] += 1
+        return smtp
+
+    async def _ready(self, smtp: Optional[aiosmtplib.SMTP], idle: float) -> aiosmtplib.SMTP:
+        """A connection to send on: NOOP-check one that sat idle, reconnect if it is gone."""
+        if smtp is not None and smtp.is_connected and idle >= self.noop_after_idle:
+            try:
+                await smtp.noop()
+            except Exception as e:
+                self._counters["stale_connections"] += 1
+                logger.info(f"Pooled SMTP connection went stale ({e!r}); reconnecting")
+                smtp = await self._close(smtp)
+        if smtp is None or not smtp.is_connected:
+            smtp = await self._connect()
+        return smtp
+
+    async def _worker(self, n: int) -> None:
+        smtp: Optional[aiosmtplib.SMTP] = None
+        last_used = time.monotonic()
+        try:
+            while True:
+                batch = [await self._queue.get()]
+                while len(batch) < self.batch_size and not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                self._counters["batches"] += 1
+
+                for i, job in enumerate(batch):
+                    try:
+                        smtp = await self._ready(smtp, time.monotonic() - last_used)
+                        started = time.perf_counter()
+                        await smtp.send_message(job.message)
+                        now = time.perf_counter()
+                        self._smtp_latency.append((now - started) * 1000)
+                        self._latency.append((now - job.enqueued_at) * 1000)
+                        self._counters["sent"] += 1
+                        job.resolve()
+                    except asyncio.CancelledError:
+                        # stop() gave up waiting: this job and the rest of the batch stay unsent
+                        self._abandon(batch[i:])
+                        raise
+                    except Exception as e:
+                        smtp = await self._recover(smtp, e)
+                        self._retry_later(job, e)
+                    finally:
+                        last_used = time.monotonic()
+                        self._queue.task_done()
+        finally:
+            await self._close(smtp)
+
+    async def _recover(self, smtp: Optional[aiosmtplib.SMTP], error: Exception) -> Optional[aiosmtplib.SMTP]:
+        """Keep the connection after a server reply (e.g. 451), else drop it."""
+        if smtp is not None and isinstance(error, aiosmtplib.SMTPResponseException) and smtp.is_connected:
+            try:
+                await smtp.rset()
+                return smtp
+            except Exception:
+                pass
+        return await self._close(smtp)
+
+    async def _close(self, smtp: Optional[aiosmtplib.SMTP]) -> None:
+        if smtp is not None and smtp.is_connected:
+            try:
+                await smtp.quit()
+            except Exception:
+                smtp.close()
+        return None
+
+    def _retry_later(self, job: _Job, error: Exception) -> None:
+        job.attempts += 1
+        to = job.message["To"]
+        permanent = isinstance(error, aiosmtplib.SMTPRecipientsRefused) or (
+            isinstance(error, aiosmtplib.SMTPResponseException) and error.code >= 500)
+        if permanent or job.attempts >= self.max_attempts:
+            self._counters["failed"] += 1
+            logger.error(f"Giving up on email to {to} after {job.attempts} attempts: {error}")
+            job.resolve(error)
+            return
+
+        delay = self.retry_base_seconds * 2 ** (job.attempts - 1) * random.uniform(0.8, 1.2)
+        self._counters["retried"] += 1
+        logger.warning(f"Email to {to} failed ({error}); retry {job.attempts} in {delay:.1f}s")
+
+        async def requeue():
+            await asyncio.sleep(delay)
+            try:
+                self._queue.put_nowait(job)
+            except asyncio.QueueFull:
+                self._counters["failed"] += 1
+                logger.error(f"Mail queue full; dropped retry of email to {to}")
+                job.resolve(error)
+
+        task = asyncio.create_task(requeue())
+        self._retries[task] = job
+        task.add_done_callback(lambda t: self._retries.pop(t, None))
+
+    def stats(self) -> dict:
+        latency, smtp_latency = list(self._latency), list(self._smtp_latency)
+        return {
+            "running": self.running,
+            "pool_size": self.pool_size,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "pending_retries": len(self._retries),
+            **self._counters,
+            "latency_ms": {
+                "p50": round(_percentile(latency, 0.50), 2),
+                "p95": round(_percentile(latency, 0.95), 2),
+                "max": round(max(latency, default=0.0), 2),
+            },
+            "smtp_ms": {
+                "p50": round(_percentile(smtp_latency, 0.50), 2),
+                "p95": round(_percentile(smtp_latency, 0.95), 2),
+            },
+        }
+
+
+mail_dispatcher = MailDispatcher(
+    pool_size=settings.mail_pool_size,
+    queue_size=settings.mail_queue_size,
+    batch_size=settings.mail_batch_size,
+    max_attempts=settings.mail_max_attempts,
+    retry_base_seconds=settings.mail_retry_base_seconds,
+    noop_after_idle=settings.mail_noop_after_idle_seconds,
+)
@@ -0,0 +1,225 @@
+# app/services/rule_registry.py
+import hashlib
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import yaml
+from pydantic import BaseModel, ValidationError, field_validator
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class RuleRegistryError(Exception):
+    """Raised when the requirements file cannot be read or validated."""
+
+
+# ---------- File schema ----------
+class RequirementsFile(BaseModel):
+    rules: List[str]
+    required_fields: Dict[str, List[str]]
+
+    @field_validator("rules")
+    @classmethod
+    def _check_rules(cls, rules: List[str]) -> List[str]:
+        cleaned = [r.strip() for r in rules]
+        if any(not r for r in cleaned):
+            raise ValueError("rules must not contain empty entries")
+        if len(set(cleaned)) != len(cleaned):
+            raise ValueError("rules must not contain duplicates")
+        return cleaned
+
+    @field_validator("required_fields")
+    @classmethod
+    def _check_fields(cls, groups: Dict[str, List[str]]) -> Dict[str, List[str]]:
+        for name, fields in groups.items():
+            if not fields:
+                raise ValueError(f"required_fields.{name} must list at least one field")
+        return groups
+
+
+# ---------- Loaded snapshot ----------
+def content_hash(value) -> str:
+    """Short, stable hash of any JSON-serialisable value."""
+    raw = json.dumps(value, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()[:16]
+
+
+class Rule(BaseModel):
+    id: str
+    text: str
+
+
+class FieldGroup(BaseModel):
+    id: str
+    name: str
+    fields: List[str]
+
+
+class RuleSet(BaseModel):
+    version: str
+    source: str
+    loaded_at: datetime
+    rules: List[Rule]
+    required_fields: List[FieldGroup]
+
+    def ids(self) -> set:
+        return {r.id for r in self.rules} | {g.id for g in self.required_fields}
+
+
+def build_rule_set(parsed: RequirementsFile, source: str) -> RuleSet:
+    rules = [Rule(id=content_hash(text), text=text) for text in parsed.rules]
+    groups = [
+        FieldGroup(id=content_hash([name, fields]), name=name, fields=fields)
+        for name, fields in parsed.required_fields.items()
+    ]
+    version = content_hash({
+        "rules": [r.id for r in rules],
+        "required_fields": [g.id for g in groups],
+    })
+    return RuleSet(
+        version=version,
+        source=source,
+        loaded_at=datetime.utcnow(),
+        rules=rules,
+        required_fields=groups,
+    )
+
+
+def load_rule_set(path: str) -> RuleSet:
+    """Read, validate and hash a requirements file. Raises RuleRegistryError."""
+    try:
+        with open(path) as stream:
+            raw = yaml.safe_load(stream)
+    except FileNotFoundError:
+        raise RuleRegistryError(f"{path} not found")
+    except yaml.YAMLError as e:
+        raise RuleRegistryError(f"Error parsing {path}: {e}")
+
+    try:
+        parsed = RequirementsFile.model_validate(raw or {})
+    except ValidationError as e:
+        raise RuleRegistryError(f"Invalid {path}: {e}")
+
+    return build_rule_set(parsed, source=path)
+
+
+# ---------- Registry ----------
+Listener = Callable[[Optional[RuleSet], RuleSet], None]
+
+
+class RuleRegistry:
+    """
+    Holds the active RuleSet and swaps it atomically on reload.
+
+    Handlers should grab `registry.current` once per request so a reload
+    mid-request never mixes two versions. The file is re-checked (mtime)
+    at most every `poll_seconds`, so edits reach every worker without a
+    restart; a broken edit is logged and the previous version stays live.
+    """
+
+    def __init__(self, path: str, poll_seconds: float = 2.0):
+        self.path = path
+        self.poll_seconds = poll_seconds
+        self._current: Optional[RuleSet] = None
+        self._mtime: Optional[float] = None
+        self._last_check = 0.0
+        self._listeners: List[Listener] = []
+        self.last_error: Optional[str] = None
+
+    @property
+    def current(self) -> RuleSet:
+        if self._current is None:
+            self.load()
+        elif self.poll_seconds and time.monotonic() - self._last_check >= self.poll_seconds:
+            self._check_file()
+        return self._current
+
+    def subscribe(self, listener: Listener) -> None:
+        """Register a callback run as listener(old, new) after every swap."""
+        self._listeners.append(listener)
+
+    def load(self) -> RuleSet:
+        """Load the file, raising RuleRegistryError if it is invalid."""
+        mtime = self._stat()
+        new = load_rule_set(self.path)
+        self._swap(new, mtime)
+        return new
+
+    def reload(self) -> dict:
+        """
+        Force a reload. On failure the active version is kept and the
+        error is re-raised so the caller (admin endpoint) can report it.
+        """
+        old = self._current
+        try:
+            new = self.load()
+        except RuleRegistryError as e:
+            self.last_error = str(e)
+            raise
+        return diff_rule_sets(old, new)
+
+    def _check_file(self) -> None:
+        self._last_check = time.monotonic()
+        mtime = self._stat()
+        if mtime == self._mtime:
+            return
+        try:
+            old = self._current
+            new = self.load()
+            logger.info(f"Rules reloaded from {self.path}: {diff_rule_sets(old, new)}")
+        except RuleRegistryError as e:
+            # Remember the mtime so a broken file is not re-parsed every poll
+            self._mtime = mtime
+            self.last_error = str(e)
+            logger.error(f"Rule reload failed, keeping version {self._current.version}: {e}")
+
+    def _stat(self) -> Optional[float]:
+        try:
+            return os.stat(self.path).st_mtime
+        except OSError:
+            return None
+
+    def _swap(self, new: RuleSet, mtime: Optional[float]) -> None:
+        old = self._current
+        self._current = new
+        self._mtime = mtime
+        self._last_check = time.monotonic()
+        self.last_error = None
+        if old is not None and old.version == new.version:
+            return
+        for listener in self._listeners:
+            try:
+                listener(old, new)
+            except Exception as e:
+                logger.error(f"Rule registry listener failed: {e}")
+
+    def describe(self) -> dict:
+        current = self.current
+        return {
+            "version": current.version,
+            "source": current.source,
+            "loaded_at": current.loaded_at.isoformat(),
+            "last_error": self.last_error,
+            "rules": [r.model_dump() for r in current.rules],
+            "required_fields": [g.model_dump() for g in current.required_fields],
+        }
+
+
+def diff_rule_sets(old: Optional[RuleSet], new: RuleSet) -> dict:
+    old_ids = old.ids() if old else set()
+    new_ids = new.ids()
+    return {
+        "version": new.version,
+        "previous_version": old.version if old else None,
+        "added": sorted(new_ids - old_ids),
+        "removed": sorted(old_ids - new_ids),
+    }
+
+
+rule_registry = RuleRegistry(settings.requirements_file, settings.rules_poll_seconds)
@@ -1,17 +1,20 @@
 # app/services/send_code.py
 from datetime import datetime, timedelta
-from fastapi import HTTPException, BackgroundTasks
-from pymongo.collection import Collection
+from fastapi import HTTPException
+from pymongo import ReturnDocument
 import random
 import string
 import os
-from typing import Optional, Dict, Any
+from typing import Dict, Any
 
+from app.config import settings
 from app.db import get_db
 from app.models.user import SendCodeRequest, VerifyCodeRequest
 from app.utils.email_template import get_verification_code_email
 # Keep your existing send_email implementation (assumed signature: send_email(to_email, subject, html_body, ...))
 from app.services.email_service import send_email
+from app.services.mail_dispatcher import mail_dispatcher
+from app.services.task_queue import enqueue
 
 OTP_TTL_SECONDS = 600        # 10 minutes
 MAX_ATTEMPTS = 5
@@ -33,7 +36,7 @@ if USE_CELERY:
             # Use your sync send_email inside the worker (same signature)
             return send_email(to_email=to_email, subject=subject, html_body=html_body)
     except Exception as ex:
-        # If celery import fails for any reason, fallback to BackgroundTasks behavior
+        # If celery import fails for any reason, fall back to the mail queue
         USE_CELERY = False
         celery_app = None
 
@@ -42,14 +45,13 @@ def generate_code(length: int = 6) -> str:
     return "".join(random.choices(string.digits, k=length))
 
 
-def _upsert_code_record(email: str, code: str) -> Dict[str, Any]:
-    """Upsert OTP record and return metadata."""
-    expires_at = datetime.utcnow() + timedelta(seconds=OTP_TTL_SECONDS)
-    db = get_db()
-    collection = db.get_collection('verification_codes')
+async def _upsert_code_record(email: str, code: str) -> Dict[str, Any]:
+    """Upsert OTP record (resetting attempts and isUsed) and return metadata."""
     now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=OTP_TTL_SECONDS)
+    collection = get_db().get_collection('verification_codes')
 
-    collection.update_one(
+    await collection.update_one(
         {"email": email},
         {
             "$set": {
@@ -60,6 +62,7 @@ def _upsert_code_record(email: str, code: str) -> Dict[str, Any]:
                 "isUsed": False,
                 "updatedAt": now,
             },
+            "$unset": {"lastResult": ""},
             "$setOnInsert": {
                 "createdAt": now,
             },
@@ -74,13 +77,15 @@ def _upsert_code_record(email: str, code: str) -> Dict[str, Any]:
     }
 
 
-def send_verification_code(request: SendCodeRequest, background_tasks: Optional[BackgroundTasks] = None) -> Dict[str, Any]:
+async def send_verification_code(request: SendCodeRequest) -> Dict[str, Any]:
     """
     Generate OTP, upsert into MongoDB, and schedule email send asynchronously.
 
-    - If USE_CELERY=1 -> enqueue a Celery task (recommended for production).
-    - Otherwise, if a FastAPI BackgroundTasks instance is provided -> add background task (in-process).
-    - If neither is available, send synchronously as a last resort.
+    - If USE_CELERY=1 -> enqueue a Celery task.
+    - If MAIL_VIA_TASK_QUEUE=true -> a durable "send_email" task in Mongo
+      (app/services/task_queue.py), retried until the mail is sent.
+    - Otherwise (or if the enqueue fails) -> the in-process mail queue
+      (app/services/mail_dispatcher.py), sent over pooled SMTP connections.
     """
     email = request.email.lower().strip()
     if not email:
@@ -88,7 +93,7 @@ def send_verification_code(request: SendCodeRequest, background_tasks: Optional[
 
     # Generate code and persist immediately
     code = generate_code(6)
-    meta = _upsert_code_record(email, code)
+    meta = await _upsert_code_record(email, code)
 
     # Build email content (HTML)
     html = get_verification_code_email(code=code, email=email)
@@ -106,37 +111,17 @@ def send_verification_code(request: SendCodeRequest, background_tasks: Optional[
             )
             dispatch_method = "celery_enqueued"
         except Exception as ex:
-            # If enqueue fails, fall back to BackgroundTasks or synchronous send
-            dispatch_method = "celery_enqueue_failed"
-            if background_tasks is not None:
-                background_tasks.add_task(
-                    send_email, email, "Your Verification Code", html)
-                dispatch_method = "background_tasks_added_after_celery_fail"
-            else:
-                # synchronous fallback
-                try:
-                    send_email(
-                        to_email=email, subject="Your Verification Code", html_body=html)
-                    dispatch_method = "sent_synchronously_after_celery_fail"
-                except Exception as ex2:
-                    dispatch_method = "sync_send_failed"
-                    print(
-                        "Failed to send email synchronously after celery enqueue failure:", ex2)
-    elif background_tasks is not None:
-        # Add to FastAPI BackgroundTasks (non-blocking for request)
-        # NOTE: send_email signature expected: send_email(to_email, subject, html_body)
-        background_tasks.add_task(
-            send_email, to_email=email, subject="Your Verification Code", html_body=html)
-        dispatch_method = "background_tasks_added"
+            # If enqueue fails, fall back to the in-process mail queue
+            mail_dispatcher.submit(email, "Your Verification Code", html)
+            dispatch_method = "mail_queue_after_celery_fail"
+    elif settings.mail_via_task_queue:
+        await enqueue(get_db(), "send_email",
+                      {"to_email": email, "subject": "Your Verification Code", "html_body": html})
+        dispatch_method = "task_queue"
     else:
-        # Last-resort synchronous send (blocks): avoid in production
-        try:
-            send_email(to_email=email,
-                       subject="Your Verification Code", html_body=html)
-            dispatch_method = "sent_synchronously"
-        except Exception as ex:
-            dispatch_method = "sync_send_failed"
-            print("Synchronous email send failed:", ex)
+        # Pooled async SMTP sender; raises 503 if its queue is full
+        mail_dispatcher.submit(email, "Your Verification Code", html)
+        dispatch_method = "mail_queue"
 
     # Optional debug print (remove or replace with proper logging in production)
     print(
@@ -151,55 +136,65 @@ def send_verification_code(request: SendCodeRequest, background_tasks: Optional[
     }
 
 
-async def verify_otp_code(request: VerifyCodeRequest) -> bool:
+# Failure messages by the outcome verify_otp_code() records in lastResult
+VERIFY_ERRORS = {
+    "used": "Verification code already used.",
+    "expired": "Verification code has expired.",
+    "locked": "Too many failed attempts. Please request a new code.",
+    "invalid": "Invalid verification code.",
+}
+
+
+def _verify_pipeline(code: str, now: datetime) -> list:
     """
-    Validate OTP from MongoDB, handle attempts, mark as used.
+    Update pipeline that checks the code and records the outcome in one
+    atomic step. Checks run in the same order as before: used, expired,
+    attempts exhausted, then the code itself; only a wrong code counts as
+    an attempt. `now` is the app clock, the same one that set expiresAt.
     """
+    # $literal: user input must never be read as a field path ("$code")
+    code_matches = {"$eq": ["$code", {"$literal": code}]}
+    return [
+        {"$set": {"lastResult": {"$switch": {
+            "branches": [
+                {"case": {"$eq": ["$isUsed", True]}, "then": "used"},
+                {"case": {"$lte": ["$expiresAt", now]}, "then": "expired"},
+                {"case": {"$gte": ["$attempts", MAX_ATTEMPTS]}, "then": "locked"},
+                {"case": code_matches, "then": "verified"},
+            ],
+            "default": "invalid",
+        }}}},
+        {"$set": {
+            "isUsed": {"$or": ["$isUsed", {"$eq": ["$lastResult", "verified"]}]},
+            "attempts": {"$cond": [
+                {"$eq": ["$lastResult", "invalid"]}, {"$add": ["$attempts", 1]}, "$attempts"]},
+            "updatedAt": now,
+        }},
+    ]
 
-    print('***********************************************')
 
+async def verify_otp_code(request: VerifyCodeRequest) -> bool:
+    """
+    Validate OTP, count the attempt or mark it used, in a single atomic
+    find_one_and_update: concurrent submissions of the right code verify
+    exactly once and wrong guesses can never exceed MAX_ATTEMPTS.
+    Expired records are removed by the TTL index on expiresAt.
+    """
     email = request.email.lower().strip()
-    input_code = request.code
-    db = get_db()  # this is your Motor async DB instance
-    collection = db.get_collection("verification_codes")
+    collection = get_db().get_collection("verification_codes")
 
-    # MUST await async find_one()
-    doc = await collection.find_one({"email": email})
-    print("Fetched doc:", doc)
+    doc = await collection.find_one_and_update(
+        {"email": email},
+        _verify_pipeline(request.code, datetime.utcnow()),
+        projection={"lastResult": 1},
+        return_document=ReturnDocument.AFTER,
+    )
     if not doc:
         raise HTTPException(
             status_code=400, detail="No verification code found.")
 
-    if doc.get("isUsed"):
-        raise HTTPException(
-            status_code=400, detail="Verification code already used.")
-
-    # expiry check
-    expires_at = doc.get("expiresAt")
-    if not expires_at or datetime.utcnow() > expires_at:
-        raise HTTPException(
-            status_code=400, detail="Verification code has expired.")
-
-    attempts = int(doc.get("attempts") or 0)
-    if attempts >= MAX_ATTEMPTS:
-        raise HTTPException(
-            status_code=400,
-            detail="Too many failed attempts. Please request a new code.",
-        )
-
-    stored_code = doc.get("code")
-    if stored_code != input_code:
-        collection.update_one(
-            {"_id": doc["_id"]},
-            {"$set": {"attempts": attempts + 1, "updatedAt": datetime.utcnow()}},
-        )
-        raise HTTPException(
-            status_code=400, detail="Invalid verification code.")
-
-    # success → mark as used
-    collection.update_one(
-        {"_id": doc["_id"]},
-        {"$set": {"isUsed": True, "updatedAt": datetime.utcnow()}},
-    )
+    result = doc.get("lastResult")
+    if result != "verified":
+        raise HTTPException(status_code=400, detail=VERIFY_ERRORS.get(result, VERIFY_ERRORS["invalid"]))
 
     return True
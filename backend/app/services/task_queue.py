@@ -0,0 +1,253 @@
+"""
+Durable background tasks on the existing Mongo database (collection `tasks`).
+
+A task is a registered async handler name plus a JSON-able payload. Workers
+claim tasks atomically with find_one_and_update; a claimed task is hidden
+for `task_visibility_seconds` (extended by a heartbeat while it runs). If a
+worker dies, the task becomes claimable again once that lease runs out, so
+handlers must tolerate running more than once. Failures are retried with
+exponential backoff up to `max_attempts`, then the task is marked failed;
+so is a task whose lease expired on its last attempt.
+
+Every task carries `available_at`, the time it may next be claimed: its run
+time while queued, the end of its lease while running.
+
+    @task("send_email")
+    async def send_email_task(payload): ...
+
+    await enqueue(db, "send_email", {"to_email": ...})
+
+Run workers with (or TASK_WORKERS_IN_APP > 0 to run them inside the API):
+
+    python -m app.services.task_queue worker [--concurrency 4]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import socket
+import sys
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from pymongo import ASCENDING, ReturnDocument
+
+from app.config import settings
+from app.services.mail_dispatcher import mail_dispatcher
+
+logger = logging.getLogger(__name__)
+
+TASKS = "tasks"
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+# run_task() result when the lease expired before the task finished
+LOST = "lost"
+
+Handler = Callable[[Dict[str, Any]], Awaitable[Any]]
+_handlers: Dict[str, Handler] = {}
+
+
+def task(name: str):
+    """Register an async handler under `name`."""
+    def register(fn: Handler) -> Handler:
+        _handlers[name] = fn
+        return fn
+    return register
+
+
+async def enqueue(
+    db,
+    name: str,
+    payload: Optional[Dict[str, Any]] = None,
+    delay_seconds: float = 0.0,
+    max_attempts: Optional[int] = None,
+) -> str:
+    now = datetime.utcnow()
+    result = await db[TASKS].insert_one({
+        "name": name,
+        "payload": payload or {},
+        "status": QUEUED,
+        "attempts": 0,
+        "max_attempts": max_attempts or settings.task_max_attempts,
+        "available_at": now + timedelta(seconds=delay_seconds),
+        "created_at": now,
+        "updated_at": now,
+    })
+    return str(result.inserted_id)
+
+
+async def claim(db, worker_id: str) -> Optional[dict]:
+    """
+    Lease the oldest runnable task (queued and due, or with an expired lease).
+    An expired lease that was already the task's last attempt marks the task
+    failed instead of running it again, and the next task is tried.
+    """
+    while True:
+        now = datetime.utcnow()
+        doc = await db[TASKS].find_one_and_update(
+            {"status": {"$in": [QUEUED, RUNNING]}, "available_at": {"$lte": now}},
+            {
+                "$set": {
+                    "status": RUNNING,
+                    "worker": worker_id,
+                    "available_at": now + timedelta(seconds=settings.task_visibility_seconds),
+                    "started_at": now,
+                    "updated_at": now,
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("available_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER,
+        )
+        if doc is None or doc["attempts"] <= doc.get("max_attempts", settings.task_max_attempts):
+            return doc
+        await _fail_exhausted(db, doc, now)
+
+
+async def _fail_exhausted(db, doc: dict, now: datetime) -> None:
+    attempts = doc["attempts"] - 1
+    logger.error(f"Task {doc['name']} {doc['_id']} lost its lease on its last attempt "
+                 f"({attempts}/{doc.get('max_attempts', settings.task_max_attempts)}); marking it failed")
+    await db[TASKS].update_one(_lease(doc), {"$set": {
+        "status": FAILED,
+        # The reclaim above was not a real attempt
+        "attempts": attempts,
+        "last_error": "Lease expired on the last attempt (worker lost or task too slow)",
+        "finished_at": now,
+        "updated_at": now,
+    }})
+
+
+def _lease(doc: dict) -> dict:
+    """Filter matching the task only while this claim still owns it."""
+    return {"_id": doc["_id"], "status": RUNNING, "worker": doc["worker"], "attempts": doc["attempts"]}
+
+
+async def _heartbeat(db, doc: dict) -> None:
+    interval = settings.task_visibility_seconds / 3
+    while True:
+        await asyncio.sleep(interval)
+        now = datetime.utcnow()
+        result = await db[TASKS].update_one(_lease(doc), {"$set": {
+            "available_at": now + timedelta(seconds=settings.task_visibility_seconds),
+            "updated_at": now,
+        }})
+        if result.matched_count == 0:
+            logger.warning(f"Task {doc['_id']} lease lost while running")
+            return
+
+
+async def run_task(db, doc: dict) -> str:
+    """Run one claimed task and record the outcome; returns the new status."""
+    handler = _handlers.get(doc["name"])
+    heartbeat = asyncio.create_task(_heartbeat(db, doc))
+    try:
+        if handler is None:
+            raise LookupError(f"No handler registered for task {doc['name']!r}")
+        await handler(doc.get("payload") or {})
+    except Exception as e:
+        status, update = _after_failure(doc, e)
+    else:
+        status, update = DONE, {"finished_at": datetime.utcnow()}
+    finally:
+        heartbeat.cancel()
+
+    update.update(status=status, updated_at=datetime.utcnow())
+    result = await db[TASKS].update_one(_lease(doc), {"$set": update})
+    if result.matched_count == 0:
+        # The lease ran out and another worker owns the task now
+        logger.warning(f"Task {doc['name']} {doc['_id']} finished after losing its lease; outcome dropped")
+        return LOST
+    return status
+
+
+def _after_failure(doc: dict, error: Exception):
+    """Requeue with exponential backoff, or fail for good after max_attempts."""
+    update = {"last_error": str(error)}
+    if doc["attempts"] >= doc.get("max_attempts", settings.task_max_attempts):
+        logger.error(f"Task {doc['name']} {doc['_id']} failed after {doc['attempts']} attempts: {error}")
+        update["finished_at"] = datetime.utcnow()
+        return FAILED, update
+    delay = settings.task_retry_base_seconds * 2 ** (doc["attempts"] - 1)
+    logger.warning(f"Task {doc['name']} {doc['_id']} failed ({error}); retry in {delay:.0f}s")
+    update["available_at"] = datetime.utcnow() + timedelta(seconds=delay)
+    return QUEUED, update
+
+
+async def queue_stats(db) -> Dict[str, int]:
+    """Number of tasks per status, one count per status on the (status, available_at) index."""
+    statuses = (QUEUED, RUNNING, DONE, FAILED)
+    counts = await asyncio.gather(*(db[TASKS].count_documents({"status": status}) for status in statuses))
+    return dict(zip(statuses, counts))
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+async def run_worker(
+    db,
+    concurrency: int = 1,
+    worker_id: Optional[str] = None,
+    stop: Optional[asyncio.Event] = None,
+) -> None:
+    """Claim and run tasks with up to `concurrency` in flight until `stop` is set."""
+    worker_id = worker_id or default_worker_id()
+    stop = stop or asyncio.Event()
+    logger.info(f"Task worker {worker_id} started, concurrency {concurrency}")
+
+    async def slot():
+        while not stop.is_set():
+            try:
+                doc = await claim(db, worker_id)
+            except Exception as e:
+                logger.error(f"Task claim failed: {e}")
+                doc = None
+            if doc is None:
+                try:
+                    await asyncio.wait_for(stop.wait(), settings.task_poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await run_task(db, doc)
+            except Exception as e:
+                # e.g. Mongo unreachable while recording the outcome; the lease
+                # runs out and the task is claimed again
+                logger.error(f"Task {doc['name']} {doc['_id']} could not be completed: {e}")
+
+    await asyncio.gather(*(slot() for _ in range(concurrency)))
+
+
+# ---------- Built-in tasks ----------
+@task("send_email")
+async def send_email_task(payload: Dict[str, Any]) -> None:
+    await mail_dispatcher.send(payload["to_email"], payload["subject"], payload["html_body"])
+
+
+async def _main(argv) -> int:
+    from app.db import db, init_db
+
+    parser = argparse.ArgumentParser(description="Mongo-backed task queue")
+    sub = parser.add_subparsers(dest="command", required=True)
+    worker = sub.add_parser("worker", help="run tasks until interrupted")
+    worker.add_argument("--concurrency", type=int, default=settings.task_worker_concurrency)
+    args = parser.parse_args(argv)
+
+    await init_db()
+    # Finish the tasks in hand on Ctrl+C / SIGTERM instead of abandoning their leases
+    stop = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        asyncio.get_running_loop().add_signal_handler(sig, stop.set)
+    try:
+        await run_worker(db, args.concurrency, stop=stop)
+    finally:
+        await mail_dispatcher.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(asyncio.run(_main(sys.argv[1:])))
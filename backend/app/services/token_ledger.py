@@ -0,0 +1,151 @@
+"""
+LLM token ledger: one document per MCP tool invocation (or cached answer)
+made for a loan analysis, in the `llmUsage` collection.
+
+The MCP server reports the tokens, model and duration of every tool call in
+the result's `_meta.usage`; the API adds who and what it was for (loan,
+user, rule or field group, borrower) and whether the answer came from the
+rule-result cache instead. usage_summary() aggregates the ledger per loan,
+rule, user, tool or model so the most expensive prompts and payloads stand
+out.
+
+Writes are best effort: a failing insert is logged and never fails the
+analysis that produced it.
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from fastapi import HTTPException
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+LEDGER = "llmUsage"
+
+# Outcomes of invocations that produced no answer: the tool failed, or the
+# API gave up on the call (deadline, client gone) before it returned
+FAILED_OUTCOMES = ("error", "timeout", "cancelled")
+
+# group_by value -> ledger field(s) that form the group
+GROUPS = {
+    "loan": {"loanID": "$loanID", "email": "$email"},
+    "rule": {"tool": "$tool", "rule_id": "$rule_id"},
+    "user": {"email": "$email"},
+    "tool": {"tool": "$tool"},
+    "model": {"model": "$model"},
+}
+
+
+def reported_usage(response) -> Dict[str, Any]:
+    """The `_meta.usage` a tool call result carries ({} from an older MCP server)."""
+    meta = getattr(response, "meta", None) or {}
+    usage = meta.get("usage")
+    return usage if isinstance(usage, dict) else {}
+
+
+def ledger_entry(
+    tool: str,
+    loanID: str,
+    email: str,
+    borrower: str = "All",
+    rule_id: Optional[str] = None,
+    usage: Optional[Dict[str, Any]] = None,
+    cache_hit: bool = False,
+) -> Dict[str, Any]:
+    usage = usage or {}
+    prompt = int(usage.get("prompt_tokens", 0))
+    completion = int(usage.get("completion_tokens", 0))
+    return {
+        "loanID": loanID,
+        "email": email,
+        "borrower": borrower,
+        "tool": tool,
+        "rule_id": rule_id,
+        "cache_hit": cache_hit,
+        "model": usage.get("model", ""),
+        "prompt_tokens": prompt,
+        "completion_tokens": completion,
+        "total_tokens": prompt + completion,
+        "llm_calls": int(usage.get("llm_calls", 0)),
+        "duration_ms": float(usage.get("duration_ms", 0.0)),
+        "outcome": "cached" if cache_hit else usage.get("outcome", "unknown"),
+        "created_at": datetime.utcnow(),
+    }
+
+
+async def record_usage(db, entries: List[Dict[str, Any]]) -> None:
+    if not entries:
+        return
+    try:
+        await db[LEDGER].insert_many(entries, ordered=False)
+    except Exception as e:
+        logger.warning(f"Could not record {len(entries)} LLM usage entries: {e}")
+
+
+def _cost_expression() -> Dict[str, Any]:
+    return {"$add": [
+        {"$multiply": ["$prompt_tokens", settings.llm_prompt_cost_per_1k / 1000]},
+        {"$multiply": ["$completion_tokens", settings.llm_completion_cost_per_1k / 1000]},
+    ]}
+
+
+async def usage_summary(
+    db,
+    group_by: str = "loan",
+    loanID: Optional[str] = None,
+    email: Optional[str] = None,
+    tool: Optional[str] = None,
+    days: Optional[float] = None,
+    limit: int = 50,
+) -> Dict[str, Any]:
+    """
+    Token totals per `group_by` (loan, rule, user, tool or model), most
+    tokens first. Cost uses llm_prompt_cost_per_1k / llm_completion_cost_per_1k.
+    """
+    if group_by not in GROUPS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid group_by. Must be one of: {', '.join(GROUPS)}"
+        )
+
+    match: Dict[str, Any] = {}
+    if loanID is not None:
+        match["loanID"] = loanID
+    if email is not None:
+        match["email"] = email
+    if tool is not None:
+        match["tool"] = tool
+    if days is not None:
+        match["created_at"] = {"$gte": datetime.utcnow() - timedelta(days=days)}
+
+    pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": GROUPS[group_by],
+            "invocations": {"$sum": {"$cond": ["$cache_hit", 0, 1]}},
+            "cache_hits": {"$sum": {"$cond": ["$cache_hit", 1, 0]}},
+            "errors": {"$sum": {"$cond": [{"$in": ["$outcome", list(FAILED_OUTCOMES)]}, 1, 0]}},
+            "llm_calls": {"$sum": "$llm_calls"},
+            "prompt_tokens": {"$sum": "$prompt_tokens"},
+            "completion_tokens": {"$sum": "$completion_tokens"},
+            "total_tokens": {"$sum": "$total_tokens"},
+            "cost": {"$sum": _cost_expression()},
+            "duration_ms": {"$sum": "$duration_ms"},
+            "last_at": {"$max": "$created_at"},
+        }},
+        {"$sort": {"total_tokens": -1}},
+        {"$limit": limit},
+    ]
+
+    groups = []
+    async for doc in db[LEDGER].aggregate(pipeline):
+        key = doc.pop("_id")
+        lookups = doc["invocations"] + doc["cache_hits"]
+        doc["cache_hit_ratio"] = round(doc["cache_hits"] / lookups, 3) if lookups else 0.0
+        doc["avg_duration_ms"] = round(doc["duration_ms"] / doc["invocations"], 1) if doc["invocations"] else 0.0
+        doc["duration_ms"] = round(doc["duration_ms"], 1)
+        doc["cost"] = round(doc["cost"], 4)
+        groups.append({**key, **doc})
+    return {"group_by": group_by, "groups": groups}
@@ -5,7 +5,7 @@ from fastapi import HTTPException, status
 from app.models.user import UpdatePasswordRequest, VerifyCodeRequest
 from app.db import get_collection
 from app.services.send_code import verify_otp_code
-from app.utils.security import hash_password
+from app.utils.security import hash_password_async
 
 
 def validate_password_rules(pwd: str) -> None:
@@ -44,7 +44,7 @@ async def update_password(payload: UpdatePasswordRequest) -> Any:
     await verify_otp_code(VerifyCodeRequest(email=email, code=code))
 
     # 3) hash the new password
-    hashed = hash_password(password)
+    hashed = await hash_password_async(password)
 
     # 4) update user document
     users_coll = get_collection("users")
@@ -1,44 +1,188 @@
+import base64
+import json
+import logging
 from datetime import datetime
-from typing import List, Optional
-from pydantic import BaseModel
+from typing import List, Optional, Tuple
 
+from fastapi import HTTPException
+from pymongo import ASCENDING, DESCENDING, UpdateOne
 
-class UploadedDataOut(BaseModel):
-    loanID: str
-    file_name: str
-    updated_at: Optional[datetime]
-    borrower: List[str]   # ✅ Always a list now
-    analyzed_data : bool
+from app.models.uploaded_data import UploadedDataOut
 
+logger = logging.getLogger(__name__)
 
-async def get_uploaded_data_by_email(db, email: str):
-    cursor = db["uploadedData"].find({"email": email})
-    results = []
+SUMMARIES = "loanSummaries"
 
-    async for record in cursor:
-        borrowers = []
-        if record.get("cleaned_data") and isinstance(record["cleaned_data"], dict):
-            borrowers = list(record["cleaned_data"].keys())
+# Format of the created_at / updated_at strings stored on uploadedData
+TIMESTAMP_FORMAT = "%Y-%m-%d %I:%M:%S %p"
 
-        updated_at = record.get("updated_at")
-        if isinstance(updated_at, str):
-            try:
-                updated_at = datetime.strptime(updated_at, "%Y-%m-%d %I:%M:%S %p")
-            except Exception:
-                updated_at = None
+BACKFILL_BATCH = 500
 
-        # ✅ New flag
-        analyzed_flag = "analyzed_data" in record
+# What a summary created by a partial write (e.g. analyzed data saved before
+# the upload's own summary) holds until the missing fields are set
+SUMMARY_DEFAULTS = {"file_name": None, "borrower": [], "analyzed_data": False}
 
-        results.append(
-            UploadedDataOut(
-                loanID=record.get("loanID"),
-                file_name=record.get("file_name"),
-                updated_at=updated_at,
-                borrower=borrowers,
-                analyzed_data=analyzed_flag,
-            )
-        )
 
-    return results
+def parse_timestamp(value) -> Optional[datetime]:
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, str):
+        try:
+            return datetime.strptime(value, TIMESTAMP_FORMAT)
+        except ValueError:
+            return None
+    return None
 
+
+def borrower_names(cleaned_data) -> List[str]:
+    return list(cleaned_data.keys()) if isinstance(cleaned_data, dict) else []
+
+
+# ---------------------------------------------------------------------
+# loanSummaries: one small document per (email, loanID), kept in step by
+# every write path in main.py so the dashboard list never has to read
+# uploadedData. Written right after the loan itself (not transactional);
+# backfill_loan_summaries() rebuilds it from scratch if ever needed.
+# ---------------------------------------------------------------------
+async def upsert_loan_summary(db, loanID: str, email: str, updated_at: str, **fields):
+    """
+    Set `fields` (file_name, borrower, analyzed_data) and updated_at on the
+    loan's summary, creating it if needed. A created summary gets
+    SUMMARY_DEFAULTS for the fields not given, so it always reads back as
+    an UploadedDataOut.
+    """
+    defaults = {k: v for k, v in SUMMARY_DEFAULTS.items() if k not in fields}
+    await db[SUMMARIES].update_one(
+        {"email": email, "loanID": loanID},
+        {
+            "$set": {**fields, "updated_at": parse_timestamp(updated_at)},
+            "$setOnInsert": {"email": email, "loanID": loanID, **defaults},
+        },
+        upsert=True,
+    )
+
+
+async def backfill_loan_summaries(db) -> int:
+    """Rebuild loanSummaries from uploadedData without loading full documents."""
+    pipeline = [{"$project": {
+        "_id": 1,
+        "loanID": 1,
+        "email": 1,
+        "file_name": 1,
+        "created_at": 1,
+        "updated_at": 1,
+        "borrower": {"$map": {
+            "input": {"$objectToArray": {"$ifNull": ["$cleaned_data", {}]}},
+            "in": "$$this.k",
+        }},
+        # A missing field sorts below null, so this is "analyzed_data exists"
+        "analyzed_data": {"$gt": ["$analyzed_data", None]},
+    }}]
+
+    written, batch = 0, []
+    async for doc in db["uploadedData"].aggregate(pipeline):
+        # updated_at drives the keyset sort, so it must never be empty
+        updated_at = (parse_timestamp(doc.get("updated_at"))
+                      or parse_timestamp(doc.get("created_at"))
+                      or doc["_id"].generation_time.replace(tzinfo=None))
+        batch.append(UpdateOne(
+            {"email": doc.get("email"), "loanID": doc.get("loanID")},
+            {"$set": {
+                "file_name": doc.get("file_name"),
+                "borrower": doc.get("borrower") or [],
+                "analyzed_data": bool(doc.get("analyzed_data")),
+                "updated_at": updated_at,
+            }},
+            upsert=True,
+        ))
+        if len(batch) >= BACKFILL_BATCH:
+            written += len(batch)
+            await db[SUMMARIES].bulk_write(batch, ordered=False)
+            batch = []
+    if batch:
+        written += len(batch)
+        await db[SUMMARIES].bulk_write(batch, ordered=False)
+
+    logger.info(f"Backfilled {written} loan summaries")
+    return written
+
+
+async def ensure_loan_summaries(db) -> None:
+    """One-time backfill on first start after loanSummaries was introduced."""
+    if await db[SUMMARIES].estimated_document_count() == 0 \
+            and await db["uploadedData"].estimated_document_count() > 0:
+        await backfill_loan_summaries(db)
+
+
+# ---------- Keyset pagination ----------
+SORT_KEYS = {
+    # updated_at is not unique, loanID breaks ties (unique per email)
+    "updated_at": ["updated_at", "loanID"],
+    "loanID": ["loanID"],
+}
+
+
+def encode_cursor(doc: dict, sort: str) -> str:
+    values = [doc[field] for field in SORT_KEYS[sort]]
+    values = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor: str, sort: str) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if len(values) != len(SORT_KEYS[sort]):
+            raise ValueError("cursor does not match sort")
+        if sort == "updated_at":
+            values[0] = datetime.fromisoformat(values[0])
+        return values
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset_filter(fields: List[str], values: list, descending: bool) -> dict:
+    """Documents strictly after `values` in (fields...) order."""
+    op = "$lt" if descending else "$gt"
+    clauses = []
+    for i, field in enumerate(fields):
+        clause = {f: values[j] for j, f in enumerate(fields[:i])}
+        clause[field] = {op: values[i]}
+        clauses.append(clause)
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+
+async def get_uploaded_data_by_email(
+    db,
+    email: str,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    sort: str = "updated_at",
+    order: str = "desc",
+) -> Tuple[List[UploadedDataOut], Optional[str]]:
+    """
+    One page of the user's loans from loanSummaries, plus the cursor of the
+    next page (None on the last page). Without `limit` every loan is returned.
+    """
+    fields = SORT_KEYS[sort]
+    descending = order == "desc"
+    direction = DESCENDING if descending else ASCENDING
+
+    query = {"email": email}
+    if cursor:
+        query.update(keyset_filter(fields, decode_cursor(cursor, sort), descending))
+
+    find = db[SUMMARIES].find(
+        query,
+        {"_id": 0, "loanID": 1, "file_name": 1, "updated_at": 1, "borrower": 1, "analyzed_data": 1},
+    ).sort([(f, direction) for f in fields])
+    if limit:
+        # One extra row tells us whether another page exists
+        find = find.limit(limit + 1)
+    docs = await find.to_list(length=None)
+
+    next_cursor = None
+    if limit and len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1], sort)
+
+    return [UploadedDataOut(**doc) for doc in docs], next_cursor
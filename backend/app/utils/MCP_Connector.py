@@ -1,37 +1,353 @@
-from mcp import ClientSession
+import asyncio
+import logging
+import random
+import time
+
+import anyio
+from mcp import ClientSession, types
 from mcp.client.streamable_http import streamablehttp_client
 from contextlib import AsyncExitStack
+from opentelemetry.trace import SpanKind, Status, StatusCode
+
+from app.utils.metrics import observe_mcp_call
+from app.utils.tracing import inject_context, traced_http_client_factory, tracer
+
+logger = logging.getLogger(__name__)
+
+
+class MCPUnavailableError(Exception):
+    """The MCP server cannot be reached right now (breaker open or backing off)."""
+
+
+class MCPDeadlineExceeded(Exception):
+    """The caller's deadline ran out before the tool call finished."""
+
+
+def _root_cause(error: BaseException) -> BaseException:
+    # anyio task groups wrap transport errors in (nested) exception groups
+    while isinstance(error, BaseExceptionGroup) and error.exceptions:
+        error = error.exceptions[0]
+    return error
+
+
+class _SentRequestIds:
+    """
+    Session write stream that remembers the JSON-RPC id of the last request
+    each task sent. ClientSession writes a request from the caller's task,
+    so an abandoned call can name its own request in notifications/cancelled.
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._last: dict = {}
+
+    async def send(self, message):
+        root = message.message.root
+        task = asyncio.current_task()
+        if isinstance(root, types.JSONRPCRequest) and task is not None:
+            self._last[task] = root.id
+        await self._stream.send(message)
+
+    def pop(self, task):
+        return self._last.pop(task, None)
+
+    async def aclose(self):
+        await self._stream.aclose()
+
+    async def __aenter__(self):
+        await self._stream.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return await self._stream.__aexit__(*exc_info)
+
+
+class CircuitBreaker:
+    """
+    closed    -> calls go through; `failure_threshold` consecutive failures open it
+    open      -> calls fail immediately until `reset_timeout` has passed
+    half_open -> a single probe call is let through; success closes, failure re-opens
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.consecutive_failures = 0
+        self.times_opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def before_call(self) -> None:
+        state = self.state
+        if state == self.CLOSED:
+            return
+        if state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return
+        self.rejected += 1
+        raise MCPUnavailableError(f"MCP circuit breaker is {state}")
+
+    def release_probe(self) -> None:
+        """Let another probe through if the current one was abandoned."""
+        self._probe_in_flight = False
+
+    def record_success(self) -> None:
+        self._state = self.CLOSED
+        self._probe_in_flight = False
+        self.consecutive_failures = 0
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        if self._state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self._state != self.OPEN:
+                self.times_opened += 1
+                logger.warning(
+                    f"MCP circuit breaker opened after {self.consecutive_failures} failures")
+            self._state = self.OPEN
+            self._opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+        }
+
 
 class MCPClient:
-    def __init__(self, server_url: str):
+    def __init__(
+        self,
+        server_url: str,
+        call_timeout: float = 300.0,
+        connect_timeout: float = 10.0,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        max_reconnect_backoff: float = 30.0,
+    ):
         self.server_url = server_url
         self.session: ClientSession | None = None
+        self._sent: _SentRequestIds | None = None
         self.exit_stack = AsyncExitStack()
-        self._streams_context = None
-        self._session_context = None
+        self._runner: asyncio.Task | None = None
+        self._stop: asyncio.Event | None = None
+
+        self.call_timeout = call_timeout
+        self.connect_timeout = connect_timeout
+        self.max_reconnect_backoff = max_reconnect_backoff
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self._connect_lock = asyncio.Lock()
+        self._connect_failures = 0
+        self._next_connect_at = 0.0
+        self.timeouts = 0
+        self.reconnects = 0
+        self.cancelled = 0
+        self._pending_notifications: set = set()
 
     async def connect(self, headers=None):
-        self._streams_context = streamablehttp_client(
-            url=self.server_url, headers=headers or {}
-        )
-        read_stream, write_stream, _ = await self._streams_context.__aenter__()
-        self._session_context = ClientSession(read_stream, write_stream)
-        self.session = await self._session_context.__aenter__()
-        await self.session.initialize()
-
-    async def call_tool(self, tool_name, arguments):
+        """
+        Open the session in a dedicated task. The transport and session
+        contexts must be entered and exited by the same task (anyio task
+        groups), so request handlers only ever borrow `self.session`.
+        """
+        ready = asyncio.get_running_loop().create_future()
+        self._stop = asyncio.Event()
+        self._runner = asyncio.create_task(self._run_session(headers, ready))
+        try:
+            await ready
+        except BaseException:
+            await self.cleanup()
+            raise
+
+    async def _run_session(self, headers, ready):
+        try:
+            async with streamablehttp_client(
+                    url=self.server_url, headers=headers or {},
+                    httpx_client_factory=traced_http_client_factory) as (read_stream, write_stream, _):
+                sent = _SentRequestIds(write_stream)
+                async with ClientSession(read_stream, sent) as session:
+                    await session.initialize()
+                    self.session, self._sent = session, sent
+                    ready.set_result(None)
+                    await self._stop.wait()
+        except Exception as e:
+            if not ready.done():
+                ready.set_exception(e)
+            else:
+                logger.warning(f"MCP session closed: {_root_cause(e)!r}")
+        finally:
+            self.session = self._sent = None
+            if not ready.done():
+                ready.cancel()
+
+    async def ensure_connected(self):
+        """(Re)connect if needed, honouring the jittered reconnect backoff."""
+        if self.session is not None:
+            return
+        async with self._connect_lock:
+            if self.session is not None:
+                return
+            wait = self._next_connect_at - time.monotonic()
+            if wait > 0:
+                raise MCPUnavailableError(
+                    f"MCP reconnect backing off for another {wait:.1f}s")
+            try:
+                await asyncio.wait_for(self.connect(), timeout=self.connect_timeout)
+            except Exception as e:
+                await self._safe_cleanup()
+                self._connect_failures += 1
+                delay = min(self.max_reconnect_backoff, 2 ** (self._connect_failures - 1))
+                self._next_connect_at = time.monotonic() + delay * random.uniform(0.5, 1.0)
+                raise MCPUnavailableError(
+                    f"MCP connect failed: {_root_cause(e)!r}") from e
+            self._connect_failures = 0
+            self._next_connect_at = 0.0
+            self.reconnects += 1
+
+    async def _call_once(self, tool_name, arguments, meta, timeout):
+        await self.ensure_connected()
+        session, sent = self.session, self._sent
+        task = asyncio.current_task()
+        sent.pop(task)
         try:
-            return await self.session.call_tool(tool_name, arguments)
+            with anyio.fail_after(timeout):
+                return await session.call_tool(tool_name, arguments, meta=meta)
+        except (asyncio.CancelledError, TimeoutError):
+            request_id = sent.pop(task)
+            if request_id is not None:
+                self._notify_cancelled(session, request_id, tool_name)
+            raise
+        finally:
+            sent.pop(task)
+
+    def _notify_cancelled(self, session, request_id, tool_name):
+        """Tell the server to stop working on an abandoned call (best effort)."""
+        async def send():
+            try:
+                await session.send_notification(types.ClientNotification(
+                    types.CancelledNotification(
+                        params=types.CancelledNotificationParams(
+                            requestId=request_id, reason="client cancelled"),
+                    )
+                ))
+            except Exception as e:
+                logger.debug(f"Could not send cancellation for {tool_name}: {e}")
+
+        self.cancelled += 1
+        # Runs in its own task: the caller is being cancelled and must not await
+        task = asyncio.create_task(send())
+        self._pending_notifications.add(task)
+        task.add_done_callback(self._pending_notifications.discard)
+
+    async def call_tool(self, tool_name, arguments, meta=None, deadline=None):
+        """
+        `deadline` is an absolute epoch time. It bounds this call and is
+        forwarded in `_meta` so the server can stop its own work in time.
+        """
+        started = time.monotonic()
+        outcome = "error"
+        with tracer.start_as_current_span(
+                f"mcp.call_tool {tool_name}", kind=SpanKind.CLIENT, attributes={"mcp.tool": tool_name}) as span:
+            try:
+                # The transport posts from its own task, so the context rides in _meta
+                result = await self._call_tool(tool_name, arguments, inject_context(meta), deadline)
+                outcome = "ok"
+                return result
+            except MCPDeadlineExceeded:
+                outcome = "deadline"
+                raise
+            except MCPUnavailableError:
+                outcome = "unavailable"
+                raise
+            except asyncio.CancelledError:
+                outcome = "cancelled"
+                raise
+            finally:
+                span.set_attribute("mcp.outcome", outcome)
+                if outcome != "ok":
+                    span.set_status(Status(StatusCode.ERROR, outcome))
+                observe_mcp_call(tool_name, time.monotonic() - started, outcome)
+
+    async def _call_tool(self, tool_name, arguments, meta, deadline):
+        timeout = self.call_timeout
+        if deadline is not None:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                raise MCPDeadlineExceeded(f"Deadline passed before calling {tool_name}")
+            timeout = min(timeout, remaining)
+            meta = {**(meta or {}), "deadline": deadline}
+
+        # Fail fast while the server is known to be down
+        self.breaker.before_call()
+        started = time.monotonic()
+        try:
+            try:
+                result = await self._call_once(tool_name, arguments, meta, timeout)
+            except (TimeoutError, MCPUnavailableError):
+                raise
+            except Exception:
+                # Broken session: reconnect once and retry
+                await self._safe_cleanup()
+                remaining = timeout - (time.monotonic() - started)
+                if remaining <= 0:
+                    raise TimeoutError()
+                result = await self._call_once(tool_name, arguments, meta, remaining)
+        except asyncio.CancelledError:
+            self.breaker.release_probe()
+            raise
+        except TimeoutError:
+            if timeout < self.call_timeout:
+                # The caller's budget ran out; that says nothing about server health
+                self.breaker.release_probe()
+                raise MCPDeadlineExceeded(
+                    f"MCP call {tool_name} exceeded the request deadline")
+            self.timeouts += 1
+            self.breaker.record_failure()
+            raise MCPUnavailableError(
+                f"MCP call {tool_name} timed out after {self.call_timeout}s")
         except Exception:
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        return result
+
+    async def _safe_cleanup(self):
+        try:
             await self.cleanup()
-            await self.connect()
-            return await self.session.call_tool(tool_name, arguments)
+        except Exception as e:
+            logger.warning(f"Error while dropping MCP session: {e}")
 
     async def cleanup(self):
-        if self._session_context:
-            await self._session_context.__aexit__(None, None, None)
-            self._session_context = None
-        if self._streams_context:
-            await self._streams_context.__aexit__(None, None, None)
-            self._streams_context = None
         self.session = None
+        if self._stop is not None:
+            self._stop.set()
+        runner, self._runner = self._runner, None
+        if runner is not None and not runner.done():
+            try:
+                await asyncio.wait_for(runner, timeout=self.connect_timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> dict:
+        return {
+            "connected": self.session is not None,
+            "breaker": self.breaker.stats(),
+            "timeouts": self.timeouts,
+            "reconnects": self.reconnects,
+            "cancelled": self.cancelled,
+            "reconnect_backoff_seconds": round(max(0.0, self._next_connect_at - time.monotonic()), 3),
+        }
@@ -3,11 +3,26 @@ from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from app.config import settings
 from app.db import db
+from app.utils.lru_cache import LRUCache
 
 # Swagger expects a tokenUrl for OAuth2 flow. 
 # We'll point it to /auth/token (an alias of login).
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 
+# Resolved principals, keyed by (user id, token). jwt.decode still runs on
+# every request, so an expired token is rejected even while cached. Entries
+# live principal_cache_ttl_seconds; admin status changes and deletes evict
+# them at once in this worker, other workers catch up within the TTL.
+principal_cache = LRUCache(
+    max_entries=settings.principal_cache_max_entries,
+    ttl_seconds=settings.principal_cache_ttl_seconds,
+)
+
+
+def evict_principal(user_id: str) -> int:
+    return principal_cache.evict_where(lambda key: key[0] == user_id)
+
+
 async def get_current_user(token: str = Depends(oauth2_scheme)):
     try:
         payload = jwt.decode(
@@ -19,15 +34,28 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         if email is None:
             raise HTTPException(status_code=401, detail="Invalid token")
 
-        user = await db["users"].find_one({"email": email})
+        # Login tokens carry the user id in "sub"; that is what evictions match
+        user_id = payload.get("sub")
+        caching = settings.principal_cache_ttl_seconds > 0 and user_id is not None
+        key = (user_id, token)
+        if caching:
+            principal = principal_cache.get(key)
+            if principal is not None:
+                return principal
+
+        user = await db["users"].find_one(
+            {"email": email}, {"username": 1, "email": 1, "created_at": 1})
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
 
-        return {
+        principal = {
             "id": str(user["_id"]),
             "username": user["username"],
             "email": user["email"],
             "created_at": user["created_at"],
         }
+        if caching:
+            principal_cache.set(key, principal)
+        return principal
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
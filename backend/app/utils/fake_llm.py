@@ -0,0 +1,122 @@
+import asyncio
+import json
+import random
+import re
+import time
+from typing import Any, List, Optional
+
+import httpx
+import openai
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+
+# Matches the ```json schema``` block emitted by PydanticOutputParser
+_SCHEMA_BLOCK = re.compile(r"```(?:json)?\s*(\{.*?\})\s*```", re.DOTALL)
+
+
+def _sample(schema: dict, defs: dict, name: str = "") -> Any:
+    """Build the smallest value that satisfies a JSON schema fragment."""
+    if "$ref" in schema:
+        return _sample(defs.get(schema["$ref"].split("/")[-1], {}), defs, name)
+    if "enum" in schema:
+        return schema["enum"][0]
+    if "const" in schema:
+        return schema["const"]
+    if "anyOf" in schema:
+        return _sample(schema["anyOf"][0], defs, name)
+
+    kind = schema.get("type")
+    if kind == "object" or "properties" in schema:
+        return {k: _sample(v, defs, k) for k, v in schema.get("properties", {}).items()}
+    if kind == "array":
+        items = schema.get("items")
+        return [_sample(items, defs, name)] if items else []
+    if kind in ("integer", "number"):
+        return 0
+    if kind == "boolean":
+        return False
+    # Formula fields are evaluated by math_tool, so keep them numeric
+    return "0" if "formula" in name.lower() else "fake"
+
+
+def fake_answer(prompt: str) -> str:
+    """Return a JSON document matching the last output schema in `prompt`."""
+    blocks = _SCHEMA_BLOCK.findall(prompt)
+    if not blocks:
+        return "{}"
+    try:
+        schema = json.loads(blocks[-1])
+    except json.JSONDecodeError:
+        return "{}"
+    return json.dumps(_sample(schema, schema.get("$defs", {})))
+
+
+def throttle_error(retry_after: float = 1.0) -> openai.RateLimitError:
+    """Build the same exception the OpenAI client raises on HTTP 429."""
+    request = httpx.Request("POST", "http://fake-llm.local/chat/completions")
+    response = httpx.Response(
+        429, request=request, headers={"retry-after": str(retry_after)})
+    return openai.RateLimitError("Rate limit reached (fake)", response=response, body=None)
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Offline stand-in for AzureChatOpenAI.
+
+    Answers every prompt with a schema-valid JSON document, reports token
+    usage the way langchain_openai does, and can simulate latency and
+    429 throttling so the scheduler and agents can be exercised locally.
+    """
+
+    latency: float = 0.0
+    throttle_rate: float = 0.0
+    model_name: str = "fake-chat"
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def bind_tools(self, tools, **kwargs):
+        # The fake never emits tool calls, so binding is a no-op
+        return self
+
+    def _result(self, messages: List[BaseMessage]) -> ChatResult:
+        if self.throttle_rate and random.random() < self.throttle_rate:
+            raise throttle_error()
+
+        prompt = "\n".join(str(m.content) for m in messages)
+        text = fake_answer(prompt)
+        prompt_tokens = max(1, len(prompt) // 4)
+        completion_tokens = max(1, len(text) // 4)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+        message = AIMessage(
+            content=text,
+            usage_metadata={
+                "input_tokens": prompt_tokens,
+                "output_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+            response_metadata={"model_name": self.model_name},
+        )
+        return ChatResult(
+            generations=[ChatGeneration(message=message)],
+            llm_output={"token_usage": usage, "model_name": self.model_name},
+        )
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._result(messages)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager=None, **kwargs) -> ChatResult:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._result(messages)
@@ -0,0 +1,219 @@
+"""
+Explain checker for the Mongo query shapes used by the API.
+
+Every filter the code base sends to MongoDB is registered in QUERY_SHAPES.
+check_query_plans() asks the server for the winning plan of each shape and
+flags any that fall back to a collection scan (COLLSCAN). When a new query
+is added, register its shape here as well. Aggregations are registered by
+their leading $match (and $sort); shapes that read a whole collection on
+purpose (backfills, migrations) are registered with full_scan=True.
+
+index_serving() answers the same question without a server, from the
+specs in app/db.py (INDEXES); tests/test_indexes.py runs it in CI.
+
+Run against a database (exit code 1 when a shape scans a collection):
+
+    python -m app.utils.index_advisor
+
+or set INDEX_CHECK_ON_STARTUP=1 to make the API refuse to start instead.
+"""
+import asyncio
+import logging
+import sys
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+
+class QueryShape(BaseModel):
+    name: str
+    collection: str
+    filter: Dict[str, Any]
+    sort: Optional[Dict[str, int]] = None
+    limit: int = 0
+    aggregate: bool = False
+    full_scan: bool = False
+
+
+# Placeholder values; only the shape of the filter matters to the planner
+QUERY_SHAPES: List[QueryShape] = [
+    # main.py
+    QueryShape(name="uploadedData by loanID+email", collection="uploadedData",
+               filter={"loanID": "L", "email": "e"}, limit=1),
+    # app/services/uploaded_data.py
+    QueryShape(name="loanSummaries page by updated_at", collection="loanSummaries",
+               filter={"email": "e"}, sort={"updated_at": -1, "loanID": -1}, limit=51),
+    QueryShape(name="loanSummaries page by loanID", collection="loanSummaries",
+               filter={"email": "e", "loanID": {"$gt": "L"}}, sort={"loanID": 1}, limit=51),
+    # Rebuilds every summary, so it reads the whole collection by design
+    QueryShape(name="uploadedData summary backfill", collection="uploadedData",
+               filter={}, aggregate=True, full_scan=True),
+    # app/services/auth_service.py, update_password.py, app/utils/deps.py
+    QueryShape(name="users by email", collection="users",
+               filter={"email": "e"}, limit=1),
+    # app/services/admin_service.py
+    QueryShape(name="users page", collection="users",
+               filter={"_id": {"$gt": "x"}}, sort={"_id": 1}, limit=101),
+    QueryShape(name="users page by status", collection="users",
+               filter={"status": "pending", "_id": {"$gt": "x"}}, sort={"_id": 1}, limit=101),
+    QueryShape(name="users page by type", collection="users",
+               filter={"type": "company"}, sort={"_id": 1}, limit=101),
+    QueryShape(name="users page by status+type", collection="users",
+               filter={"status": "active", "type": "company"}, sort={"_id": 1}, limit=101),
+    QueryShape(name="users by _id", collection="users",
+               filter={"_id": "x"}, limit=1),
+    # app/services/send_code.py
+    QueryShape(name="verification_codes by email", collection="verification_codes",
+               filter={"email": "e"}, limit=1),
+    QueryShape(name="verification_codes by _id", collection="verification_codes",
+               filter={"_id": "x"}, limit=1),
+    # app/services/blob_store.py
+    QueryShape(name="rawBlobs manifest", collection="rawBlobs",
+               filter={"_id": "h"}, limit=1),
+    QueryShape(name="rawBlobChunks of a blob", collection="rawBlobChunks",
+               filter={"blob": "h"}, sort={"n": 1}),
+    # One-off migration of inline payloads (python -m app.services.blob_store)
+    QueryShape(name="uploadedData inline payloads", collection="uploadedData",
+               filter={"original_data": {"$exists": True}}, limit=100, full_scan=True),
+    # app/services/task_queue.py
+    QueryShape(name="tasks claim", collection="tasks",
+               filter={"status": {"$in": ["queued", "running"]}, "available_at": {"$lte": "t"}},
+               sort={"available_at": 1}, limit=1),
+    QueryShape(name="tasks by _id", collection="tasks",
+               filter={"_id": "x"}, limit=1),
+    QueryShape(name="tasks by status", collection="tasks",
+               filter={"status": "done"}),
+    # app/services/token_ledger.py
+    QueryShape(name="llmUsage of a loan", collection="llmUsage",
+               filter={"loanID": "L", "email": "e"}),
+    QueryShape(name="llmUsage of a user", collection="llmUsage",
+               filter={"email": "e", "created_at": {"$gte": "t"}}),
+    QueryShape(name="llmUsage summary of a loan", collection="llmUsage",
+               filter={"loanID": "L", "email": "e"}, aggregate=True),
+    QueryShape(name="llmUsage summary of a user", collection="llmUsage",
+               filter={"email": "e", "created_at": {"$gte": "t"}}, aggregate=True),
+    QueryShape(name="llmUsage summary of recent days", collection="llmUsage",
+               filter={"created_at": {"$gte": "t"}}, aggregate=True),
+    # No filter: the whole ledger, which llm_usage_retention_seconds keeps bounded
+    QueryShape(name="llmUsage summary", collection="llmUsage",
+               filter={}, aggregate=True, full_scan=True),
+    # Audit trail of a loan
+    QueryShape(name="auditLogs by loanID", collection="auditLogs",
+               filter={"loanID": "L"}, sort={"timestamp": -1}),
+]
+
+
+def plan_stages(plan: Dict[str, Any]) -> List[str]:
+    """Flatten the stage names of an explain() plan tree."""
+    stages = [plan.get("stage", "?")]
+    if "inputStage" in plan:
+        stages += plan_stages(plan["inputStage"])
+    for child in plan.get("inputStages", []):
+        stages += plan_stages(child)
+    return stages
+
+
+def winning_plan(explain: Dict[str, Any]) -> Dict[str, Any]:
+    planner = explain.get("queryPlanner")
+    if planner is None:
+        # Aggregation that was not pushed down entirely: the find is the $cursor stage
+        stages = explain.get("stages") or [{}]
+        planner = stages[0].get("$cursor", {}).get("queryPlanner", {})
+    plan = planner.get("winningPlan", {})
+    # Slot-based engine (MongoDB 7+) nests the classic tree under queryPlan
+    return plan.get("queryPlan", plan)
+
+
+def explain_command(shape: QueryShape) -> Dict[str, Any]:
+    if shape.aggregate:
+        pipeline: List[Dict[str, Any]] = [{"$match": shape.filter}]
+        if shape.sort:
+            pipeline.append({"$sort": shape.sort})
+        if shape.limit:
+            pipeline.append({"$limit": shape.limit})
+        return {"aggregate": shape.collection, "pipeline": pipeline, "cursor": {}}
+
+    command: Dict[str, Any] = {"find": shape.collection, "filter": shape.filter}
+    if shape.sort:
+        command["sort"] = shape.sort
+    if shape.limit:
+        command["limit"] = shape.limit
+    return command
+
+
+async def explain_shape(db, shape: QueryShape) -> Dict[str, Any]:
+    explain = await db.command("explain", explain_command(shape), verbosity="queryPlanner")
+    stages = plan_stages(winning_plan(explain))
+    return {
+        "name": shape.name,
+        "collection": shape.collection,
+        "stages": stages,
+        "collscan": "COLLSCAN" in stages,
+        "full_scan": shape.full_scan,
+    }
+
+
+def needs_index(result: Dict[str, Any]) -> bool:
+    return result["collscan"] and not result["full_scan"]
+
+
+async def check_query_plans(db, shapes: Optional[List[QueryShape]] = None) -> List[Dict[str, Any]]:
+    """Explain every registered shape; entries for which needs_index() is true fail the check."""
+    results = []
+    for shape in shapes or QUERY_SHAPES:
+        result = await explain_shape(db, shape)
+        if needs_index(result):
+            logger.error(f"COLLSCAN for query shape '{shape.name}': {result['stages']}")
+        results.append(result)
+    return results
+
+
+def _fields(spec: Dict[str, Any]) -> List[str]:
+    return [field for field in spec if not field.startswith("$")]
+
+
+IndexSpec = Tuple[str, List[Tuple[str, int]], Dict[str, Any]]
+
+
+def index_serving(shape: QueryShape, indexes: Sequence[IndexSpec]) -> Optional[str]:
+    """
+    Name of an index spec (collection, keys, options) that serves `shape`:
+    its leading field is filtered on, and its first keys are exactly the
+    filtered and sorted fields, so the planner can bound the scan and skip
+    the in-memory sort. Every collection has the implicit `_id_` index.
+    None means the shape would scan the collection.
+    """
+    fields = set(_fields(shape.filter)) | set(shape.sort or {})
+    candidates = [("_id_", [("_id", 1)])] + [
+        (options["name"], keys) for collection, keys, options in indexes
+        if collection == shape.collection
+    ]
+    for name, keys in candidates:
+        prefix = [field for field, _ in keys[:len(fields)]]
+        if fields and prefix[0] in shape.filter and set(prefix) == fields:
+            return name
+    return None
+
+
+async def assert_no_collscan(db) -> None:
+    failing = [r["name"] for r in await check_query_plans(db) if needs_index(r)]
+    if failing:
+        raise RuntimeError(f"Query shapes without a usable index: {', '.join(failing)}")
+
+
+async def _main() -> int:
+    from app.db import db, ensure_indexes
+
+    await ensure_indexes()
+    results = await check_query_plans(db)
+    for r in results:
+        flag = "COLLSCAN" if needs_index(r) else "full" if r["collscan"] else "ok"
+        print(f"{flag:8} {r['collection']:20} {r['name']}  [{' <- '.join(r['stages'])}]")
+    return 1 if any(needs_index(r) for r in results) else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(asyncio.run(_main()))
@@ -0,0 +1,420 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import AsyncCallbackHandler
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatResult, LLMResult
+
+from app.utils.metrics import ToolUsage, record_llm_call
+
+logger = logging.getLogger(__name__)
+
+# Lower value is served first
+PRIORITIES = {"interactive": 0, "batch": 1}
+DEFAULT_PRIORITY = "interactive"
+
+
+class TokenBucket:
+    """Continuous-refill bucket sized to a per-minute quota."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` can be taken (never more than a full bucket)."""
+        self._refill()
+        missing = min(amount, self.capacity) - self.tokens
+        return max(0.0, missing / self.rate)
+
+    def take(self, amount: float) -> None:
+        """Debit (or credit, if negative) the bucket. May go below zero."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+    def drain(self) -> None:
+        self._refill()
+        self.tokens = min(self.tokens, 0.0)
+
+
+def is_throttle_error(error: BaseException) -> bool:
+    return getattr(error, "status_code", None) == 429
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("retry-after-ms")
+    if value is not None:
+        try:
+            return float(value) / 1000.0
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class LLMScheduler:
+    """
+    Process-wide admission control for LLM calls.
+
+    Every chat-model call waits here until both the tokens-per-minute and
+    requests-per-minute buckets allow it. Waiters are served strictly by
+    priority class, then FIFO. A 429 from the provider pauses the whole
+    queue with exponential backoff (or the server's retry-after), instead
+    of every caller retrying on its own.
+
+    The queue lives on the event loop that first awaits acquire().
+    Synchronous callers use acquire_blocking() / call_with_retry_blocking(),
+    which queue through that loop when they run on another thread.
+    """
+
+    def __init__(
+        self,
+        tokens_per_minute: int,
+        requests_per_minute: int,
+        max_retries: int = 4,
+        base_backoff: float = 1.0,
+        max_backoff: float = 60.0,
+    ):
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.requests = TokenBucket(requests_per_minute)
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+        self._queue: list = []
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._paused_until = 0.0
+        self._backoff = 0.0
+
+        self.granted: Dict[str, int] = {p: 0 for p in PRIORITIES}
+        self.wait_seconds: Dict[str, float] = {p: 0.0 for p in PRIORITIES}
+        self.max_wait_seconds: Dict[str, float] = {p: 0.0 for p in PRIORITIES}
+        self.throttled = 0
+        self.retried = 0
+
+    # ---------- Admission ----------
+    async def acquire(self, tokens: int, priority: str = DEFAULT_PRIORITY) -> None:
+        """Wait until a call estimated at `tokens` may be sent."""
+        if priority not in PRIORITIES:
+            priority = DEFAULT_PRIORITY
+        self._loop = asyncio.get_running_loop()
+        future = self._loop.create_future()
+        heapq.heappush(self._queue, (PRIORITIES[priority], next(self._seq), tokens, priority, future))
+        started = time.monotonic()
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Leave the entry in the heap; _dispatch skips cancelled futures
+            self._dispatch()
+            raise
+
+        waited = time.monotonic() - started
+        self.wait_seconds[priority] += waited
+        self.max_wait_seconds[priority] = max(self.max_wait_seconds[priority], waited)
+
+    def _dispatch(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        while self._queue:
+            _, _, tokens, priority, future = self._queue[0]
+            if future.done():
+                heapq.heappop(self._queue)
+                continue
+
+            wait = self._admission_wait(tokens)
+            if wait > 0:
+                loop = asyncio.get_running_loop()
+                self._timer = loop.call_later(wait, self._dispatch)
+                return
+
+            heapq.heappop(self._queue)
+            self._grant(tokens, priority)
+            future.set_result(None)
+
+    def _admission_wait(self, tokens: int) -> float:
+        return max(
+            self._paused_until - time.monotonic(),
+            self.tokens.wait_time(tokens),
+            self.requests.wait_time(1),
+        )
+
+    def _grant(self, tokens: int, priority: str) -> None:
+        self.tokens.take(tokens)
+        self.requests.take(1)
+        self.granted[priority] += 1
+
+    def _queue_loop(self) -> Optional[asyncio.AbstractEventLoop]:
+        """The loop serving the queue, when it runs on another thread than the caller."""
+        loop = self._loop
+        if loop is None or not loop.is_running():
+            return None
+        try:
+            if asyncio.get_running_loop() is loop:
+                return None
+        except RuntimeError:
+            pass
+        return loop
+
+    def _on_queue_loop(self, fn: Callable[..., Any], *args) -> None:
+        """Run fn(*args) on the queue's loop, so its state is only touched from there."""
+        loop = self._queue_loop()
+        if loop is None:
+            fn(*args)
+        else:
+            loop.call_soon_threadsafe(fn, *args)
+
+    def acquire_blocking(self, tokens: int, priority: str = DEFAULT_PRIORITY) -> None:
+        """acquire() for synchronous callers; blocks the calling thread."""
+        if priority not in PRIORITIES:
+            priority = DEFAULT_PRIORITY
+        loop = self._queue_loop()
+        if loop is not None:
+            asyncio.run_coroutine_threadsafe(self.acquire(tokens, priority), loop).result()
+            return
+        # No loop elsewhere serves the queue: admit inline (a sync call made
+        # on the loop's own thread blocks it anyway, so it cannot wait in line)
+        started = time.monotonic()
+        while True:
+            wait = self._admission_wait(tokens)
+            if wait <= 0:
+                break
+            time.sleep(wait)
+        self._grant(tokens, priority)
+        waited = time.monotonic() - started
+        self.wait_seconds[priority] += waited
+        self.max_wait_seconds[priority] = max(self.max_wait_seconds[priority], waited)
+
+    def record_usage(self, estimated: int, actual: int) -> None:
+        """Correct the token bucket once the provider reports real usage."""
+        self._on_queue_loop(self.tokens.take, actual - estimated)
+
+    # ---------- Throttling ----------
+    def on_throttle(self, retry_after: Optional[float] = None) -> float:
+        self.throttled += 1
+        self._backoff = min(self.max_backoff, max(self.base_backoff, self._backoff * 2))
+        delay = retry_after if retry_after is not None else self._backoff
+        # Jitter so queued callers do not stampede the endpoint together
+        delay = delay * random.uniform(1.0, 1.25)
+        self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        # We are evidently over quota; stop trusting the local estimate
+        self.tokens.drain()
+        logger.warning(f"LLM throttled, pausing queue for {delay:.2f}s")
+        return delay
+
+    def on_success(self) -> None:
+        self._backoff = self._backoff / 2 if self._backoff > self.base_backoff else 0.0
+
+    async def call_with_retry(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run `fn`, retrying through the shared backoff on 429 responses."""
+        for attempt in itertools.count():
+            try:
+                result = await fn()
+            except Exception as e:
+                if not self._retry_throttled(e, attempt):
+                    raise
+                continue
+            self.on_success()
+            return result
+
+    def call_with_retry_blocking(self, fn: Callable[[], Any]) -> Any:
+        """call_with_retry() for a synchronous `fn`; `fn` should acquire_blocking()."""
+        for attempt in itertools.count():
+            try:
+                result = fn()
+            except Exception as e:
+                if not self._retry_throttled(e, attempt):
+                    raise
+                continue
+            self._on_queue_loop(self.on_success)
+            return result
+
+    def _retry_throttled(self, error: Exception, attempt: int) -> bool:
+        """Pause the queue for a 429 that may be retried; False to give up."""
+        if not is_throttle_error(error) or attempt >= self.max_retries:
+            return False
+        self.retried += 1
+        # Queued before the retry's acquire, so the retry sees the pause
+        self._on_queue_loop(self.on_throttle, retry_after_seconds(error))
+        return True
+
+    # ---------- Metrics ----------
+    def queue_depth(self) -> Dict[str, int]:
+        depth = {p: 0 for p in PRIORITIES}
+        for _, _, _, priority, future in self._queue:
+            if not future.done():
+                depth[priority] += 1
+        return depth
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.queue_depth(),
+            "granted": dict(self.granted),
+            "wait_seconds_total": {p: round(v, 3) for p, v in self.wait_seconds.items()},
+            "wait_seconds_max": {p: round(v, 3) for p, v in self.max_wait_seconds.items()},
+            "throttled": self.throttled,
+            "retried": self.retried,
+            "paused_for_seconds": round(max(0.0, self._paused_until - time.monotonic()), 3),
+            "backoff_seconds": round(self._backoff, 3),
+            "tokens_available": round(self.tokens.tokens, 1),
+            "requests_available": round(self.requests.tokens, 1),
+        }
+
+
+# ---------- LangChain integration ----------
+def estimate_prompt_tokens(messages) -> int:
+    chars = sum(len(str(m.content)) for batch in messages for m in batch)
+    return max(1, chars // 4)
+
+
+def reported_total_tokens(response) -> Optional[int]:
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    if usage.get("total_tokens"):
+        return int(usage["total_tokens"])
+    for generations in response.generations:
+        for generation in generations:
+            message = getattr(generation, "message", None)
+            metadata = getattr(message, "usage_metadata", None)
+            if metadata:
+                return int(metadata.get("total_tokens", 0))
+    return None
+
+
+def reported_usage(response) -> Tuple[int, int]:
+    """(prompt, completion) tokens, 0 when the provider did not report them."""
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    if usage.get("prompt_tokens") is not None:
+        return int(usage["prompt_tokens"]), int(usage.get("completion_tokens") or 0)
+    prompt = completion = 0
+    for generations in response.generations:
+        for generation in generations:
+            metadata = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+            prompt += int(metadata.get("input_tokens", 0))
+            completion += int(metadata.get("output_tokens", 0))
+    return prompt, completion
+
+
+def reported_model(response) -> str:
+    """Deployment/model name the provider answered with ("" when not reported)."""
+    model = (response.llm_output or {}).get("model_name")
+    if model:
+        return model
+    for generations in response.generations:
+        for generation in generations:
+            metadata = getattr(getattr(generation, "message", None), "response_metadata", None) or {}
+            if metadata.get("model_name"):
+                return metadata["model_name"]
+    return ""
+
+
+# Priority class of the agent run the current task belongs to (set by run_agent)
+current_priority: ContextVar[str] = ContextVar("current_priority", default=DEFAULT_PRIORITY)
+
+
+class ScheduledChatModel(BaseChatModel):
+    """
+    Chat model wrapper that admits every call through an LLMScheduler and
+    retries a throttled call by itself. A 429 therefore costs one agent
+    step, not the steps (and tokens) the agent run already completed.
+    """
+
+    model: BaseChatModel
+    scheduler: Any
+    completion_estimate: int = 512
+
+    @property
+    def _llm_type(self) -> str:
+        return f"scheduled-{self.model._llm_type}"
+
+    def bind_tools(self, tools, **kwargs):
+        # Keep the wrapped model's tool schema, but call through the wrapper
+        bound = self.model.bind_tools(tools, **kwargs)
+        return self.bind(**getattr(bound, "kwargs", {}))
+
+    def _estimate(self, messages: List[BaseMessage]) -> int:
+        return estimate_prompt_tokens([messages]) + self.completion_estimate
+
+    def _record(self, estimate: int, result: ChatResult) -> None:
+        actual = reported_total_tokens(LLMResult(generations=[result.generations],
+                                                 llm_output=result.llm_output))
+        if actual is not None:
+            self.scheduler.record_usage(estimate, actual)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs) -> ChatResult:
+        estimate = self._estimate(messages)
+        priority = current_priority.get()
+
+        def attempt() -> ChatResult:
+            self.scheduler.acquire_blocking(estimate, priority)
+            result = self.model._generate(messages, stop=stop, **kwargs)
+            self._record(estimate, result)
+            return result
+
+        return self.scheduler.call_with_retry_blocking(attempt)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager=None, **kwargs) -> ChatResult:
+        estimate = self._estimate(messages)
+        priority = current_priority.get()
+
+        async def attempt() -> ChatResult:
+            # Every attempt waits its turn, so a retry honours the throttle pause
+            await self.scheduler.acquire(estimate, priority)
+            result = await self.model._agenerate(messages, stop=stop, **kwargs)
+            self._record(estimate, result)
+            return result
+
+        return await self.scheduler.call_with_retry(attempt)
+
+
+class MetricsCallback(AsyncCallbackHandler):
+    """
+    Records duration and token usage of every chat-model call of one tool
+    run, and adds the tokens to the run's ToolUsage when one is given.
+    """
+
+    def __init__(self, tool: str, usage: Optional[ToolUsage] = None):
+        self.tool = tool
+        self.usage = usage
+        self._started: Dict[UUID, float] = {}
+
+    async def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs) -> None:
+        self._started[run_id] = time.perf_counter()
+
+    async def on_llm_end(self, response, *, run_id: UUID, **kwargs) -> None:
+        started = self._started.pop(run_id, None)
+        prompt, completion = reported_usage(response)
+        if started is not None:
+            record_llm_call(self.tool, time.perf_counter() - started, "ok", prompt, completion)
+        if self.usage is not None:
+            self.usage.add(reported_model(response), prompt, completion)
+
+    async def on_llm_error(self, error, *, run_id: UUID, **kwargs) -> None:
+        started = self._started.pop(run_id, None)
+        if started is not None:
+            record_llm_call(self.tool, time.perf_counter() - started, "error")
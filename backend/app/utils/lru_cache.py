@@ -0,0 +1,117 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Small in-process LRU cache with an optional per-entry TTL.
+    Keeps hit/miss/eviction counters so callers can expose them.
+
+    With `max_bytes`, entries are also evicted to keep the sum of
+    `sizeof(value)` under that bound (an entry larger than the bound is
+    not stored at all).
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        sizeof: Optional[Callable[[Any], int]] = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key, _MISSING)
+        if entry is _MISSING:
+            self.misses += 1
+            return default
+
+        value, expires_at, _ = entry
+        if expires_at is not None and time.monotonic() >= expires_at:
+            self._remove(key)
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        expires_at = None
+        if self.ttl_seconds is not None:
+            expires_at = time.monotonic() + self.ttl_seconds
+
+        size = 0
+        if self.max_bytes is not None:
+            size = self.sizeof(value) if self.sizeof else 0
+            if size > self.max_bytes:
+                self._remove(key)
+                return
+
+        self._remove(key)
+        self._data[key] = (value, expires_at, size)
+        self._bytes += size
+
+        while len(self._data) > self.max_entries or (
+                self.max_bytes is not None and self._bytes > self.max_bytes):
+            _, (_, _, evicted_size) = self._data.popitem(last=False)
+            self._bytes -= evicted_size
+            self.evictions += 1
+
+    def _remove(self, key: Hashable) -> Any:
+        entry = self._data.pop(key, _MISSING)
+        if entry is not _MISSING:
+            self._bytes -= entry[2]
+        return entry
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._remove(key)
+        if entry is _MISSING:
+            return default
+        return entry[0]
+
+    def evict_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Drop every entry whose key matches `predicate`. Returns the count."""
+        keys = [k for k in self._data if predicate(k)]
+        for k in keys:
+            self._remove(k)
+        self.evictions += len(keys)
+        return len(keys)
+
+    def clear(self) -> None:
+        self._data.clear()
+        self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        stats = {
+            "entries": len(self._data),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+        if self.max_bytes is not None:
+            stats["bytes"] = self._bytes
+            stats["max_bytes"] = self.max_bytes
+        return stats
@@ -0,0 +1,266 @@
+"""
+Prometheus metrics shared by the API (main.py) and the MCP server
+(mcp_server.py). Each process serves its own registry on GET /metrics.
+
+HTTP requests are labelled by route template (/view-loan, not the raw
+path), so label cardinality stays bounded. Cache hit ratios are read from
+the caches' own counters at scrape time, not duplicated here.
+"""
+import asyncio
+import functools
+import json
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Optional, Set, Tuple
+
+from mcp.types import CallToolResult, TextContent
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from pymongo import monitoring
+from starlette.responses import Response
+from starlette.routing import Match
+
+from app.utils.tracing import tracer
+
+# LLM and MCP calls take seconds to minutes; Mongo operations milliseconds
+SLOW_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ["method", "route", "status"])
+HTTP_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "HTTP requests being served", ["method", "route"])
+
+MCP_CALL_SECONDS = Histogram(
+    "mcp_client_call_duration_seconds", "MCP call_tool latency seen by the API", ["tool", "outcome"],
+    buckets=SLOW_BUCKETS)
+CLIENT_LOCK_WAIT_SECONDS = Histogram(
+    "mcp_client_lock_wait_seconds", "Time spent waiting for client_lock", ["route"], buckets=SLOW_BUCKETS)
+
+MCP_TOOL_SECONDS = Histogram(
+    "mcp_tool_duration_seconds", "MCP tool run time on the server", ["tool", "outcome"], buckets=SLOW_BUCKETS)
+LLM_CALL_SECONDS = Histogram(
+    "llm_call_duration_seconds", "Duration of one chat-model call (one agent step)", ["tool", "outcome"],
+    buckets=SLOW_BUCKETS)
+LLM_TOKENS = Counter(
+    "llm_tokens", "Tokens reported by the model", ["tool", "kind"])
+
+MONGO_OP_SECONDS = Histogram(
+    "mongo_operation_duration_seconds", "MongoDB command latency", ["command", "collection", "outcome"],
+    buckets=FAST_BUCKETS)
+
+# Tool whose run the current task belongs to (set by instrument_tool)
+current_tool: ContextVar[str] = ContextVar("current_tool", default="unknown")
+
+
+class ToolUsage:
+    """Model calls and tokens of one tool invocation, summed by MetricsCallback."""
+
+    def __init__(self):
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.llm_calls = 0
+        self.models: Set[str] = set()
+
+    def add(self, model: str, prompt_tokens: int, completion_tokens: int) -> None:
+        self.llm_calls += 1
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        if model:
+            self.models.add(model)
+
+    def as_meta(self, seconds: float, outcome: str) -> Dict[str, Any]:
+        return {
+            "model": ",".join(sorted(self.models)),
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "llm_calls": self.llm_calls,
+            "duration_ms": round(seconds * 1000, 1),
+            "outcome": outcome,
+        }
+
+
+# Usage of the tool invocation the current task belongs to (set by report_usage)
+tool_usage: ContextVar[Optional[ToolUsage]] = ContextVar("tool_usage", default=None)
+
+
+# ---------- HTTP ----------
+def route_template(scope) -> str:
+    app = scope.get("app")
+    for route in getattr(app, "routes", ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", "unknown")
+    return "unmatched"
+
+
+class PrometheusMiddleware:
+    """ASGI middleware recording latency, status and in-flight count per route."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        method, route = scope["method"], route_template(scope)
+        status = "500"
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        in_flight = HTTP_IN_FLIGHT.labels(method, route)
+        in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            in_flight.dec()
+            HTTP_REQUEST_SECONDS.labels(method, route, status).observe(time.perf_counter() - started)
+
+
+def metrics_response() -> Response:
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
+
+
+# ---------- MCP / LLM ----------
+def observe_mcp_call(tool: str, seconds: float, outcome: str) -> None:
+    MCP_CALL_SECONDS.labels(tool, outcome).observe(seconds)
+
+
+@asynccontextmanager
+async def lock_wait(lock: asyncio.Lock, route: str):
+    """`async with lock` that records how long the caller queued for it."""
+    started = time.perf_counter()
+    with tracer.start_as_current_span("client_lock.wait", attributes={"http.route": route}):
+        await lock.acquire()
+    try:
+        CLIENT_LOCK_WAIT_SECONDS.labels(route).observe(time.perf_counter() - started)
+        yield
+    finally:
+        lock.release()
+
+
+def instrument_tool(fn):
+    """Time an MCP tool; tools that return an "Error: ..." string count as errors."""
+    name = fn.__name__
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        token = current_tool.set(name)
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            result = await fn(*args, **kwargs)
+            if not (isinstance(result, str) and result.startswith("Error")):
+                outcome = "ok"
+            return result
+        finally:
+            MCP_TOOL_SECONDS.labels(name, outcome).observe(time.perf_counter() - started)
+            current_tool.reset(token)
+
+    return wrapper
+
+
+def tool_content(result: Any) -> list:
+    """A tool's return value as CallToolResult content: text as is, anything else as JSON."""
+    text = result if isinstance(result, str) else json.dumps(result, default=str)
+    return [TextContent(type="text", text=text)]
+
+
+def report_usage(fn):
+    """
+    Return the tool's result with its token usage, model and duration in the
+    CallToolResult `_meta` ("usage"), so the API can book it per loan and rule.
+    """
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        usage = ToolUsage()
+        token = tool_usage.set(usage)
+        started = time.perf_counter()
+        try:
+            result = await fn(*args, **kwargs)
+        finally:
+            tool_usage.reset(token)
+        outcome = "error" if isinstance(result, str) and result.startswith("Error") else "ok"
+        return CallToolResult(
+            content=tool_content(result),
+            _meta={"usage": usage.as_meta(time.perf_counter() - started, outcome)},
+        )
+
+    return wrapper
+
+
+def record_llm_call(tool: str, seconds: float, outcome: str, prompt_tokens: int = 0,
+                    completion_tokens: int = 0) -> None:
+    LLM_CALL_SECONDS.labels(tool, outcome).observe(seconds)
+    if prompt_tokens:
+        LLM_TOKENS.labels(tool, "prompt").inc(prompt_tokens)
+    if completion_tokens:
+        LLM_TOKENS.labels(tool, "completion").inc(completion_tokens)
+
+
+# ---------- Mongo ----------
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Command latency per (command, collection); register via event_listeners."""
+
+    def __init__(self):
+        self._collections: Dict[Tuple[Any, int], str] = {}
+
+    def started(self, event):
+        target = event.command.get(event.command_name)
+        self._collections[(event.connection_id, event.request_id)] = \
+            target if isinstance(target, str) else ""
+
+    def _observe(self, event, outcome: str):
+        collection = self._collections.pop((event.connection_id, event.request_id), "")
+        MONGO_OP_SECONDS.labels(event.command_name, collection, outcome).observe(event.duration_micros / 1e6)
+
+    def succeeded(self, event):
+        self._observe(event, "ok")
+
+    def failed(self, event):
+        self._observe(event, "error")
+
+
+mongo_command_metrics = MongoCommandMetrics()
+
+
+# ---------- Caches ----------
+class CacheCollector:
+    """Exports hits, misses and hit ratio of objects with `hits`/`misses` counters."""
+
+    def __init__(self):
+        self._caches: Dict[str, Any] = {}
+
+    def register(self, name: str, cache) -> None:
+        self._caches[name] = cache
+
+    def collect(self):
+        hits = CounterMetricFamily("cache_hits", "Cache hits", labels=["cache"])
+        misses = CounterMetricFamily("cache_misses", "Cache misses", labels=["cache"])
+        ratio = GaugeMetricFamily("cache_hit_ratio", "Hits over lookups since start", labels=["cache"])
+        for name, cache in self._caches.items():
+            lookups = cache.hits + cache.misses
+            hits.add_metric([name], cache.hits)
+            misses.add_metric([name], cache.misses)
+            ratio.add_metric([name], cache.hits / lookups if lookups else 0.0)
+        yield hits
+        yield misses
+        yield ratio
+
+    def describe(self):
+        return []
+
+
+cache_collector = CacheCollector()
+REGISTRY.register(cache_collector)
+
+
+def register_cache(name: str, cache) -> None:
+    cache_collector.register(name, cache)
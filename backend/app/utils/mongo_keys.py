@@ -0,0 +1,26 @@
+import re
+from typing import Any, Dict
+
+# '%' first on encode so an already-encoded-looking name round-trips
+_ENCODE = (("%", "%25"), (".", "%2E"), ("$", "%24"))
+_DECODE = {"%25": "%", "%2E": ".", "%24": "$"}
+_ENCODED = re.compile(r"%(?:25|2E|24)")
+
+
+def encode_key(name: str) -> str:
+    """
+    Make a user-supplied name usable as one Mongo field-path segment.
+    '.' would split the path and a leading '$' reads as an operator.
+    """
+    for raw, encoded in _ENCODE:
+        name = name.replace(raw, encoded)
+    return name
+
+
+def decode_key(key: str) -> str:
+    return _ENCODED.sub(lambda m: _DECODE[m.group(0)], key)
+
+
+def decode_keys(mapping: Dict[str, Any]) -> Dict[str, Any]:
+    """Decode the top-level keys of a map written with encode_key()."""
+    return {decode_key(k): v for k, v in mapping.items()}
@@ -0,0 +1,150 @@
+"""
+Connection-pool telemetry for the Mongo client.
+
+PoolTelemetry is registered as a pymongo ConnectionPoolListener in app/db.py
+and keeps, per server address: open connections, connections checked out,
+operations waiting for a connection, and checkout wait times. When `waiting`
+stays above zero and wait times grow, the pool (MONGO_MAX_POOL_SIZE) rather
+than the server is the bottleneck. Served under "mongo_pool" in /stats.
+"""
+import logging
+import threading
+from collections import deque
+
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+# Recent checkout waits kept per address for the percentiles
+WAIT_WINDOW = 1024
+
+
+def _percentile(values, q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+class _PoolState:
+    def __init__(self):
+        self.open = 0
+        self.in_use = 0
+        self.waiting = 0
+        self.max_in_use = 0
+        self.max_waiting = 0
+        self.checkouts = 0
+        self.checkout_failures = {}
+        self.cleared = 0
+        self.wait_total_ms = 0.0
+        self.wait_max_ms = 0.0
+        self.recent_waits = deque(maxlen=WAIT_WINDOW)
+
+    def record_wait(self, seconds: float) -> None:
+        ms = seconds * 1000
+        self.wait_total_ms += ms
+        self.wait_max_ms = max(self.wait_max_ms, ms)
+        self.recent_waits.append(ms)
+
+    def snapshot(self) -> dict:
+        recent = list(self.recent_waits)
+        return {
+            "open": self.open,
+            "in_use": self.in_use,
+            "waiting": self.waiting,
+            "max_in_use": self.max_in_use,
+            "max_waiting": self.max_waiting,
+            "checkouts": self.checkouts,
+            "checkout_failures": dict(self.checkout_failures),
+            "cleared": self.cleared,
+            "wait_ms": {
+                "mean": round(self.wait_total_ms / self.checkouts, 3) if self.checkouts else 0.0,
+                "p50": round(_percentile(recent, 0.50), 3),
+                "p95": round(_percentile(recent, 0.95), 3),
+                "p99": round(_percentile(recent, 0.99), 3),
+                "max": round(self.wait_max_ms, 3),
+            },
+        }
+
+
+class PoolTelemetry(monitoring.ConnectionPoolListener):
+    """
+    Pool counters per server. Events arrive on driver threads, so all state
+    is updated under a lock.
+    """
+
+    def __init__(self, max_pool_size: int):
+        self.max_pool_size = max_pool_size
+        self._lock = threading.Lock()
+        self._pools = {}
+
+    def _state(self, address) -> _PoolState:
+        key = f"{address[0]}:{address[1]}" if isinstance(address, tuple) else str(address)
+        state = self._pools.get(key)
+        if state is None:
+            state = self._pools[key] = _PoolState()
+        return state
+
+    def pool_created(self, event):
+        with self._lock:
+            self._state(event.address)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self._state(event.address).cleared += 1
+        logger.warning(f"Mongo connection pool for {event.address} was cleared")
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            self._state(event.address).open += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            state = self._state(event.address)
+            state.open = max(0, state.open - 1)
+
+    def connection_check_out_started(self, event):
+        with self._lock:
+            state = self._state(event.address)
+            state.waiting += 1
+            state.max_waiting = max(state.max_waiting, state.waiting)
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            state = self._state(event.address)
+            state.waiting = max(0, state.waiting - 1)
+            state.in_use += 1
+            state.max_in_use = max(state.max_in_use, state.in_use)
+            state.checkouts += 1
+            state.record_wait(event.duration)
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            state = self._state(event.address)
+            state.waiting = max(0, state.waiting - 1)
+            state.checkout_failures[event.reason] = state.checkout_failures.get(event.reason, 0) + 1
+        if event.reason == monitoring.ConnectionCheckOutFailedReason.TIMEOUT:
+            logger.warning(
+                f"Timed out after {event.duration * 1000:.0f} ms waiting for a Mongo connection "
+                f"to {event.address}; the pool (max {self.max_pool_size}) is exhausted")
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            state = self._state(event.address)
+            state.in_use = max(0, state.in_use - 1)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_pool_size": self.max_pool_size,
+                "servers": {address: state.snapshot() for address, state in self._pools.items()},
+            }
@@ -0,0 +1,113 @@
+"""
+Shared process pool for CPU-bound work (JSON cleaning, compression) so it
+runs on other cores instead of blocking the event loop.
+
+The pool is created on first use and shut down with the app. Functions
+submitted to it must be importable at module level and take/return
+picklable values. Workers are spawned, not forked, so they never inherit
+the Mongo driver's threads.
+
+run_cpu_bound() is the entry point for request handlers: small payloads
+are cheaper to process inline than to pickle across processes, so only
+payloads of at least `process_offload_min_bytes` are offloaded.
+run_offloaded() always uses the pool; both apply `process_task_timeout`
+and replace a pool whose worker died.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from fastapi import HTTPException
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+_counters = {"inline": 0, "offloaded": 0, "timeouts": 0, "broken": 0}
+
+
+def pool_size() -> int:
+    return settings.process_pool_workers or os.cpu_count() or 1
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=pool_size(),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        logger.info(f"Started process pool with {pool_size()} workers")
+    return _pool
+
+
+async def warm_up() -> None:
+    """Start the workers now so the first large upload does not pay for it."""
+    await asyncio.gather(*(run_in_process(os.getpid) for _ in range(pool_size())))
+
+
+async def run_in_process(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(get_pool(), fn, *args)
+
+
+async def run_cpu_bound(fn, payload_bytes: int, *args):
+    """
+    fn(*args) inline when the payload is small, else in the pool (see
+    run_offloaded).
+    """
+    if payload_bytes < settings.process_offload_min_bytes:
+        _counters["inline"] += 1
+        return fn(*args)
+    return await run_offloaded(fn, *args)
+
+
+async def run_offloaded(fn, *args):
+    """
+    fn(*args) in the pool with `process_task_timeout`. A timed-out task still
+    runs to completion in its worker; only the caller stops waiting for it.
+    """
+    _counters["offloaded"] += 1
+    pool = get_pool()
+    try:
+        return await asyncio.wait_for(
+            asyncio.get_running_loop().run_in_executor(pool, fn, *args), settings.process_task_timeout)
+    except asyncio.TimeoutError:
+        _counters["timeouts"] += 1
+        logger.error(f"{fn.__name__} exceeded {settings.process_task_timeout}s in the process pool")
+        raise HTTPException(status_code=504, detail="Processing the upload timed out")
+    except BrokenProcessPool:
+        # A worker died (e.g. killed for memory); start a fresh pool next time
+        _counters["broken"] += 1
+        logger.error(f"Process pool broke while running {fn.__name__}; restarting it")
+        _discard_pool(pool)
+        raise HTTPException(status_code=503, detail="Processing worker failed, please retry")
+
+
+def _discard_pool(pool: ProcessPoolExecutor) -> None:
+    global _pool
+    # Other tasks on the same broken pool fail too; only the first replaces it
+    if _pool is pool:
+        _pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def stats() -> dict:
+    return {
+        "workers": pool_size(),
+        "started": _pool is not None,
+        "offload_min_bytes": settings.process_offload_min_bytes,
+        **_counters,
+    }
+
+
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
@@ -0,0 +1,70 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+from fastapi import HTTPException, Request
+from fastapi.responses import Response
+
+logger = logging.getLogger(__name__)
+
+# Budget (seconds) a caller may send instead of the `timeout` query parameter
+DEADLINE_HEADER = "X-Request-Timeout"
+
+# Non-standard "client closed request" status; nobody is left to read it
+CLIENT_CLOSED_REQUEST = 499
+
+
+def request_deadline(request: Request, timeout: Optional[float] = None) -> Optional[float]:
+    """
+    Absolute deadline (epoch seconds) for this request, taken from the
+    `timeout` query parameter or the X-Request-Timeout header.
+    Epoch time is used so the value stays meaningful in the MCP server.
+    """
+    if timeout is None:
+        raw = request.headers.get(DEADLINE_HEADER)
+        if raw is None:
+            return None
+        try:
+            timeout = float(raw)
+        except ValueError:
+            raise HTTPException(
+                status_code=400, detail=f"{DEADLINE_HEADER} must be a number of seconds")
+    if timeout <= 0:
+        raise HTTPException(status_code=400, detail="timeout must be positive")
+    return time.time() + timeout
+
+
+async def run_request_scoped(
+    request: Request,
+    fn: Callable[[], Awaitable[Any]],
+    deadline: Optional[float] = None,
+    poll_interval: float = 0.25,
+) -> Any:
+    """
+    Run `fn()` and cancel it as soon as the client disconnects or the
+    deadline passes. Starlette does not cancel handlers on disconnect, so
+    without this an abandoned analysis keeps spending LLM tokens.
+    """
+    task = asyncio.ensure_future(fn())
+    try:
+        while True:
+            wait = poll_interval
+            if deadline is not None:
+                wait = min(wait, deadline - time.time())
+                if wait <= 0:
+                    task.cancel()
+                    raise HTTPException(
+                        status_code=504, detail="Request deadline exceeded")
+
+            done, _ = await asyncio.wait({task}, timeout=wait)
+            if done:
+                return task.result()
+
+            if await request.is_disconnected():
+                task.cancel()
+                logger.info(f"Client disconnected, cancelled {request.url.path}")
+                return Response(status_code=CLIENT_CLOSED_REQUEST)
+    finally:
+        if not task.done():
+            task.cancel()
@@ -1,10 +1,25 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from jose import jwt
 from app.config import settings
 
-# Use a stable, widely used algorithm without the 72-byte issue
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+# Use a stable, widely used algorithm without the 72-byte issue.
+# Hashes below password_hash_rounds are flagged for a rehash on next login.
+pwd_context = CryptContext(
+    schemes=["pbkdf2_sha256"],
+    deprecated="auto",
+    pbkdf2_sha256__default_rounds=settings.password_hash_rounds,
+    pbkdf2_sha256__min_rounds=settings.password_hash_rounds,
+)
+
+# pbkdf2 runs in hashlib with the GIL released, so a few threads hash in
+# parallel; the bound keeps a login storm from taking every core.
+_hash_executor = ThreadPoolExecutor(
+    max_workers=settings.password_hash_workers, thread_name_prefix="password-hash")
 
 def hash_password(password: str) -> str:
     # No need to manually truncate or convert to bytes;
@@ -14,6 +29,19 @@ def hash_password(password: str) -> str:
 def verify_password(password: str, hashed: str) -> bool:
     return pwd_context.verify(password, hashed)
 
+async def hash_password_async(password: str) -> str:
+    """hash_password() off the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_executor, hash_password, password)
+
+async def verify_and_update_password(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verify off the event loop. Returns (valid, new_hash); new_hash is set when
+    the stored hash uses outdated settings and should replace it.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_executor, pwd_context.verify_and_update, password, hashed)
+
 def create_access_token(data: dict) -> str:
     expire = datetime.utcnow() + timedelta(minutes=settings.jwt_expire_minutes)
     payload = {**data, "exp": expire, "type": "access"}
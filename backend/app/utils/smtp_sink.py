@@ -0,0 +1,94 @@
+"""
+Local SMTP stand-in for development and benchmarks. Accepts any login
+without TLS and keeps the received messages in memory instead of
+delivering them.
+
+    python -m app.utils.smtp_sink --port 1025
+    # then run the API with SMTP_SERVER=127.0.0.1 SMTP_PORT=1025 SMTP_STARTTLS=false
+
+--delay-ms simulates a slow relay, --connect-ms the TLS and login cost of a
+new session; --fail-rate rejects that fraction of messages with a
+temporary 451 error to exercise retries.
+"""
+import argparse
+import asyncio
+import logging
+import random
+from email import message_from_bytes
+
+from aiosmtpd.controller import Controller
+from aiosmtpd.smtp import AuthResult
+
+logger = logging.getLogger(__name__)
+
+
+class SinkHandler:
+    def __init__(self, delay_ms: float = 0.0, fail_rate: float = 0.0, connect_ms: float = 0.0, keep: int = 1000):
+        self.delay_ms = delay_ms
+        self.connect_ms = connect_ms
+        self.fail_rate = fail_rate
+        self.keep = keep
+        self.messages = []
+        self.received = 0
+        self.rejected = 0
+        self.sessions = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.sessions += 1
+        if self.connect_ms:
+            await asyncio.sleep(self.connect_ms / 1000)
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.delay_ms:
+            await asyncio.sleep(self.delay_ms / 1000)
+        if self.fail_rate and random.random() < self.fail_rate:
+            self.rejected += 1
+            return "451 Temporary failure, try again"
+        self.received += 1
+        message = message_from_bytes(envelope.content)
+        self.messages.append({"to": envelope.rcpt_tos, "subject": message["Subject"]})
+        del self.messages[:-self.keep]
+        logger.info(f"Received message for {envelope.rcpt_tos}: {message['Subject']}")
+        return "250 Message accepted"
+
+
+def _accept_any_login(server, session, envelope, mechanism, auth_data):
+    return AuthResult(success=True, auth_data=auth_data)
+
+
+def start_sink(host: str = "127.0.0.1", port: int = 1025, **handler_options):
+    """Start the sink on a background thread; returns (controller, handler)."""
+    handler = SinkHandler(**handler_options)
+    controller = Controller(
+        handler, hostname=host, port=port,
+        authenticator=_accept_any_login, auth_require_tls=False,
+    )
+    controller.start()
+    return controller, handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1025)
+    parser.add_argument("--delay-ms", type=float, default=0.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--connect-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    controller, _ = start_sink(args.host, args.port, delay_ms=args.delay_ms, fail_rate=args.fail_rate,
+                                connect_ms=args.connect_ms)
+    print(f"SMTP sink listening on {args.host}:{args.port}; Ctrl+C to stop")
+    try:
+        asyncio.run(asyncio.Event().wait())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        controller.stop()
+
+
+if __name__ == "__main__":
+    main()
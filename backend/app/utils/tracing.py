@@ -0,0 +1,223 @@
+"""
+OpenTelemetry tracing for the API and the MCP server.
+
+setup_tracing() installs an SDK tracer provider only when an exporter is
+configured; otherwise the OpenTelemetry API stays a no-op and spans cost
+next to nothing. Sampling is parent-based: the API decides with
+`sample_ratio`, and the MCP server follows the caller's decision.
+
+Trace context crosses the MCP hop twice. It goes in the tools/call `_meta`
+(traceparent/tracestate), which is where the server-side tool span reads
+it, because tools run outside the HTTP request's task. The same values are
+also copied onto the streamable-HTTP POST as W3C headers, so the server's
+HTTP span and any proxy in between join the trace too.
+
+Exporters: "file" appends one JSON span per line to `file_path`, "otlp"
+sends to a collector (OTLP/HTTP, `otlp_endpoint` or the OTEL_EXPORTER_OTLP_*
+environment), "console" prints, "none" disables tracing.
+"""
+import functools
+import json
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+import httpx
+from langchain_core.callbacks import AsyncCallbackHandler
+from mcp.shared._httpx_utils import create_mcp_http_client
+from opentelemetry import context as otel_context
+from opentelemetry import propagate, trace
+from opentelemetry.trace import SpanKind, Status, StatusCode
+
+logger = logging.getLogger(__name__)
+
+tracer = trace.get_tracer("income_analyzer")
+
+PROPAGATION_FIELDS = ("traceparent", "tracestate")
+
+
+def setup_tracing(service_name: str, exporter: str = "none", file_path: str = "traces.jsonl",
+                  sample_ratio: float = 1.0, otlp_endpoint: str = "") -> bool:
+    """Install the SDK tracer provider; returns False when tracing stays disabled."""
+    if exporter in ("", "none"):
+        return False
+
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+    if exporter == "file":
+        span_exporter = JsonLinesSpanExporter(file_path)
+    elif exporter == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        span_exporter = OTLPSpanExporter(endpoint=otlp_endpoint or None)
+    elif exporter == "console":
+        span_exporter = ConsoleSpanExporter()
+    else:
+        raise ValueError(f"Unknown tracing exporter {exporter!r}")
+
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": service_name}),
+        sampler=ParentBased(TraceIdRatioBased(sample_ratio)),
+    )
+    provider.add_span_processor(BatchSpanProcessor(span_exporter))
+    trace.set_tracer_provider(provider)
+    logger.info(f"Tracing {service_name} to {exporter}, sample ratio {sample_ratio}")
+    return True
+
+
+def shutdown_tracing() -> None:
+    """Flush spans still buffered in the batch processor."""
+    provider = trace.get_tracer_provider()
+    if hasattr(provider, "shutdown"):
+        provider.shutdown()
+
+
+class JsonLinesSpanExporter:
+    """Appends every finished span as one JSON object per line."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans):
+        from opentelemetry.sdk.trace.export import SpanExportResult
+        lines = [json.dumps(json.loads(span.to_json()), separators=(",", ":")) for span in spans]
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self):
+        pass
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        return True
+
+
+# ---------- Propagation ----------
+def inject_context(meta: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """`meta` plus the current trace context (traceparent/tracestate)."""
+    carrier: Dict[str, str] = {}
+    propagate.inject(carrier)
+    return {**(meta or {}), **carrier} if carrier else (meta or {})
+
+
+def extract_context(carrier) -> otel_context.Context:
+    """Trace context from a dict, or any object with traceparent/tracestate attributes."""
+    if not isinstance(carrier, dict):
+        carrier = {k: getattr(carrier, k, None) for k in PROPAGATION_FIELDS}
+    return propagate.extract({k: v for k, v in carrier.items() if isinstance(v, str)})
+
+
+async def _copy_meta_context_to_headers(request: httpx.Request) -> None:
+    if request.method != "POST" or b'"traceparent"' not in request.content:
+        return
+    try:
+        meta = (json.loads(request.content).get("params") or {}).get("_meta") or {}
+    except (ValueError, AttributeError):
+        return
+    for field in PROPAGATION_FIELDS:
+        if isinstance(meta.get(field), str):
+            request.headers[field] = meta[field]
+
+
+def traced_http_client_factory(headers=None, timeout=None, auth=None) -> httpx.AsyncClient:
+    """MCP transport client that also sends the call's trace context as W3C headers."""
+    client = create_mcp_http_client(headers=headers, timeout=timeout, auth=auth)
+    client.event_hooks["request"].append(_copy_meta_context_to_headers)
+    return client
+
+
+# ---------- HTTP server spans ----------
+class TracingMiddleware:
+    """ASGI middleware opening a server span per request, joined to incoming W3C headers."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        # Recent FastAPI releases open the server span themselves once a provider is set
+        if scope["type"] != "http" or getattr(scope.get("fastapi.telemetry"), "span", None) is not None:
+            return await self.app(scope, receive, send)
+
+        from app.utils.metrics import route_template
+        route = route_template(scope)
+        headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope.get("headers", ())}
+        with tracer.start_as_current_span(
+            f"{scope['method']} {route}", context=propagate.extract(headers), kind=SpanKind.SERVER,
+            attributes={"http.request.method": scope["method"], "http.route": route},
+        ) as span:
+            async def send_with_status(message):
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.response.status_code", message["status"])
+                    if message["status"] >= 500:
+                        span.set_status(Status(StatusCode.ERROR))
+                await send(message)
+
+            await self.app(scope, receive, send_with_status)
+
+
+# ---------- MCP tools and agent steps ----------
+def trace_tool(fn):
+    """Run an MCP tool in a server span that continues the caller's trace (from `_meta`)."""
+    name = fn.__name__
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        ctx = kwargs.get("ctx")
+        meta = ctx.request_context.meta if ctx is not None else None
+        with tracer.start_as_current_span(
+            f"mcp.tool {name}", context=extract_context(meta) if meta is not None else None,
+            kind=SpanKind.SERVER, attributes={"mcp.tool": name},
+        ) as span:
+            result = await fn(*args, **kwargs)
+            if isinstance(result, str) and result.startswith("Error"):
+                span.set_status(Status(StatusCode.ERROR, result[:200]))
+            return result
+
+    return wrapper
+
+
+class TracingCallback(AsyncCallbackHandler):
+    """One span per ReAct step: each chat-model call and each tool (math_tool) call."""
+
+    def __init__(self):
+        # Steps are children of whatever span is current when the agent starts
+        self.parent = otel_context.get_current()
+        self._spans: Dict[Any, Any] = {}
+
+    def _start(self, run_id, name: str, attributes: Dict[str, Any]) -> None:
+        self._spans[run_id] = tracer.start_span(name, context=self.parent, attributes=attributes)
+
+    def _end(self, run_id, error: Optional[BaseException] = None, attributes: Optional[Dict[str, Any]] = None):
+        span = self._spans.pop(run_id, None)
+        if span is None:
+            return
+        if attributes:
+            span.set_attributes(attributes)
+        if error is not None:
+            span.record_exception(error)
+            span.set_status(Status(StatusCode.ERROR, str(error)[:200]))
+        span.end()
+
+    async def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs) -> None:
+        self._start(run_id, "agent.llm_step", {"llm.messages": sum(len(batch) for batch in messages)})
+
+    async def on_llm_end(self, response, *, run_id, **kwargs) -> None:
+        from app.utils.llm_scheduler import reported_usage
+        prompt, completion = reported_usage(response)
+        self._end(run_id, attributes={"llm.prompt_tokens": prompt, "llm.completion_tokens": completion})
+
+    async def on_llm_error(self, error, *, run_id, **kwargs) -> None:
+        self._end(run_id, error)
+
+    async def on_tool_start(self, serialized, input_str, *, run_id, **kwargs) -> None:
+        name = (serialized or {}).get("name", "tool")
+        self._start(run_id, f"agent.tool {name}", {"tool.name": name, "tool.input": str(input_str)[:256]})
+
+    async def on_tool_end(self, output, *, run_id, **kwargs) -> None:
+        self._end(run_id, attributes={"tool.output": str(getattr(output, "content", output))[:256]})
+
+    async def on_tool_error(self, error, *, run_id, **kwargs) -> None:
+        self._end(run_id, error)
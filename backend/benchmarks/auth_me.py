@@ -0,0 +1,84 @@
+"""
+Authenticated-request latency with the principal cache in get_current_user:
+hammers GET /auth/me with a few users' tokens and reports throughput,
+latency, and the users.find_one calls the cache saved (its hits).
+
+    python benchmarks/auth_me.py --api-url http://127.0.0.1:8080 --users 10 --concurrency 50 --seconds 10
+
+Compare against a server started with PRINCIPAL_CACHE_TTL_SECONDS=0 (cache
+off, one Mongo round trip per request).
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+import uuid
+
+import httpx
+
+PASSWORD = "Bench-password-1!"
+
+
+async def tokens(client: httpx.AsyncClient, count: int) -> list:
+    run_id = uuid.uuid4().hex[:8]
+    result = []
+    for n in range(count):
+        email = f"bench-{run_id}-{n}@example.com"
+        r = await client.post("/auth/register", json={
+            "username": f"bench-{run_id}-{n}", "email": email, "password": PASSWORD})
+        r.raise_for_status()
+        r = await client.post("/auth/login", json={"email": email, "password": PASSWORD})
+        r.raise_for_status()
+        result.append(r.json()["access_token"])
+    return result
+
+
+async def cache_stats(client: httpx.AsyncClient) -> dict:
+    return (await client.get("/stats")).json().get("principal_cache", {})
+
+
+async def run(args) -> int:
+    async with httpx.AsyncClient(base_url=args.api_url, timeout=60) as client:
+        user_tokens = await tokens(client, args.users)
+        before = await cache_stats(client)
+        deadline = time.perf_counter() + args.seconds
+        latencies, failures = [], 0
+
+        async def worker(n: int):
+            nonlocal failures
+            headers = {"Authorization": f"Bearer {user_tokens[n % len(user_tokens)]}"}
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                r = await client.get("/auth/me", headers=headers)
+                if r.status_code == 200:
+                    latencies.append((time.perf_counter() - started) * 1000)
+                else:
+                    failures += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(n) for n in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+        after = await cache_stats(client)
+
+    latencies.sort()
+    saved = after.get("hits", 0) - before.get("hits", 0)
+    print(f"{len(latencies)} requests in {elapsed:.1f}s: {len(latencies) / elapsed:.0f} req/s, {failures} failed")
+    print(f"latency p50 {statistics.median(latencies):.2f} ms  "
+          f"p99 {latencies[max(0, int(len(latencies) * 0.99) - 1)]:.2f} ms")
+    print(f"users.find_one saved by the cache: {saved} "
+          f"({100 * saved / max(1, len(latencies)):.1f}% of requests)")
+    return 1 if failures else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--api-url", default="http://127.0.0.1:8080")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    return asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""
+Upload throughput in loans per second: N sequential /clean-json calls versus
+one /bulk-clean-json request with the same loans (as NDJSON).
+
+    python benchmarks/bulk_ingest.py --api-url http://127.0.0.1:8080 --loans 200 --docs 40
+
+Loans are synthetic OCR exports in the shape clean_borrower_documents_from_dict
+expects; every run uses fresh loan IDs and deletes nothing.
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+import uuid
+
+import httpx
+
+DOC_TYPES = ["Paystubs", "W2", "VOE", "Bank Statement", "1040"]
+BORROWERS = ["John A Smith", "Mary B Smith", "Robert Jones"]
+
+
+def synthetic_export(rng: random.Random, docs: int) -> dict:
+    """One loan's OCR export: a list of {BorrowerName, <DocType>: [document]}."""
+    items = []
+    for _ in range(docs):
+        borrower = rng.choice(BORROWERS)
+        labels = [{"LabelName": "Borrower Name", "Values": [{"Value": borrower, "ConfidenceScore": 0.98}]}]
+        labels += [
+            {"LabelName": f"Field {i}", "LabelOrder": i,
+             "Values": [{"Value": f"{rng.uniform(0, 20000):.2f}", "ConfidenceScore": round(rng.random(), 3)}]}
+            for i in range(rng.randint(15, 40))
+        ]
+        items.append({
+            "BorrowerName": borrower,
+            rng.choice(DOC_TYPES): [{
+                "Title": "document.pdf", "Url": "https://example.invalid/doc", "StageName": "Extraction",
+                "GeneratedOn": "2024-01-01", "Summary": [{"Labels": labels}],
+            }],
+        })
+    return {"Documents": items}
+
+
+def loan_bodies(count: int, docs: int, seed: int = 11):
+    rng = random.Random(seed)
+    run_id = uuid.uuid4().hex[:8]
+    return [
+        {"username": "bench", "email": "bench@example.com", "loanID": f"BULK-{run_id}-{i}",
+         "file_name": f"loan-{i}.json", "raw_json": synthetic_export(rng, docs)}
+        for i in range(count)
+    ]
+
+
+async def sequential(client: httpx.AsyncClient, bodies) -> float:
+    started = time.perf_counter()
+    for body in bodies:
+        r = await client.post("/clean-json", json=body)
+        r.raise_for_status()
+    return time.perf_counter() - started
+
+
+async def bulk(client: httpx.AsyncClient, bodies) -> float:
+    payload = "\n".join(json.dumps(body) for body in bodies).encode()
+    started = time.perf_counter()
+    r = await client.post("/bulk-clean-json", content=payload,
+                          headers={"Content-Type": "application/x-ndjson"})
+    r.raise_for_status()
+    elapsed = time.perf_counter() - started
+    counts = r.json()["counts"]
+    if counts.get("inserted") != len(bodies):
+        raise SystemExit(f"bulk upload did not insert every loan: {counts}")
+    return elapsed
+
+
+async def run(args) -> int:
+    async with httpx.AsyncClient(base_url=args.api_url, timeout=600) as client:
+        seq = await sequential(client, loan_bodies(args.loans, args.docs))
+        par = await bulk(client, loan_bodies(args.loans, args.docs))
+
+    print(f"{args.loans} loans x {args.docs} documents")
+    print(f"sequential /clean-json: {seq:7.2f}s  {args.loans / seq:8.1f} loans/s")
+    print(f"/bulk-clean-json:       {par:7.2f}s  {args.loans / par:8.1f} loans/s  ({seq / par:.1f}x)")
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--api-url", default="http://127.0.0.1:8080")
+    parser.add_argument("--loans", type=int, default=100)
+    parser.add_argument("--docs", type=int, default=40, help="OCR documents per loan")
+    return asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
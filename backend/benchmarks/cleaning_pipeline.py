@@ -0,0 +1,187 @@
+"""
+Time and peak memory of each cleaning stage on synthetic OCR exports
+(benchmarks/loan_generator.py), as scaling curves over one knob at a time,
+compared against the stored baseline in benchmarks/baselines/.
+
+Stages:
+  from_dict    clean_borrower_documents_from_dict (whole export)
+  clean_labels borrower_cleanup_service.extract_clean_labels, every document
+  structured   json_borrower_cleanup.extract_structured_document_data, every document
+  processor    BorrowerDocumentProcessor.clean_borrower_documents (file in, file out)
+  upload       loan_ingest.prepare_upload, everything /clean-json computes before writing
+
+    python benchmarks/cleaning_pipeline.py                    # compare with the baseline
+    python benchmarks/cleaning_pipeline.py --check            # exit 1 on a regression beyond --tolerance
+    python benchmarks/cleaning_pipeline.py --save-baseline    # after an intended change
+    python benchmarks/cleaning_pipeline.py --curves docs --stages from_dict,processor
+
+Timings depend on the machine; refresh the baseline on the machine you
+compare on before trusting small differences.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loan_generator import generate_export  # noqa: E402
+from app.services.loan_ingest import prepare_upload  # noqa: E402
+from app.utils.Data_formatter import BorrowerDocumentProcessor  # noqa: E402
+from app.utils.borrower_cleanup_service import clean_borrower_documents_from_dict, extract_clean_labels  # noqa: E402
+from app.utils.json_borrower_cleanup import extract_structured_document_data  # noqa: E402
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "cleaning_pipeline.json")
+
+# Export used at every point unless the curve varies that knob
+DEFAULTS = {"docs": 100, "borrowers": 2, "noise": 0.2, "depth": 1}
+CURVES = {
+    "docs": [25, 50, 100, 200],
+    "borrowers": [1, 2, 4, 8],
+    "noise": [0.0, 0.25, 0.5, 1.0],
+    "depth": [0, 1, 2, 3],
+}
+
+
+def documents(export):
+    for item in export["Documents"]:
+        for key, docs in item.items():
+            if key != "BorrowerName":
+                yield from docs
+
+
+class Case:
+    """One generated export, plus the files the file-based processor reads and writes."""
+
+    def __init__(self, **knobs):
+        self.export = generate_export(**knobs)
+        self.docs = list(documents(self.export))
+        fd, self.path = tempfile.mkstemp(suffix=".json")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self.export, f)
+        self.output = self.path[:-5] + ".cleaned.json"
+
+    def close(self):
+        for path in (self.path, self.output):
+            if os.path.exists(path):
+                os.unlink(path)
+
+
+STAGES = {
+    "from_dict": lambda case: clean_borrower_documents_from_dict(case.export),
+    "clean_labels": lambda case: [extract_clean_labels(doc) for doc in case.docs],
+    "structured": lambda case: [extract_structured_document_data(doc) for doc in case.docs],
+    "processor": lambda case: BorrowerDocumentProcessor(case.path, case.output).clean_borrower_documents(),
+    "upload": lambda case: prepare_upload(case.export),
+}
+
+
+def measure(fn, case, repeat: int) -> dict:
+    fn(case)  # warm-up (regex cache, imports)
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(case)
+        times.append((time.perf_counter() - started) * 1000)
+    tracemalloc.start()
+    fn(case)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"ms": round(statistics.median(times), 3), "min_ms": round(min(times), 3),
+            "peak_mb": round(peak / 2 ** 20, 3)}
+
+
+def exponent(points, stage: str):
+    """Slope of log(time) over log(knob): 1.0 is linear, 2.0 quadratic."""
+    xs = [float(x) for x in points]
+    if len(xs) < 2 or min(xs) <= 0:
+        return None
+    lx = [math.log(x) for x in xs]
+    ly = [math.log(max(points[x][stage]["ms"], 1e-6)) for x in points]
+    mx, my = statistics.fmean(lx), statistics.fmean(ly)
+    return round(sum((a - mx) * (b - my) for a, b in zip(lx, ly)) / sum((a - mx) ** 2 for a in lx), 2)
+
+
+def run_curves(curves, stages, repeat: int) -> dict:
+    results = {}
+    for curve in curves:
+        results[curve] = {}
+        for value in CURVES[curve]:
+            case = Case(**{**DEFAULTS, curve: value})
+            try:
+                results[curve][str(value)] = {stage: measure(STAGES[stage], case, repeat) for stage in stages}
+            finally:
+                case.close()
+    return results
+
+
+def report(results, baseline, stages, tolerance: float) -> list:
+    """Print every curve next to the baseline; return the regressions."""
+    regressions = []
+    for curve, points in results.items():
+        print(f"\n{curve} (others at {', '.join(f'{k}={v}' for k, v in DEFAULTS.items() if k != curve)})")
+        print(f"  {'stage':13}" + "".join(f"{curve + '=' + x:>25}" for x in points) + "   exponent")
+        for stage in stages:
+            row = ""
+            for x, point in points.items():
+                base = baseline.get(curve, {}).get(x, {}).get(stage)
+                ms = point[stage]["ms"]
+                change = ""
+                if base:
+                    ratio = ms / base["ms"] if base["ms"] else 1.0
+                    change = f" {ratio:4.2f}x"
+                    if ratio > 1 + tolerance:
+                        regressions.append(f"{stage} at {curve}={x}: {base['ms']:.1f} -> {ms:.1f} ms")
+                row += f"{ms:9.1f}ms {point[stage]['peak_mb']:5.1f}MB{change:>6}"
+            slope = exponent(points, stage)
+            print(f"  {stage:13}{row}   {slope if slope is not None else '-'}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--curves", default=",".join(CURVES), help="knobs to vary, comma-separated")
+    parser.add_argument("--stages", default=",".join(STAGES))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="slowdown over baseline counted as regression")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--check", action="store_true", help="exit 1 when a stage regressed")
+    args = parser.parse_args()
+
+    curves, stages = args.curves.split(","), args.stages.split(",")
+    results = run_curves(curves, stages, args.repeat)
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+    regressions = report(results, baseline, stages, args.tolerance)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({
+                "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                            "cpus": os.cpu_count()},
+                "defaults": DEFAULTS,
+                "repeat": args.repeat,
+                "results": results,
+            }, f, indent=2)
+            f.write("\n")
+        print(f"\nbaseline written to {args.baseline}")
+    elif regressions:
+        print(f"\n{len(regressions)} regressions beyond {args.tolerance:.0%}:")
+        for line in regressions:
+            print(f"  {line}")
+    return 1 if regressions and args.check else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
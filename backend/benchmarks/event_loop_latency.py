@@ -0,0 +1,102 @@
+"""
+Responsiveness of one API worker during a large ingest: latency of a cheap
+request (GET /) probed every few milliseconds, while idle and while large
+/clean-json uploads are being processed.
+
+    python benchmarks/event_loop_latency.py --api-url http://127.0.0.1:8080 --uploads 8 --docs 600
+
+Run it once against a server started with PROCESS_OFFLOAD_MIN_BYTES set very
+high (everything cleaned inline on the event loop) and once with the default
+to compare. With inline cleaning the probe's max latency approaches the
+cleaning time of a whole upload.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bulk_ingest import synthetic_export  # noqa: E402
+
+
+async def probe(client: httpx.AsyncClient, stop: asyncio.Event, interval: float) -> list:
+    latencies = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        r = await client.get("/")
+        r.raise_for_status()
+        latencies.append((time.perf_counter() - started) * 1000)
+        await asyncio.sleep(interval)
+    return latencies
+
+
+def summary(latencies: list) -> str:
+    latencies = sorted(latencies)
+    p99 = latencies[max(0, int(len(latencies) * 0.99) - 1)]
+    return (f"{len(latencies):6d} probes  p50 {statistics.median(latencies):8.1f} ms  "
+            f"p99 {p99:8.1f} ms  max {latencies[-1]:8.1f} ms")
+
+
+async def measure(client: httpx.AsyncClient, interval: float, work=None, seconds: float = 2.0) -> list:
+    stop = asyncio.Event()
+    task = asyncio.create_task(probe(client, stop, interval))
+    if work is None:
+        await asyncio.sleep(seconds)
+    else:
+        await work
+    stop.set()
+    return await task
+
+
+async def run(args) -> int:
+    rng = random.Random(5)
+    run_id = uuid.uuid4().hex[:8]
+    bodies = [json.dumps({
+        "username": "bench", "email": "bench@example.com", "loanID": f"LAT-{run_id}-{i}",
+        "file_name": f"loan-{i}.json", "raw_json": synthetic_export(rng, args.docs),
+    }).encode() for i in range(args.uploads)]
+    print(f"{args.uploads} uploads of {sum(map(len, bodies)) / len(bodies) / 1024:.0f} KB")
+
+    async with httpx.AsyncClient(base_url=args.api_url, timeout=600) as uploader, \
+            httpx.AsyncClient(base_url=args.api_url, timeout=600) as prober:
+
+        async def ingest():
+            started = time.perf_counter()
+            responses = await asyncio.gather(*(
+                uploader.post("/clean-json", content=body, headers={"Content-Type": "application/json"})
+                for body in bodies
+            ))
+            for r in responses:
+                r.raise_for_status()
+            print(f"ingest took {time.perf_counter() - started:.2f}s")
+
+        idle = await measure(prober, args.interval)
+        busy = await measure(prober, args.interval, ingest())
+
+        pool = (await prober.get("/stats")).json().get("process_pool", {})
+
+    print(f"idle:   {summary(idle)}")
+    print(f"ingest: {summary(busy)}")
+    print(f"process pool: {pool}")
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--api-url", default="http://127.0.0.1:8080")
+    parser.add_argument("--uploads", type=int, default=8)
+    parser.add_argument("--docs", type=int, default=600, help="OCR documents per upload")
+    parser.add_argument("--interval", type=float, default=0.005, help="seconds between probes")
+    return asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
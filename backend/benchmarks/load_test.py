@@ -0,0 +1,300 @@
+"""
+Offline end-to-end load test: boots the MCP server with the fake LLM
+(MCP_FAKE_LLM=1) and the API against mongomock, both as subprocesses, seeds
+loans made by loan_generator.py, then replays a weighted mix of uploads,
+views and analyses at a fixed concurrency. Reports throughput, p50/p95/p99
+latency and error rate per operation; nothing talks to Azure or MongoDB.
+
+    python benchmarks/load_test.py                                  # defaults, ~30 s
+    python benchmarks/load_test.py --concurrency 32 --duration 60 --llm-latency 0.5
+    python benchmarks/load_test.py --mix view=6,verify=2,calc=1,upload=1 --json report.json
+    python benchmarks/load_test.py --mongo-url mongodb://localhost:27017   # local Mongo instead
+    python benchmarks/load_test.py --api-url http://127.0.0.1:8080         # already running API
+
+Operations: upload (/clean-json, a new loan), view (/view-loan), verify
+(/verify-rules), calc (/income-calc), insights (/income-insights),
+self_emp (/income-self_emp). An analysis answering {"status": "error"}
+counts as an error, like a non-2xx response or a transport failure.
+
+The MCP server's LLM quota is lifted unless --llm-tokens-per-minute is
+given, so analysis latency reflects --llm-latency and the API's own
+queueing (client_lock, single flight). Requests still in flight when
+--duration ends are waited for and counted.
+
+Analyses of a loan that was analysed before are served from the API's
+rule-result cache; raise --loans to keep more of them cold. The API reads
+the rest of its configuration (JWT_SECRET, ...) from .env as usual.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from loan_generator import generate_export  # noqa: E402
+
+EMAIL = "loadtest@example.com"
+ANALYSES = {
+    "verify": "/verify-rules",
+    "calc": "/income-calc",
+    "insights": "/income-insights",
+    "self_emp": "/income-self_emp",
+}
+OPERATIONS = ["upload", "view", *ANALYSES]
+
+
+# ---------- Servers ----------
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def serve_api(port: int, mongo_url: str) -> None:
+    """Entry point of the API subprocess (--serve-api)."""
+    sys.path.insert(0, BACKEND_DIR)
+    os.chdir(BACKEND_DIR)
+    if not mongo_url:
+        import motor.motor_asyncio
+        import mongomock_motor  # requirements-dev.txt; only for a run without a server
+        motor.motor_asyncio.AsyncIOMotorClient = mongomock_motor.AsyncMongoMockClient
+    import uvicorn
+    import main
+    uvicorn.run(main.app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def start(cmd, env, log_path: str) -> subprocess.Popen:
+    log = open(log_path, "w")
+    return subprocess.Popen(cmd, cwd=BACKEND_DIR, env={**os.environ, **env}, stdout=log, stderr=subprocess.STDOUT)
+
+
+async def wait_ready(url: str, proc: subprocess.Popen, log_path: str, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(timeout=2) as client:
+        while time.monotonic() < deadline:
+            if proc.poll() is not None:
+                raise RuntimeError(f"{url} exited with {proc.returncode}, see {log_path}")
+            try:
+                if (await client.get(url)).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.25)
+    raise RuntimeError(f"{url} not ready after {timeout:.0f}s, see {log_path}")
+
+
+# ---------- Load ----------
+class LoanPool:
+    """Upload bodies generated up front, so the client does not compete for CPU during the run."""
+
+    def __init__(self, args):
+        self.exports = [generate_export(borrowers=args.borrowers, docs=args.docs, noise=args.noise,
+                                        depth=args.depth, seed=seed) for seed in range(args.variants)]
+        self.run_id = uuid.uuid4().hex[:8]
+        self.count = 0
+        self.loan_ids = []
+
+    def body(self) -> dict:
+        n = self.count
+        self.count += 1
+        return {"username": "loadtest", "email": EMAIL, "loanID": f"LOAD-{self.run_id}-{n}",
+                "file_name": f"loan-{n}.json", "raw_json": self.exports[n % len(self.exports)]}
+
+
+async def perform(client: httpx.AsyncClient, op: str, pool: LoanPool, rng: random.Random) -> bool:
+    """Run one operation; True when it succeeded."""
+    if op == "upload":
+        body = pool.body()
+        r = await client.post("/clean-json", json=body)
+        if r.status_code == 200:
+            pool.loan_ids.append(body["loanID"])
+        return r.status_code == 200
+    loan_id = rng.choice(pool.loan_ids)
+    if op == "view":
+        r = await client.post("/view-loan", json={"email": EMAIL, "loanId": loan_id})
+        return r.status_code == 200
+    r = await client.post(ANALYSES[op], params={"email": EMAIL, "loanID": loan_id})
+    return r.status_code == 200 and r.json().get("status") != "error"
+
+
+async def user(client, pool, ops, weights, stop_at, budget, samples, errors, seed) -> None:
+    rng = random.Random(seed)
+    while time.monotonic() < stop_at and budget["left"] > 0:
+        budget["left"] -= 1
+        op = rng.choices(ops, weights)[0]
+        started = time.perf_counter()
+        try:
+            ok = await perform(client, op, pool, rng)
+        except (httpx.HTTPError, ValueError):
+            ok = False
+        samples[op].append((time.perf_counter() - started) * 1000)
+        if not ok:
+            errors[op] += 1
+
+
+def percentile(values: list, q: float) -> float:
+    """Nearest-rank percentile of sorted `values`."""
+    return values[max(0, math.ceil(len(values) * q) - 1)]
+
+
+def summarize(samples, errors, elapsed: float) -> dict:
+    rows = {}
+    everything = []
+    for op in OPERATIONS:
+        values = sorted(samples.get(op, []))
+        if not values:
+            continue
+        everything += values
+        rows[op] = {"requests": len(values), "rps": round(len(values) / elapsed, 2),
+                    "p50_ms": round(statistics.median(values), 1), "p95_ms": round(percentile(values, 0.95), 1),
+                    "p99_ms": round(percentile(values, 0.99), 1), "max_ms": round(values[-1], 1),
+                    "error_rate": round(errors[op] / len(values), 4)}
+    everything.sort()
+    if everything:
+        rows["all"] = {"requests": len(everything), "rps": round(len(everything) / elapsed, 2),
+                       "p50_ms": round(statistics.median(everything), 1),
+                       "p95_ms": round(percentile(everything, 0.95), 1),
+                       "p99_ms": round(percentile(everything, 0.99), 1), "max_ms": round(everything[-1], 1),
+                       "error_rate": round(sum(errors.values()) / len(everything), 4)}
+    return rows
+
+
+def print_report(rows: dict, args, elapsed: float) -> None:
+    print(f"\n{args.concurrency} concurrent users, {elapsed:.1f}s, LLM latency {args.llm_latency}s/step, "
+          f"{args.loans} seeded loans of {args.docs} documents")
+    print(f"{'operation':10} {'requests':>9} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'max ms':>9} {'errors':>7}")
+    for op, row in rows.items():
+        print(f"{op:10} {row['requests']:9} {row['rps']:8.1f} {row['p50_ms']:9.1f} {row['p95_ms']:9.1f} "
+              f"{row['p99_ms']:9.1f} {row['max_ms']:9.1f} {row['error_rate']:7.1%}")
+
+
+def parse_mix(text: str):
+    mix = {}
+    for part in text.split(","):
+        op, _, weight = part.partition("=")
+        if op not in OPERATIONS:
+            raise SystemExit(f"unknown operation {op!r}; expected one of {', '.join(OPERATIONS)}")
+        mix[op] = float(weight or 1)
+    return list(mix), list(mix.values())
+
+
+async def run(args) -> int:
+    ops, weights = parse_mix(args.mix)
+    procs = []
+    log_dir = args.log_dir or BACKEND_DIR
+    api_url = args.api_url
+    try:
+        if not api_url:
+            mcp_port, api_port = free_port(), free_port()
+            mcp_log, api_log = os.path.join(log_dir, "loadtest-mcp.log"), os.path.join(log_dir, "loadtest-api.log")
+            mcp = start([sys.executable, "mcp_server.py", "--host", "127.0.0.1", "--port", str(mcp_port)], {
+                "MCP_FAKE_LLM": "1",
+                "FAKE_LLM_LATENCY": str(args.llm_latency),
+                "FAKE_LLM_THROTTLE_RATE": str(args.throttle_rate),
+                "LLM_TOKENS_PER_MINUTE": str(args.llm_tokens_per_minute or 10 ** 9),
+                "LLM_REQUESTS_PER_MINUTE": str(args.llm_requests_per_minute or 10 ** 9),
+            }, mcp_log)
+            procs.append(mcp)
+            await wait_ready(f"http://127.0.0.1:{mcp_port}/metrics", mcp, mcp_log)
+
+            api_env = {"MCP_SERVER_URL": f"http://127.0.0.1:{mcp_port}/mcp"}
+            if args.mongo_url:
+                api_env["DB_URL"] = args.mongo_url
+            api = start([sys.executable, os.path.abspath(__file__), "--serve-api", str(api_port),
+                         "--mongo-url", args.mongo_url], api_env, api_log)
+            procs.append(api)
+            api_url = f"http://127.0.0.1:{api_port}"
+            await wait_ready(f"{api_url}/", api, api_log)
+
+        pool = LoanPool(args)
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=api_url, timeout=args.timeout, limits=limits) as client:
+            started = time.perf_counter()
+            for _ in range(args.loans):
+                body = pool.body()
+                r = await client.post("/clean-json", json=body)
+                r.raise_for_status()
+                pool.loan_ids.append(body["loanID"])
+            print(f"seeded {args.loans} loans in {time.perf_counter() - started:.1f}s")
+
+            samples, errors = defaultdict(list), defaultdict(int)
+            budget = {"left": args.requests or float("inf")}
+            started = time.perf_counter()
+            stop_at = time.monotonic() + args.duration
+            await asyncio.gather(*(user(client, pool, ops, weights, stop_at, budget, samples, errors, seed)
+                                   for seed in range(args.concurrency)))
+            elapsed = time.perf_counter() - started
+            stats = (await client.get("/stats")).json()
+
+        rows = summarize(samples, errors, elapsed)
+        print_report(rows, args, elapsed)
+        flights = stats.get("analysis_single_flight", {})
+        cache = stats.get("rule_result_cache", {})
+        print(f"\nrule-result cache: {cache}\nsingle flight: {flights}")
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump({"args": vars(args), "elapsed_s": round(elapsed, 2), "results": rows, "stats": stats},
+                          f, indent=2, default=str)
+            print(f"report written to {args.json}")
+        error_rate = rows.get("all", {}).get("error_rate", 0.0)
+        return 1 if args.max_error_rate is not None and error_rate > args.max_error_rate else 0
+    finally:
+        for proc in reversed(procs):
+            proc.terminate()
+        for proc in procs:
+            try:
+                proc.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=16, help="simulated users issuing requests back to back")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds to replay the mix")
+    parser.add_argument("--requests", type=int, default=0, help="stop after this many requests (0 = duration only)")
+    parser.add_argument("--mix", default="upload=1,view=4,verify=2,calc=1,insights=1,self_emp=1",
+                        help="operation=weight, comma-separated")
+    parser.add_argument("--loans", type=int, default=20, help="loans uploaded before the run")
+    parser.add_argument("--docs", type=int, default=40, help="documents per generated loan")
+    parser.add_argument("--borrowers", type=int, default=2)
+    parser.add_argument("--noise", type=float, default=0.2)
+    parser.add_argument("--depth", type=int, default=1)
+    parser.add_argument("--variants", type=int, default=8, help="distinct exports the uploads cycle through")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="fake LLM seconds per agent step")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="share of fake LLM calls answering 429")
+    parser.add_argument("--llm-tokens-per-minute", type=int, default=0,
+                        help="MCP server LLM quota (0 = unlimited, measure the API rather than the quota)")
+    parser.add_argument("--llm-requests-per-minute", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--max-error-rate", type=float, help="exit 1 when the overall error rate is higher")
+    parser.add_argument("--json", help="also write the report to this file")
+    parser.add_argument("--log-dir", help="where the server logs go (default: backend/)")
+    parser.add_argument("--mongo-url", default="", help="use this MongoDB instead of mongomock")
+    parser.add_argument("--api-url", help="load an already running API instead of booting one")
+    parser.add_argument("--serve-api", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve_api:
+        serve_api(args.serve_api, args.mongo_url)
+        return 0
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
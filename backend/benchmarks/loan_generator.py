@@ -0,0 +1,185 @@
+"""
+Synthetic OCR loan exports, in the shape the cleaning code reads:
+
+    {"Documents": [{"BorrowerName": "...", "<DocType>": [
+        {"Title", "Url", "StageName", "GeneratedOn",
+         "Summary": [{"SkillName", "Labels": [
+             {"LabelName", "Values": [{"Value", "ConfidenceScore", "Page", "BoundingBox"}]},
+             {"LabelName", "Groups": [{"GroupName", "RecordLabels": [...]}]}]}]}]}]}
+
+Knobs: number of distinct borrowers, how often a name is written as a
+variant (initials, dropped middle name, suffix, OCR typo, joint borrowers),
+number of documents, and how deeply Groups nest inside RecordLabels.
+
+    python benchmarks/loan_generator.py --borrowers 3 --docs 200 --noise 0.3 --depth 2 -o loan.json
+"""
+import argparse
+import json
+import random
+import string
+from typing import Any, Dict, List
+
+FIRST = ["John", "Mary", "Robert", "Patricia", "Michael", "Linda", "David", "Elizabeth", "James", "Jennifer",
+         "William", "Barbara", "Richard", "Susan", "Joseph", "Jessica", "Thomas", "Sarah", "Charles", "Karen"]
+LAST = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez",
+        "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson", "Thomas", "Taylor", "Moore", "Jackson", "Martin"]
+EMPLOYERS = ["Acme Logistics LLC", "Northwind Traders Inc", "Contoso Health Corp", "Fabrikam Ltd",
+             "Tailspin Toys Co", "Wide World Importers Inc"]
+BANKS = ["First National Bank", "Chase Bank", "Community Credit Union Association"]
+
+# Document type -> (label carrying the person's name, scalar labels, group label)
+DOC_TYPES = {
+    "Paystubs": ("Employee Name", ["Employer Name", "Pay Date", "Pay Period Start", "Pay Period End",
+                                   "Gross Pay", "Net Pay", "YTD Gross", "Regular Hours", "Regular Rate",
+                                   "Federal Tax", "Social Security", "Medicare"], "Earnings"),
+    "W2": ("Employee Name", ["Employer Name", "Employer EIN", "Tax Year", "Wages Tips Other Compensation",
+                             "Federal Income Tax Withheld", "Social Security Wages", "Medicare Wages"], "Box 12"),
+    "Bank Statement": ("Account Holder Name", ["Bank Name", "Account Number", "Statement Period",
+                                               "Beginning Balance", "Ending Balance", "Total Deposits"],
+                       "Transactions"),
+    "1040": ("Borrower Name", ["Tax Year", "Filing Status", "Total Income", "Adjusted Gross Income",
+                               "Taxable Income", "Total Tax"], "Schedule C"),
+    "VOE": ("Employee Full Name", ["Employer Name", "Hire Date", "Position", "Base Pay", "Pay Frequency",
+                                   "Probability Of Continued Employment"], "Income History"),
+}
+RECORD_LABELS = ["Description", "Date", "Amount", "Current", "Year To Date", "Category", "Reference"]
+
+
+class Person:
+    def __init__(self, rng: random.Random):
+        self.first = rng.choice(FIRST)
+        self.middle = rng.choice(FIRST)
+        self.last = rng.choice(LAST)
+
+    @property
+    def full(self) -> str:
+        return f"{self.first} {self.middle} {self.last}"
+
+
+def _typo(rng: random.Random, word: str) -> str:
+    if len(word) < 4:
+        return word
+    i = rng.randrange(1, len(word) - 1)
+    if rng.random() < 0.5:
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    return word[:i] + rng.choice(string.ascii_lowercase) + word[i + 1:]
+
+
+def name_variant(rng: random.Random, person: Person, noise: float) -> str:
+    """The person's full name, or with probability `noise` one of the ways OCR and forms mangle it."""
+    if rng.random() >= noise:
+        return person.full
+    return rng.choice([
+        lambda: f"{person.first} {person.middle[0]} {person.last}",
+        lambda: f"{person.first} {person.middle[0]}. {person.last}".upper(),
+        lambda: f"{person.first} {person.last}",
+        lambda: f"{person.first[0]} {person.middle} {person.last}",
+        lambda: f"{person.first} {person.middle} {person.last} Jr",
+        lambda: f"{person.first} {person.middle} {_typo(rng, person.last)}",
+        lambda: f"{_typo(rng, person.first)} {person.last}",
+    ])()
+
+
+def _value(rng: random.Random, value: Any) -> Dict[str, Any]:
+    return {
+        "Value": value,
+        "ConfidenceScore": round(rng.uniform(0.55, 1.0), 3),
+        "Page": rng.randint(1, 6),
+        "BoundingBox": [round(rng.random(), 4) for _ in range(4)],
+    }
+
+
+def _scalar(rng: random.Random, label: str) -> Any:
+    if "Name" in label:
+        return rng.choice(BANKS if "Bank" in label else EMPLOYERS)
+    if ("Date" in label and "To Date" not in label) or "Period" in label:
+        return f"{rng.randint(1, 12):02d}/{rng.randint(1, 28):02d}/{rng.randint(2021, 2024)}"
+    if "Year" in label:
+        return str(rng.randint(2021, 2024))
+    if "Number" in label or "EIN" in label:
+        return "".join(rng.choices(string.digits, k=rng.randint(8, 12)))
+    if label in ("Filing Status", "Position", "Pay Frequency", "Category", "Description"):
+        return " ".join(rng.choices(["Married", "Joint", "Senior", "Analyst", "Biweekly", "Payroll",
+                                     "Deposit", "Transfer", "Fee"], k=2))
+    return f"{rng.uniform(0, 25000):.2f}"
+
+
+def _groups(rng: random.Random, name: str, depth: int, records: int) -> Dict[str, Any]:
+    """A label with `records` groups; below depth 1 each record nests one more Groups level."""
+    groups = []
+    for n in range(records):
+        record_labels = [{"LabelName": rl, "Values": [_value(rng, _scalar(rng, rl))]}
+                         for rl in rng.sample(RECORD_LABELS, rng.randint(3, len(RECORD_LABELS)))]
+        if depth > 1:
+            record_labels.append(_groups(rng, f"{name} Detail", depth - 1, max(1, records // 2)))
+        groups.append({"GroupName": f"{name} {n + 1}", "RecordLabels": record_labels})
+    return {"LabelName": name, "Groups": groups}
+
+
+def document(rng: random.Random, doc_type: str, holder: str, depth: int) -> Dict[str, Any]:
+    name_label, scalars, group_label = DOC_TYPES[doc_type]
+    labels = [{"LabelName": name_label, "Values": [_value(rng, holder)]}]
+    labels += [{"LabelName": label, "Values": [_value(rng, _scalar(rng, label))]} for label in scalars]
+    # Multi-valued and empty labels both occur in real exports
+    labels.append({"LabelName": "Notes", "Values": [_value(rng, "N/A"), _value(rng, _scalar(rng, "Description"))]})
+    labels.append({"LabelName": "Signature", "Values": []})
+    if depth > 0:
+        labels.append(_groups(rng, group_label, depth, rng.randint(2, 6)))
+    return {
+        "Title": f"{doc_type.lower().replace(' ', '_')}_{rng.randint(1000, 9999)}.pdf",
+        "Url": f"https://example.invalid/docs/{rng.getrandbits(48):012x}",
+        "StageName": "Extraction",
+        "GeneratedOn": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "Summary": [{"SkillName": doc_type, "Labels": labels}],
+    }
+
+
+def generate_export(
+    borrowers: int = 2,
+    docs: int = 50,
+    noise: float = 0.2,
+    depth: int = 1,
+    joint_rate: float = 0.1,
+    unidentified_rate: float = 0.02,
+    seed: int = 7,
+) -> Dict[str, List[Dict[str, Any]]]:
+    """One loan's OCR export with `docs` documents spread over `borrowers` people."""
+    rng = random.Random(seed)
+    people = [Person(rng) for _ in range(borrowers)]
+    items = []
+    for _ in range(docs):
+        person = rng.choice(people)
+        holder = name_variant(rng, person, noise)
+        top = holder
+        if borrowers > 1 and rng.random() < joint_rate:
+            other = rng.choice([p for p in people if p is not person])
+            top = f"{holder}, {name_variant(rng, other, noise)}"
+        elif rng.random() < unidentified_rate:
+            top = "Unidentified Borrower"
+        doc_type = rng.choice(list(DOC_TYPES))
+        items.append({"BorrowerName": top, doc_type: [document(rng, doc_type, holder, depth)]})
+    return {"Documents": items}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--borrowers", type=int, default=2)
+    parser.add_argument("--docs", type=int, default=50)
+    parser.add_argument("--noise", type=float, default=0.2, help="share of names written as a variant")
+    parser.add_argument("--depth", type=int, default=1, help="Groups nesting depth (0 = no groups)")
+    parser.add_argument("--joint-rate", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("-o", "--output", help="file to write (default: stdout)")
+    args = parser.parse_args()
+
+    export = generate_export(args.borrowers, args.docs, args.noise, args.depth, args.joint_rate, seed=args.seed)
+    text = json.dumps(export, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Bytes returned and latency of the loan read paths, whole-document fetch
+("before") versus the projected queries main.py now issues ("after").
+
+    python benchmarks/loan_reads.py --db-url mongodb://localhost:27017 --loan-mb 4
+    python benchmarks/loan_reads.py --mongomock      # no server; bytes only are meaningful
+
+Bytes are the BSON size of the documents the driver receives.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+
+import bson
+from pymongo import ReturnDocument
+
+BENCH_DB = "income_analyzer_bench"
+
+# Mirrors app.services.loan_cache.ANALYZED_FLAG
+ANALYZED_FLAG = {"$ne": [{"$ifNull": ["$analyzed_data", {}]}, {}]}
+
+
+def synthetic_loan(loan_id: str, email: str, size_mb: float) -> dict:
+    """A loan shaped like a /clean-json record, padded to roughly size_mb."""
+    page = {"Field": "x" * 200, "Value": "1234.56", "Confidence": 0.97}
+    pages = max(1, int(size_mb * 1024 * 1024 / 2 / 260))
+    original = {"Borrower A": {"Paystubs": [page] * pages}}
+    cleaned = {"Borrower A": {"Paystubs": [page] * (pages // 4 or 1)}}
+    return {
+        "username": "bench",
+        "email": email,
+        "loanID": loan_id,
+        "file_name": "bench.json",
+        "original_data": original,
+        "cleaned_data": cleaned,
+        "filtered_data": cleaned,
+        "original_cleaned_data": cleaned,
+        "only_bs": {},
+        "filtered_data_with_bs": cleaned,
+        "analyzed_data": {"Borrower A": {"income": 1000}},
+        "created_at": "now",
+        "updated_at": "now",
+    }
+
+
+def bson_size(docs) -> int:
+    return sum(len(bson.encode(d)) for d in docs if d)
+
+
+def endpoint_queries(coll, loan_id: str, email: str):
+    """(endpoint, before, after); each coroutine factory returns the documents read."""
+    key = {"loanID": loan_id, "email": email}
+
+    async def one(q, projection=None):
+        return [await coll.find_one(q, projection)]
+
+    async def agg(q, projection):
+        return await coll.aggregate(
+            [{"$match": q}, {"$limit": 1}, {"$project": projection}]).to_list(length=1)
+
+    async def update_before():
+        old = await coll.find_one(key)
+        await coll.update_one({"loanID": loan_id}, {"$set": {"cleaned_data": old["cleaned_data"]}})
+        return [old, await coll.find_one(key)]
+
+    async def update_after():
+        cleaned = (await coll.find_one(key, {"cleaned_data": 1, "_id": 0}))["cleaned_data"]
+        return [await coll.find_one_and_update(
+            key, {"$set": {"cleaned_data": cleaned}},
+            projection={"cleaned_data": 1, "_id": 0},
+            return_document=ReturnDocument.BEFORE)]
+
+    return [
+        ("/check-loanid", lambda: one(key), lambda: one(key, {"_id": 1})),
+        ("/view-loan", lambda: one({"loanID": loan_id}),
+         lambda: agg({"loanID": loan_id},
+                     {"cleaned_data": 1, "hasModifications": 1, "analyzed_data": ANALYZED_FLAG, "_id": 0})),
+        ("/get-original-data", lambda: one({"loanID": loan_id}),
+         lambda: agg({"loanID": loan_id},
+                     {"original_cleaned_data": 1, "analyzed_data": ANALYZED_FLAG, "_id": 0})),
+        ("/get-analyzed-data", lambda: one(key), lambda: one(key, {"analyzed_data": 1, "_id": 0})),
+        ("/store-analyzed-data (read)", lambda: one(key), lambda: one(key, {"analyzed_data": 1, "_id": 0})),
+        # "after" includes a projected read of cleaned_data only to have a value to write back
+        ("/update-cleaned-data", update_before, update_after),
+    ]
+
+
+async def measure(fn, iterations: int):
+    latencies, size = [], 0
+    for _ in range(iterations):
+        started = time.perf_counter()
+        docs = await fn()
+        latencies.append((time.perf_counter() - started) * 1000)
+        size = bson_size(docs)
+    latencies.sort()
+    return size, statistics.median(latencies), latencies[int(len(latencies) * 0.95) - 1]
+
+
+async def run(args):
+    if args.mongomock:
+        import mongomock_motor  # optional, only for a quick run without a server
+        client = mongomock_motor.AsyncMongoMockClient()
+    else:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        client = AsyncIOMotorClient(args.db_url)
+
+    coll = client[BENCH_DB]["uploadedData"]
+    await coll.create_index([("loanID", 1), ("email", 1)])
+    loan_id, email = f"BENCH-{uuid.uuid4().hex[:8]}", "bench@example.com"
+    await coll.insert_one(synthetic_loan(loan_id, email, args.loan_mb))
+
+    print(f"{'endpoint':30} {'before KB':>10} {'after KB':>10} {'before p50/p95 ms':>18} {'after p50/p95 ms':>18}")
+    try:
+        for name, before, after in endpoint_queries(coll, loan_id, email):
+            b_size, b50, b95 = await measure(before, args.iterations)
+            a_size, a50, a95 = await measure(after, args.iterations)
+            print(f"{name:30} {b_size / 1024:10.1f} {a_size / 1024:10.1f} "
+                  f"{b50:8.2f}/{b95:<9.2f} {a50:8.2f}/{a95:<9.2f}")
+    finally:
+        await coll.delete_many({"loanID": loan_id})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-url", default=os.getenv("DB_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--loan-mb", type=float, default=4.0)
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--mongomock", action="store_true")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
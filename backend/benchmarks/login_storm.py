@@ -0,0 +1,89 @@
+"""
+Login storm: many concurrent /auth/login calls for a fixed time, while a
+cheap unrelated request (GET /) is probed to see whether hashing still
+stalls the event loop.
+
+    python benchmarks/login_storm.py --api-url http://127.0.0.1:8080 --users 20 --concurrency 50 --seconds 10
+
+Registers --users throwaway accounts (bench-<run>-<n>@example.com) first.
+Reports logins per second, login latency, and the probe's p50/p99.
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+import uuid
+
+import httpx
+
+PASSWORD = "Bench-password-1!"
+
+
+def percentiles(values: list) -> str:
+    if not values:
+        return "n/a"
+    values = sorted(values)
+    p99 = values[max(0, int(len(values) * 0.99) - 1)]
+    return f"p50 {statistics.median(values):8.1f} ms  p99 {p99:8.1f} ms  max {values[-1]:8.1f} ms"
+
+
+async def register(client: httpx.AsyncClient, count: int) -> list:
+    run_id = uuid.uuid4().hex[:8]
+    emails = [f"bench-{run_id}-{n}@example.com" for n in range(count)]
+    for email in emails:
+        r = await client.post("/auth/register", json={
+            "username": email.split("@")[0], "email": email, "password": PASSWORD})
+        r.raise_for_status()
+    return emails
+
+
+async def run(args) -> int:
+    async with httpx.AsyncClient(base_url=args.api_url, timeout=120) as client, \
+            httpx.AsyncClient(base_url=args.api_url, timeout=120) as prober:
+        emails = await register(client, args.users)
+        deadline = time.perf_counter() + args.seconds
+        logins, failures, probes = [], 0, []
+
+        async def login_worker(n: int):
+            nonlocal failures
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                r = await client.post("/auth/login", json={
+                    "email": emails[n % len(emails)], "password": PASSWORD})
+                if r.status_code == 200:
+                    logins.append((time.perf_counter() - started) * 1000)
+                else:
+                    failures += 1
+                n += args.concurrency
+
+        async def probe():
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                (await prober.get("/")).raise_for_status()
+                probes.append((time.perf_counter() - started) * 1000)
+                await asyncio.sleep(args.interval)
+
+        started = time.perf_counter()
+        await asyncio.gather(probe(), *(login_worker(n) for n in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    print(f"{len(logins)} logins in {elapsed:.1f}s at concurrency {args.concurrency}: "
+          f"{len(logins) / elapsed:.1f} logins/s, {failures} failed")
+    print(f"login: {percentiles(logins)}")
+    print(f"GET /: {percentiles(probes)}  ({len(probes)} probes)")
+    return 1 if failures else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--api-url", default="http://127.0.0.1:8080")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--interval", type=float, default=0.01, help="seconds between probes")
+    return asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
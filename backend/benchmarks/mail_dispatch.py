@@ -0,0 +1,104 @@
+"""
+Outgoing mail throughput against the local SMTP sink: one new smtplib
+connection per message (the old send_email path, run on a thread pool the
+way BackgroundTasks ran it) versus the pooled MailDispatcher, at the same
+number of concurrent SMTP connections (--pool).
+
+The sink has no TLS and accepts logins instantly, so the per-message path
+looks cheaper here than against a real relay, where every new connection
+also pays TCP + STARTTLS + AUTH round trips (--connect-ms simulates that).
+
+    python benchmarks/mail_dispatch.py --messages 500 --delay-ms 5
+    python benchmarks/mail_dispatch.py --messages 200 --fail-rate 0.2    # exercise retries
+
+Needs no real mail server; the sink runs in-process on --port.
+"""
+import argparse
+import asyncio
+import os
+import smtplib
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import settings  # noqa: E402
+from app.services.mail_dispatcher import MailDispatcher, build_message  # noqa: E402
+from app.utils.smtp_sink import start_sink  # noqa: E402
+
+
+def per_message_send(port: int, n: int) -> float:
+    """One connection, login and message, like email_service.send_email."""
+    started = time.perf_counter()
+    server = smtplib.SMTP("127.0.0.1", port)
+    server.login("bench", "bench")
+    server.send_message(build_message(f"user{n}@example.com", "Bench", "<p>bench</p>"))
+    server.quit()
+    return (time.perf_counter() - started) * 1000
+
+
+async def baseline(args, handler) -> None:
+    sessions = handler.sessions
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(max_workers=args.pool) as pool:
+        started = time.perf_counter()
+        latencies = await asyncio.gather(*(
+            loop.run_in_executor(pool, per_message_send, args.port, n) for n in range(args.messages)))
+        elapsed = time.perf_counter() - started
+    print(f"per-message connection: {args.messages / elapsed:8.1f} msg/s  "
+          f"p50 {statistics.median(latencies):.1f} ms  sessions {handler.sessions - sessions}")
+
+
+async def pooled(args, handler) -> int:
+    sessions, received = handler.sessions, handler.received
+    dispatcher = MailDispatcher(pool_size=args.pool, queue_size=args.messages * 2, batch_size=args.batch,
+                                max_attempts=6, retry_base_seconds=0.05)
+    started = time.perf_counter()
+    for n in range(args.messages):
+        dispatcher.submit(f"user{n}@example.com", "Bench", "<p>bench</p>")
+    while dispatcher.stats()["sent"] + dispatcher.stats()["failed"] < args.messages:
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - started
+    await dispatcher.stop()
+
+    stats = dispatcher.stats()
+    print(f"pooled dispatcher:      {args.messages / elapsed:8.1f} msg/s  "
+          f"p50 {stats['latency_ms']['p50']:.1f} ms  sessions {handler.sessions - sessions}")
+    print(f"dispatcher stats: {stats}")
+    delivered = handler.received - received
+    if delivered + stats["failed"] != args.messages:
+        print(f"LOST MESSAGES: {args.messages - delivered - stats['failed']}")
+        return 1
+    return 0
+
+
+async def run(args) -> int:
+    settings.smtp_server, settings.smtp_port, settings.smtp_starttls = "127.0.0.1", args.port, False
+    controller, handler = start_sink(port=args.port, delay_ms=args.delay_ms,
+                                     fail_rate=args.fail_rate, connect_ms=args.connect_ms)
+    try:
+        if not args.fail_rate:
+            await baseline(args, handler)
+        return await pooled(args, handler)
+    finally:
+        controller.stop()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=300)
+    parser.add_argument("--port", type=int, default=2525)
+    parser.add_argument("--delay-ms", type=float, default=5.0, help="sink latency per message")
+    parser.add_argument("--connect-ms", type=float, default=50.0,
+                        help="sink delay per new session (TCP + STARTTLS + AUTH of a real relay)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of messages the sink rejects")
+    parser.add_argument("--pool", type=int, default=4,
+                        help="SMTP connections: dispatcher pool size, and baseline threads")
+    parser.add_argument("--batch", type=int, default=20)
+    return asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
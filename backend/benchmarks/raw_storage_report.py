@@ -0,0 +1,133 @@
+"""
+Per-document and working-set size of uploadedData with original_data stored
+inline versus moved into the compressed blob store.
+
+    python benchmarks/raw_storage_report.py --sample 200          # loans from DB_URL/DB_NAME
+    python benchmarks/raw_storage_report.py --synthetic 50        # generated OCR-like loans
+
+Only loans that still carry inline original_data can be measured from the
+database, so run this before `python -m app.services.blob_store migrate`.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import string
+import sys
+import time
+
+import bson
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.blob_store import DEFAULT_CODEC, encode_blob  # noqa: E402
+
+WORDS = ["Gross", "Pay", "Net", "YTD", "Employer", "Federal", "Tax", "Medicare", "Social", "Security",
+         "Deposit", "Balance", "Statement", "Period", "Account", "Withdrawal", "Transfer", "Payroll"]
+
+
+def _ocr_field(rng: random.Random) -> dict:
+    return {
+        "label": " ".join(rng.choices(WORDS, k=rng.randint(1, 3))),
+        "value": f"{rng.uniform(0, 20000):.2f}" if rng.random() < 0.6
+        else "".join(rng.choices(string.ascii_uppercase + string.digits, k=rng.randint(4, 18))),
+        "confidence": round(rng.uniform(0.5, 1.0), 3),
+        "bbox": [rng.randint(0, 2000) for _ in range(4)],
+    }
+
+
+def synthetic_raw_json(rng: random.Random, pages: int) -> dict:
+    return {"documents": [
+        {
+            "document_type": rng.choice(["Paystub", "W2", "Bank Statement", "1040"]),
+            "page": p,
+            "borrower": rng.choice(["John A Smith", "Mary B Smith"]),
+            "fields": [_ocr_field(rng) for _ in range(rng.randint(30, 80))],
+        }
+        for p in range(pages)
+    ]}
+
+
+def synthetic_loans(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    for i in range(count):
+        raw = synthetic_raw_json(rng, rng.randint(10, 60))
+        cleaned = {"John A Smith": {"Paystub": raw["documents"][:3]}}
+        yield {
+            "_id": bson.ObjectId(), "loanID": f"SYN-{i}", "email": "bench@example.com",
+            "original_data": raw, "cleaned_data": cleaned, "filtered_data": cleaned,
+            "original_cleaned_data": cleaned, "filtered_data_with_bs": cleaned, "only_bs": {},
+        }
+
+
+async def database_loans(sample: int):
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    db = AsyncIOMotorClient(os.environ["DB_URL"])[os.environ["DB_NAME"]]
+    cursor = db["uploadedData"].find({"original_data": {"$exists": True}}).limit(sample)
+    return await cursor.to_list(length=sample)
+
+
+def measure(loans, codec: str) -> dict:
+    before, after, blobs, seen = [], [], 0, set()
+    encode_seconds = 0.0
+    for doc in loans:
+        before.append(len(bson.encode(doc)))
+        started = time.perf_counter()
+        digest, size, packed = encode_blob(doc["original_data"], codec)
+        encode_seconds += time.perf_counter() - started
+        slim = {k: v for k, v in doc.items() if k != "original_data"}
+        slim["original_data_ref"] = {"sha256": digest, "size": size, "codec": codec, "stored_size": len(packed)}
+        after.append(len(bson.encode(slim)))
+        if digest not in seen:
+            seen.add(digest)
+            blobs += len(packed)
+    return {"before": before, "after": after, "blobs": blobs, "encode_seconds": encode_seconds}
+
+
+def report(result: dict, codec: str) -> None:
+    before, after = result["before"], result["after"]
+    mb = 1024 * 1024
+
+    def row(name, values):
+        values = sorted(values)
+        p95 = values[max(0, int(len(values) * 0.95) - 1)]
+        print(f"{name:28} {statistics.mean(values) / 1024:10.1f} {statistics.median(values) / 1024:10.1f} "
+              f"{p95 / 1024:10.1f} {max(values) / 1024:10.1f}")
+
+    print(f"{len(before)} loans, codec {codec}")
+    print(f"{'uploadedData doc size (KB)':28} {'mean':>10} {'p50':>10} {'p95':>10} {'max':>10}")
+    row("inline original_data", before)
+    row("with original_data_ref", after)
+    print()
+    print(f"uploadedData working set: {sum(before) / mb:.1f} MB -> {sum(after) / mb:.1f} MB "
+          f"({100 * (1 - sum(after) / sum(before)):.1f}% smaller)")
+    print(f"blob store (cold):        {result['blobs'] / mb:.1f} MB")
+    print(f"total on disk (uncompressed BSON): {sum(before) / mb:.1f} MB -> "
+          f"{(sum(after) + result['blobs']) / mb:.1f} MB")
+    print(f"compression time: {1000 * result['encode_seconds'] / len(before):.1f} ms per loan")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--sample", type=int, default=200, help="loans to read from the database")
+    source.add_argument("--synthetic", type=int, help="generate this many loans instead")
+    parser.add_argument("--codec", choices=["zstd", "gzip"], default=DEFAULT_CODEC)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        loans = list(synthetic_loans(args.synthetic))
+    else:
+        loans = asyncio.run(database_loans(args.sample))
+    if not loans:
+        print("No loans with inline original_data found")
+        return 1
+
+    report(measure(loans, args.codec), args.codec)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
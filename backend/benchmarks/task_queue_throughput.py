@@ -0,0 +1,166 @@
+"""
+Throughput of the Mongo task queue (app/services/task_queue.py) with 1..N
+workers, plus the exactly-once check: every task ends "done" and its
+handler ran exactly as many times as the task was claimed (no two workers
+ever held the same lease). Exits 1 if that breaks.
+
+    python benchmarks/task_queue_throughput.py --workers 1,2,4      # worker processes, DB_URL from .env
+    python benchmarks/task_queue_throughput.py --mongomock          # in-process workers, no server
+    python benchmarks/task_queue_throughput.py --fail-rate 0.2      # exercise retries
+
+Each worker runs --concurrency task slots; a task sleeps --task-ms (an
+SMTP send, a webhook) before it completes.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import sys
+import time
+import uuid
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import settings  # noqa: E402
+from app.services import task_queue  # noqa: E402
+
+RUNS = "bench_task_runs"
+
+
+def _use_mongomock() -> None:
+    import motor.motor_asyncio
+    import mongomock_motor  # optional, only for a run without a server
+    motor.motor_asyncio.AsyncIOMotorClient = mongomock_motor.AsyncMongoMockClient
+
+
+def _db():
+    from app.db import get_db
+    return get_db()
+
+
+@task_queue.task("bench_task")
+async def bench_task(payload):
+    await _db()[RUNS].insert_one({"run": payload["run"], "n": payload["n"]})
+    if payload["ms"]:
+        await asyncio.sleep(payload["ms"] / 1000)
+    if random.random() < payload["fail_rate"]:
+        raise RuntimeError("simulated failure")
+
+
+def _configure(args) -> None:
+    settings.task_poll_seconds = 0.05
+    settings.task_retry_base_seconds = 0.01
+    settings.task_max_attempts = 50
+
+
+def _worker_process(args, stop) -> None:
+    """Entry point of one worker process (spawned)."""
+    _configure(args)
+
+    async def main():
+        from app.db import init_db
+        await init_db()
+        stop_event = asyncio.Event()
+        watcher = asyncio.get_running_loop().run_in_executor(None, stop.wait)
+        worker = asyncio.create_task(task_queue.run_worker(_db(), args.concurrency, stop=stop_event))
+        await watcher
+        stop_event.set()
+        await worker
+
+    asyncio.run(main())
+
+
+async def wait_drained(db, run: str, total: int) -> None:
+    while await db[task_queue.TASKS].count_documents(
+            {"payload.run": run, "status": task_queue.DONE}) < total:
+        await asyncio.sleep(0.05)
+
+
+async def check(db, run: str, total: int) -> list:
+    """Problems found in the run; empty when every task ran once per claim and finished."""
+    runs = Counter()
+    async for doc in db[RUNS].find({"run": run}, {"n": 1}):
+        runs[doc["n"]] += 1
+    problems = []
+    async for doc in db[task_queue.TASKS].find({"payload.run": run}):
+        n = doc["payload"]["n"]
+        if doc["status"] != task_queue.DONE:
+            problems.append(f"task {n} ended {doc['status']}")
+        elif runs[n] != doc["attempts"]:
+            problems.append(f"task {n} ran {runs[n]} times for {doc['attempts']} claims")
+    if len(runs) != total:
+        problems.append(f"{total - len(runs)} tasks never ran")
+    return problems
+
+
+async def bench(args, workers: int) -> int:
+    db = _db()
+    run = uuid.uuid4().hex[:8]
+    for start in range(0, args.tasks, 100):
+        await asyncio.gather(*(task_queue.enqueue(db, "bench_task", {
+            "run": run, "n": n, "ms": args.task_ms, "fail_rate": args.fail_rate,
+        }) for n in range(start, min(args.tasks, start + 100))))
+
+    started = time.perf_counter()
+    if args.mongomock:
+        # One process: workers are separate run_worker loops with their own ids
+        stop = asyncio.Event()
+        loops = [asyncio.create_task(task_queue.run_worker(db, args.concurrency, f"bench-{w}", stop))
+                 for w in range(workers)]
+        await wait_drained(db, run, args.tasks)
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await asyncio.gather(*loops)
+    else:
+        ctx = multiprocessing.get_context("spawn")
+        stop = ctx.Event()
+        procs = [ctx.Process(target=_worker_process, args=(args, stop)) for _ in range(workers)]
+        for proc in procs:
+            proc.start()
+        await wait_drained(db, run, args.tasks)
+        elapsed = time.perf_counter() - started
+        stop.set()
+        for proc in procs:
+            proc.join()
+
+    problems = await check(db, run, args.tasks)
+    claims = sum([doc["attempts"] async for doc in db[task_queue.TASKS].find({"payload.run": run}, {"attempts": 1})])
+    print(f"{workers:2} workers x {args.concurrency} slots: {args.tasks / elapsed:8.1f} tasks/s  "
+          f"({args.tasks} tasks, {claims - args.tasks} retries, {elapsed:.2f}s)  "
+          f"{'ok' if not problems else 'FAILED'}")
+    for problem in problems[:10]:
+        print(f"  {problem}")
+
+    await db[task_queue.TASKS].delete_many({"payload.run": run})
+    await db[RUNS].delete_many({"run": run})
+    return 1 if problems else 0
+
+
+async def run(args) -> int:
+    if args.mongomock:
+        _use_mongomock()
+    _configure(args)
+    from app.db import init_db
+    await init_db()
+
+    failed = 0
+    for workers in [int(w) for w in args.workers.split(",")]:
+        failed |= await bench(args, workers)
+    return failed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=1000)
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts to compare")
+    parser.add_argument("--concurrency", type=int, default=4, help="task slots per worker")
+    parser.add_argument("--task-ms", type=float, default=10.0, help="time each task spends awaiting")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of runs that raise")
+    parser.add_argument("--mongomock", action="store_true")
+    return asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
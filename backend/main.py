@@ -1,20 +1,43 @@
-from fastapi import FastAPI, HTTPException, Body, Query, File, UploadFile
+from fastapi import FastAPI, HTTPException, Body, Query, File, UploadFile, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from starlette.datastructures import UploadFile as StarletteUploadFile
+from pydantic import BaseModel, ValidationError
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 import asyncio
+import hashlib
 import json
-import yaml
+import time
 import uvicorn
 from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 
 from app.routes import auth, uploaded_data, admin
-from app.utils.borrower_cleanup_service import clean_borrower_documents_from_dict
-from app.db import db
+from app.utils import process_pool
+from app.utils.process_pool import run_cpu_bound, shutdown_pool
+from app.utils.deps import principal_cache
+from app.db import db, init_db, pool_telemetry
+from app.config import settings
 from app.services.audit_service import log_action  # <-- audit service
-from app.utils.MCP_Connector import MCPClient
+from app.utils.MCP_Connector import MCPClient, MCPDeadlineExceeded
 from app.utils.Data_formatter import BorrowerDocumentProcessor
+from app.utils.lru_cache import LRUCache
+from app.utils.single_flight import SingleFlight
+from app.utils.mongo_keys import encode_key, decode_keys
+from app.utils.request_scope import request_deadline, run_request_scoped
+from app.services.rule_registry import rule_registry
+from app.services.loan_cache import loan_cache, ANALYZED_FLAG, VERSION_FIELD, VERSION_BUMP
+from app.services.blob_store import encoded_blob_ref, get_blob, store_record_blob
+from app.services.loan_ingest import prepare_upload, prepare_cleaned_update
+from app.services.bulk_ingest import BulkLoan, ingest_loans
+from app.services.mail_dispatcher import mail_dispatcher
+from app.services.task_queue import run_worker, queue_stats
+from app.services.token_ledger import ledger_entry, record_usage, reported_usage, usage_summary
+from app.services.uploaded_data import upsert_loan_summary, ensure_loan_summaries, borrower_names
+from app.utils.index_advisor import assert_no_collscan
+from app.utils.metrics import PrometheusMiddleware, lock_wait, metrics_response, register_cache
+from app.utils.tracing import TracingMiddleware, setup_tracing, shutdown_tracing, tracer
 import logging
 import os
 
@@ -27,21 +50,22 @@ logger = logging.getLogger(__name__)
 # -----------------------------
 # Config
 # -----------------------------
-allowed_sections = ["BorrowerName", "W2", "VOE", "Paystubs", "Paystub"]
-bs_allowed_sections = ["BorrowerName", "W2",
-                       "VOE", "Paystubs", "Paystub", 'Bank Statement']
-bank_statement = ['Bank Statement']
-
-
-try:
-    with open("requirements.yaml") as stream:
-        requirements = yaml.safe_load(stream)
-except FileNotFoundError:
-    logger.error("requirements.yaml file not found")
-    requirements = {"rules": [], "required_fields": []}
-except yaml.YAMLError as e:
-    logger.error(f"Error parsing requirements.yaml: {e}")
-    requirements = {"rules": [], "required_fields": []}
+# Cached MCP results, keyed by (tool, rule/field-group id, content hash).
+# Rule ids are content hashes, so an edited rule simply misses; entries for
+# rules that disappear on reload are evicted by the listener below.
+rule_result_cache = LRUCache(max_entries=2048)
+
+
+def evict_stale_rule_results(old, new):
+    if old is None:
+        return
+    removed = old.ids() - new.ids()
+    evicted = rule_result_cache.evict_where(lambda key: key[1] in removed)
+    logger.info(
+        f"Rules {old.version} -> {new.version}: evicted {evicted} cached results")
+
+
+rule_registry.subscribe(evict_stale_rule_results)
 
 app = FastAPI(title="Income Analyzer API", version="1.0.0")
 
@@ -58,78 +82,69 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
+app.add_middleware(TracingMiddleware)
+app.add_middleware(PrometheusMiddleware)
 
 
-mcp_client = MCPClient("http://localhost:8000/mcp")
+mcp_client = MCPClient(
+    settings.mcp_server_url,
+    call_timeout=settings.mcp_call_timeout,
+    connect_timeout=settings.mcp_connect_timeout,
+    failure_threshold=settings.mcp_failure_threshold,
+    reset_timeout=settings.mcp_reset_timeout,
+)
 client_lock = asyncio.Lock()
 
+register_cache("rule_results", rule_result_cache)
+register_cache("loan_views", loan_cache)
+register_cache("principals", principal_cache)
+
+# Identical analyses running at the same time share one computation
+analysis_flights = SingleFlight()
+
 
 # Storage for uploaded borrower content
 uploaded_content: Dict[int, Dict[str, Any]] = {}
 
+# In-app task queue worker (settings.task_workers_in_app slots)
+task_worker_stop = asyncio.Event()
+task_worker: Optional[asyncio.Task] = None
+
 # -----------------------------
 # Startup / Shutdown
 # -----------------------------
 
 
-def clean_json_data(obj):
-    if isinstance(obj, dict):
-        # Remove unwanted keys
-        obj.pop("Link", None)
-        obj.pop("ConfidenceScore", None)
-        obj.pop("Url", None)
-        obj.pop("LabelOrder", None)
-        obj.pop("ScreenshotUrl", None)
-        obj.pop("GeneratedOn", None)
-        obj.pop("DocTitle", None)
-        obj.pop("PageNumber", None)
-        obj.pop("StageName", None)
-        obj.pop("Title", None)
-        obj.pop("SkillName", None)
-        # Recursively clean nested dicts
-        for key in list(obj.keys()):
-            clean_json_data(obj[key])
-    elif isinstance(obj, list):
-        for item in obj:
-            clean_json_data(item)
-    return obj
-
-
-def filter_documents_by_type(processed_data, document_types):
-    """
-    Filter processed borrower data to include only specified document types.
-
-    Args:
-        processed_data (dict): The processed JSON data with borrower names as keys
-        document_types (list): List of document types to keep (e.g., ['Paystubs', 'W2'])
-
-    Returns:
-        dict: Filtered data containing only the specified document types for each borrower
-    """
-    filtered_data = {}
-
-    # Iterate through each borrower
-    for borrower_name, documents in processed_data.items():
-        filtered_borrower_data = {}
-
-        # Iterate through each document type for this borrower
-        for doc_type, doc_list in documents.items():
-            # Check if this document type is in our filter list (case-insensitive)
-            if any(doc_type.lower() == filter_type.lower() for filter_type in document_types):
-                filtered_borrower_data[doc_type] = doc_list
-
-        # Only add borrower if they have at least one of the requested document types
-        if filtered_borrower_data:
-            filtered_data[borrower_name] = filtered_borrower_data
-
-    return filtered_data
-
-
 @app.on_event("startup")
 async def startup_event():
+    setup_tracing(
+        "income-analyzer-api",
+        exporter=settings.tracing_exporter,
+        file_path=settings.tracing_file,
+        sample_ratio=settings.tracing_sample_ratio,
+        otlp_endpoint=settings.tracing_otlp_endpoint,
+    )
+
+    # Fail fast on a broken requirements.yaml instead of serving empty rules
+    rules = rule_registry.load()
+    logger.info(
+        f"Loaded {len(rules.rules)} rules, version {rules.version}")
+
+    await init_db()
+    if settings.index_check_on_startup:
+        await assert_no_collscan(db)
+    await ensure_loan_summaries(db)
+    await process_pool.warm_up()
+    mail_dispatcher.start()
+    if settings.task_workers_in_app > 0:
+        global task_worker
+        task_worker = asyncio.create_task(
+            run_worker(db, settings.task_workers_in_app, stop=task_worker_stop))
+
     try:
-        await mcp_client.connect()
+        await mcp_client.ensure_connected()
         logger.info("MCP client connected successfully")
     except Exception as e:
         logger.error(f"Failed to connect MCP client: {e}")
@@ -142,6 +157,12 @@ async def shutdown_event():
         logger.info("MCP client cleanup completed")
     except Exception as e:
         logger.error(f"Error during MCP client cleanup: {e}")
+    shutdown_pool()
+    if task_worker is not None:
+        task_worker_stop.set()
+        await task_worker
+    await mail_dispatcher.stop()
+    shutdown_tracing()
 
 
 @app.get("/")
@@ -149,6 +170,29 @@ async def root():
     return {"message": "Welcome to the Income Analyzer API"}
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus exposition of the metrics in app/utils/metrics.py."""
+    return metrics_response()
+
+
+@app.get("/stats")
+async def stats():
+    """In-process counters for caches and request coalescing."""
+    return {
+        "rules_version": rule_registry.current.version,
+        "rule_result_cache": rule_result_cache.stats(),
+        "analysis_single_flight": analysis_flights.stats(),
+        "mcp_client": mcp_client.stats(),
+        "process_pool": process_pool.stats(),
+        "mongo_pool": pool_telemetry.stats(),
+        "principal_cache": principal_cache.stats(),
+        "mail": mail_dispatcher.stats(),
+        "task_queue": await queue_stats(db),
+        "loan_cache": loan_cache.stats(),
+    }
+
+
 # ---------- MODELS ----------
 class CleanJsonRequest(BaseModel):
     username: str
@@ -184,23 +228,16 @@ class GetAnalyzedDataRequest(BaseModel):
 
 
 # ---------- ROUTES ----------
-@app.post("/clean-json")
-async def clean_json(req: CleanJsonRequest):
-    """Insert new record with cleaned data (first time upload)."""
-    cleaned = clean_borrower_documents_from_dict(
-        data=req.raw_json,
-        # threshold=req.threshold,
-        # borrower_indicators=req.borrower_indicators,
-        # employer_indicators=req.employer_indicators,
-    )
+def body_size(request: Request) -> int:
+    return int(request.headers.get("content-length") or 0)
 
-    cl_data = clean_json_data(cleaned)
 
-    filtered_data = filter_documents_by_type(cl_data, allowed_sections)
-
-    filtered_data_with_bs = filter_documents_by_type(
-        cl_data, bs_allowed_sections)
-    only_bs = filter_documents_by_type(cl_data, bank_statement)
+@app.post("/clean-json")
+async def clean_json(req: CleanJsonRequest, request: Request):
+    """Insert new record with cleaned data (first time upload)."""
+    # Cleaning and compressing a large export runs in the process pool
+    views, blob = await run_cpu_bound(prepare_upload, body_size(request), req.raw_json)
+    cleaned = views["cleaned_data"]
 
     timestamp = datetime.now().strftime("%Y-%m-%d %I:%M:%S %p")
 
@@ -209,23 +246,38 @@ async def clean_json(req: CleanJsonRequest):
         "email": req.email,
         "loanID": req.loanID,
         "file_name": req.file_name,
-        "original_data": req.raw_json,
-        "cleaned_data": cleaned,
-        "filtered_data": filtered_data,
+        # Raw OCR export lives compressed in the blob store; see /get-raw-data
+        "original_data_ref": encoded_blob_ref(*blob),
+        **views,
         "original_cleaned_data": cleaned,
-        "only_bs": only_bs,
-        "filtered_data_with_bs": filtered_data_with_bs,
         "created_at": timestamp,
         "updated_at": timestamp,
+        VERSION_FIELD: 1,
     }
 
-    await db["uploadedData"].insert_one(record)
+    # The record goes in first: a rejected duplicate must not leave a blob behind
+    try:
+        await db["uploadedData"].insert_one(record)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="Loan ID already exists")
+    try:
+        await store_record_blob(db, record, blob)
+    except Exception as e:
+        # Without its raw payload the loan is incomplete; take it back out
+        logger.error(f"Storing the raw payload of loan {req.loanID} failed: {e}")
+        await db["uploadedData"].delete_one({"_id": record["_id"]})
+        raise HTTPException(status_code=500, detail="Storing the raw payload failed")
+    await upsert_loan_summary(
+        db, req.loanID, req.email, timestamp,
+        file_name=req.file_name, borrower=borrower_names(cleaned), analyzed_data=False,
+    )
 
     return {"message": "Upload saved successfully", "cleaned_json": cleaned}
 
 
 @app.post("/update-cleaned-data")
 async def update_cleaned_data(
+    request: Request,
     email: str = Body(...),
     loanID: str = Body(...),
     username: str = Body(...),
@@ -238,31 +290,26 @@ async def update_cleaned_data(
 
     timestamp = datetime.now().strftime("%Y-%m-%d %I:%M:%S %p")
 
-    existing = await db["uploadedData"].find_one({"loanID": loanID, "email": email})
-    if not existing:
-        raise HTTPException(status_code=404, detail="Record not found")
-
-    old_cleaned = existing.get("cleaned_data", {})
-
-    cl_data = clean_json_data(raw_json)
-    filtered_data = filter_documents_by_type(cl_data, allowed_sections)
+    views = await run_cpu_bound(prepare_cleaned_update, body_size(request), raw_json)
+    cl_data = views["cleaned_data"]
 
-    filtered_data_with_bs = filter_documents_by_type(
-        cl_data, bs_allowed_sections)
-    only_bs = filter_documents_by_type(cl_data, bank_statement)
-
-    # Save new cleaned_data
-    await db["uploadedData"].update_one(
-        {"loanID": loanID},
+    # Save new cleaned_data; the pre-image supplies the audit "old" value
+    existing = await db["uploadedData"].find_one_and_update(
+        {"loanID": loanID, "email": email},
         {"$set": {
-            "cleaned_data": cl_data,
-            "filtered_data": filtered_data,
-            "only_bs": only_bs,
-            "filtered_data_with_bs": filtered_data_with_bs,
+            **views,
             "hasModifications": hasModifications,
             "updated_at": timestamp
-        }}
+        }, **VERSION_BUMP},
+        projection={"cleaned_data": 1, "_id": 0},
+        return_document=ReturnDocument.BEFORE,
     )
+    if existing is None:
+        raise HTTPException(status_code=404, detail="Record not found")
+    loan_cache.invalidate(loanID, email)
+
+    old_cleaned = existing.get("cleaned_data", {})
+    await upsert_loan_summary(db, loanID, email, timestamp, borrower=borrower_names(cl_data))
 
     # Log audit entry
     await log_action(
@@ -272,24 +319,135 @@ async def update_cleaned_data(
         action=action,
         # description=description,
         old_cleaned_data=old_cleaned,
-        new_cleaned_data=raw_json,
+        new_cleaned_data=cl_data,
     )
 
-    # Return updated cleaned_json from DB
-    updated = await db["uploadedData"].find_one({"loanID": loanID, "email": email})
+    # This is exactly what was written; no need to read it back
     return {
         "message": "Cleaned data updated successfully",
-        "cleaned_json": updated.get("cleaned_data", {}),
+        "cleaned_json": cl_data,
     }
 
 
+NDJSON_TYPES = ("application/x-ndjson", "application/jsonl", "application/json-lines")
+
+
+def validation_message(e: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, err['loc'])) or 'body'}: {err['msg']}" for err in e.errors())
+
+
+async def read_bulk_loans(request: Request) -> List[Any]:
+    """
+    Loans of a bulk upload, either NDJSON (one /clean-json body per line) or
+    multipart form data (`username`, `email` and one JSON file per loan, the
+    file name without extension being the loan ID). Entries that cannot be
+    parsed are returned as an error message in their position.
+    """
+    content_type = request.headers.get("content-type", "")
+    loans: List[Any] = []
+
+    if content_type.startswith(NDJSON_TYPES):
+        body = await request.body()
+        for n, line in enumerate(body.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                loans.append(BulkLoan.model_validate_json(line))
+            except ValidationError as e:
+                loans.append(f"Line {n}: {validation_message(e)}")
+
+    elif content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        username, email = form.get("username"), form.get("email")
+        if not username or not email:
+            raise HTTPException(status_code=400, detail="username and email are required")
+        for upload in form.getlist("files"):
+            if not isinstance(upload, StarletteUploadFile):
+                continue
+            name = upload.filename or ""
+            try:
+                loans.append(BulkLoan(
+                    username=username,
+                    email=email,
+                    loanID=os.path.splitext(name)[0],
+                    file_name=name,
+                    raw_json=json.loads(await upload.read()),
+                ))
+            except ValidationError as e:
+                loans.append(f"{name}: {validation_message(e)}")
+            except ValueError as e:
+                loans.append(f"{name}: invalid JSON ({e})")
+
+    else:
+        raise HTTPException(status_code=415, detail="Send application/x-ndjson or multipart/form-data")
+
+    if not loans:
+        raise HTTPException(status_code=400, detail="No loans in upload")
+    if len(loans) > settings.bulk_max_loans:
+        raise HTTPException(status_code=413, detail=f"At most {settings.bulk_max_loans} loans per upload")
+    return loans
+
+
+@app.post("/bulk-clean-json")
+async def bulk_clean_json(request: Request):
+    """Insert many new loans at once; returns a status per loan in upload order."""
+    loans = await read_bulk_loans(request)
+    report = await ingest_loans(db, loans, settings.bulk_insert_batch)
+    logger.info(f"Bulk upload of {report['total']} loans: {report['counts']}")
+    return report
+
+
 @app.get("/check-loanid")
 async def check_loanid(email: str = Query(...), loanID: str = Query(...)):
     """Check if a loanID already exists for a given email"""
-    existing = await db["uploadedData"].find_one({"loanID": loanID, "email": email})
+    existing = await db["uploadedData"].find_one(
+        {"loanID": loanID, "email": email}, {"_id": 1})
     return {"exists": bool(existing)}
 
 
+def data_version(doc: dict):
+    """Version stamp of a stored loan; every write bumps it."""
+    return doc.get(VERSION_FIELD, 0)
+
+
+def serialize_payload(data) -> str:
+    """json.dumps of the MCP tool content, traced (large loans take a while)."""
+    with tracer.start_as_current_span("serialize_payload") as span:
+        payload = json.dumps(data)
+        span.set_attribute("payload.bytes", len(payload))
+        return payload
+
+
+async def call_tool_booked(tool: str, arguments: dict, deadline, usage: list, **scope):
+    """
+    mcp_client.call_tool, booking the tokens the server reports into `usage`.
+    A call that fails, times out or is cancelled is booked as well, with that
+    outcome and how long it ran; the server never reports its tokens.
+    """
+    started = time.monotonic()
+    outcome = "error"
+    try:
+        response = await mcp_client.call_tool(tool, arguments, deadline=deadline)
+    except MCPDeadlineExceeded:
+        outcome = "timeout"
+        raise
+    except asyncio.CancelledError:
+        outcome = "cancelled"
+        raise
+    else:
+        outcome = None
+        usage.append(ledger_entry(tool, usage=reported_usage(response), **scope))
+        return response
+    finally:
+        if outcome is not None:
+            elapsed_ms = round((time.monotonic() - started) * 1000, 1)
+            usage.append(ledger_entry(tool, usage={"outcome": outcome, "duration_ms": elapsed_ms}, **scope))
+
+
+def content_digest(payload: str) -> str:
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
 def convert_objectid(obj):
     if isinstance(obj, dict):
         return {k: convert_objectid(v) for k, v in obj.items()}
@@ -303,15 +461,16 @@ def convert_objectid(obj):
 
 @app.post("/verify-rules")
 async def verify_rules(
+    request: Request,
     email: str = Query(...),
     loanID: str = Query(...),
-    borrower: str = Query("All")
+    borrower: str = Query("All"),
+    timeout: Optional[float] = Query(None, gt=0)
 ):
     """Verify rules for previously uploaded borrower JSON"""
-    content = await db["uploadedData"].find_one(
-        {"loanID": loanID, "email": email},
-        {"filtered_data": 1, "_id": 0}
-    )
+    deadline = request_deadline(request, timeout)
+    content = await loan_cache.get_view(
+        db, loanID, email, "filtered_data", {"filtered_data": 1})
 
     if not content or "filtered_data" not in content:
         return {"status": "error", "results": [], "rule_result": {}}
@@ -327,62 +486,93 @@ async def verify_rules(
     if not data:
         return {"status": "error", "results": [], "rule_result": {}}
 
-    try:
-        results = []
-        rule_result = {"Pass": 0, "Fail": 0,
-                       "Insufficient data": 0, "Error": 0}
-
-        async with client_lock:
-            for rule in requirements["rules"]:
-                try:
-                    response = await mcp_client.call_tool(
-                        "rule_verification",
-                        {"rules": rule, "content": json.dumps(data)}
-                    )
-
-                    if response.content and len(response.content) > 0 and response.content[0].text.strip():
-                        parsed_response = json.loads(response.content[0].text)
-                        if parsed_response["status"] == "Pass":
+    rules = rule_registry.current
+    key = ("verify-rules", loanID, email, borrower,
+           data_version(content), rules.version)
+
+    async def run_analysis():
+        payload = serialize_payload(data)
+        digest = content_digest(payload)
+        usage = []
+        scope = {"loanID": loanID, "email": email, "borrower": borrower}
+
+        try:
+            results = []
+            rule_result = {"Pass": 0, "Fail": 0,
+                           "Insufficient data": 0, "Error": 0}
+
+            async with lock_wait(client_lock, "/verify-rules"):
+                for rule in rules.rules:
+                    cache_key = ("rule_verification", rule.id, digest)
+                    try:
+                        parsed_response = rule_result_cache.get(cache_key)
+                        if parsed_response is not None:
+                            usage.append(ledger_entry(
+                                "rule_verification", rule_id=rule.id, cache_hit=True, **scope))
+                        else:
+                            response = await call_tool_booked(
+                                "rule_verification",
+                                {"rules": rule.text, "content": payload},
+                                None, usage, rule_id=rule.id, **scope,
+                            )
+
+                            if response.content and len(response.content) > 0 and response.content[0].text.strip():
+                                parsed_response = json.loads(
+                                    response.content[0].text)
+                                if "status" in parsed_response:
+                                    rule_result_cache.set(
+                                        cache_key, parsed_response)
+                            else:
+                                parsed_response = {
+                                    "error": "Empty response from MCP client"}
+
+                        if "error" in parsed_response:
+                            rule_result["Error"] += 1
+                        elif parsed_response["status"] == "Pass":
                             rule_result["Pass"] += 1
                         elif parsed_response["status"] == "Fail":
                             rule_result["Fail"] += 1
                         else:
                             rule_result["Insufficient data"] += 1
-                    else:
+
+                    except json.JSONDecodeError as e:
+                        rule_result["Error"] += 1
+                        logger.error(f"JSON decode error for rule {rule.id}: {e}")
+                        parsed_response = {"error": "Invalid JSON response"}
+                    except Exception as e:
                         rule_result["Error"] += 1
+                        logger.error(f"Rule verification error for {rule.id}: {e}")
                         parsed_response = {
-                            "error": "Empty response from MCP client"}
+                            "error": f"Verification failed: {str(e)}"}
 
-                except json.JSONDecodeError as e:
-                    rule_result["Error"] += 1
-                    logger.error(f"JSON decode error for rule {rule}: {e}")
-                    parsed_response = {"error": "Invalid JSON response"}
-                except Exception as e:
-                    rule_result["Error"] += 1
-                    logger.error(f"Rule verification error for {rule}: {e}")
-                    parsed_response = {
-                        "error": f"Verification failed: {str(e)}"}
+                    results.append({"rule": rule.text, "rule_id": rule.id,
+                                   "result": parsed_response})
 
-                results.append({"rule": rule, "result": parsed_response})
+            return {"status": "success", "results": results, "rule_result": rule_result,
+                    "rules_version": rules.version}
 
-        return {"status": "success", "results": results, "rule_result": rule_result}
+        except Exception as e:
+            logger.error(f"Rules verification failed: {e}")
+            return {"status": "error", "results": [], "rule_result": {}}
+        finally:
+            await record_usage(db, usage)
 
-    except Exception as e:
-        logger.error(f"Rules verification failed: {e}")
-        return {"status": "error", "results": [], "rule_result": {}}
+    return await run_request_scoped(
+        request, lambda: analysis_flights.do(key, run_analysis), deadline)
 
 
 @app.post("/income-calc")
 async def income_calc(
+    request: Request,
     email: str = Query(...),
     loanID: str = Query(...),
-    borrower: str = Query("All")
+    borrower: str = Query("All"),
+    timeout: Optional[float] = Query(None, gt=0)
 ):
     """Calculate income for previously uploaded borrower JSON"""
-    content = await db["uploadedData"].find_one(
-        {"loanID": loanID, "email": email},
-        {"filtered_data": 1, "_id": 0}
-    )
+    deadline = request_deadline(request, timeout)
+    content = await loan_cache.get_view(
+        db, loanID, email, "filtered_data", {"filtered_data": 1})
 
     if not content or "filtered_data" not in content:
         return {"status": "error", "income": []}
@@ -397,52 +587,78 @@ async def income_calc(
     if not data:
         return {"status": "error", "income": []}
 
-    try:
-        final_response = []
-        header_key = requirements["required_fields"].keys()
-        for key in header_key:
-            async with client_lock:
-                try:
-                    response = await mcp_client.call_tool(
-                        "income_calculator",
-                        {"fields": requirements["required_fields"]
-                            [key], "content": json.dumps(data)},
-                    )
-
-                    if response.content and len(response.content) > 0 and response.content[0].text.strip():
-                        parsed_response = json.loads(response.content[0].text)
-                    else:
-                        parsed_response = {
-                            "error": "Empty response from MCP client"}
-
-                except json.JSONDecodeError as e:
-                    logger.error(
-                        f"JSON decode error in income calculation: {e}")
-                    parsed_response = {"error": "Invalid JSON response"}
-                except Exception as e:
-                    logger.error(f"Income calculation error: {e}")
-                    parsed_response = {
-                        "error": f"Calculation failed: {str(e)}"}
-            final_response.append(parsed_response)
-
-        return {"status": "success", "income": final_response}
-
-    except Exception as e:
-        logger.error(f"Income calculation failed: {e}")
-        return {"status": "error", "income": [e]}
+    rules = rule_registry.current
+    key = ("income-calc", loanID, email, borrower,
+           data_version(content), rules.version)
+
+    async def run_analysis():
+        payload = serialize_payload(data)
+        digest = content_digest(payload)
+        usage = []
+        scope = {"loanID": loanID, "email": email, "borrower": borrower}
+
+        try:
+            final_response = []
+            for group in rules.required_fields:
+                cache_key = ("income_calculator", group.id, digest)
+                parsed_response = rule_result_cache.get(cache_key)
+                if parsed_response is not None:
+                    usage.append(ledger_entry(
+                        "income_calculator", rule_id=group.id, cache_hit=True, **scope))
+                else:
+                    async with lock_wait(client_lock, "/income-calc"):
+                        try:
+                            response = await call_tool_booked(
+                                "income_calculator",
+                                {"fields": group.fields, "content": payload},
+                                None, usage, rule_id=group.id, **scope,
+                            )
+
+                            if response.content and len(response.content) > 0 and response.content[0].text.strip():
+                                parsed_response = json.loads(
+                                    response.content[0].text)
+                                if isinstance(parsed_response, dict) and "error" not in parsed_response:
+                                    rule_result_cache.set(
+                                        cache_key, parsed_response)
+                            else:
+                                parsed_response = {
+                                    "error": "Empty response from MCP client"}
+
+                        except json.JSONDecodeError as e:
+                            logger.error(
+                                f"JSON decode error in income calculation: {e}")
+                            parsed_response = {"error": "Invalid JSON response"}
+                        except Exception as e:
+                            logger.error(f"Income calculation error: {e}")
+                            parsed_response = {
+                                "error": f"Calculation failed: {str(e)}"}
+                final_response.append(parsed_response)
+
+            return {"status": "success", "income": final_response,
+                    "rules_version": rules.version}
+
+        except Exception as e:
+            logger.error(f"Income calculation failed: {e}")
+            return {"status": "error", "income": [e]}
+        finally:
+            await record_usage(db, usage)
+
+    return await run_request_scoped(
+        request, lambda: analysis_flights.do(key, run_analysis), deadline)
 
 
 @app.post("/income-insights")
 async def income_insights(
+    request: Request,
     email: str = Query(...),
     loanID: str = Query(...),
-    borrower: str = Query("All")
+    borrower: str = Query("All"),
+    timeout: Optional[float] = Query(None, gt=0)
 ):
     """Generate income insights for borrower JSON"""
-    content = await db["uploadedData"].find_one(
-        {"loanID": loanID, "email": email},
-        {"filtered_data_with_bs": 1, "_id": 0}
-    )
+    deadline = request_deadline(request, timeout)
+    content = await loan_cache.get_view(
+        db, loanID, email, "filtered_data_with_bs", {"filtered_data_with_bs": 1})
 
     if not content or "filtered_data_with_bs" not in content:
         return {"status": "error", "income_insights": {}}
@@ -457,79 +673,104 @@ async def income_insights(
     if not data:
         return {"status": "error", "income_insights": {}}
 
-    try:
-        async with client_lock:
-            try:
-                response = await mcp_client.call_tool(
-                    "income_insights",
-                    {"content": json.dumps(data)},
-                )
+    key = ("income-insights", loanID, email, borrower, data_version(content))
 
-                if response.content and len(response.content) > 0 and response.content[0].text.strip():
-                    parsed_response = json.loads(response.content[0].text)
-                else:
-                    parsed_response = {
-                        "error": "Empty response from MCP client"}
+    async def run_analysis():
+        usage = []
+        try:
+            async with lock_wait(client_lock, "/income-insights"):
+                try:
+                    response = await call_tool_booked(
+                        "income_insights",
+                        {"content": serialize_payload(data)},
+                        None, usage, loanID=loanID, email=email, borrower=borrower,
+                    )
 
-            except json.JSONDecodeError as e:
-                logger.error(f"JSON decode error in income insights: {e}")
-                parsed_response = {"error": "Invalid JSON response"}
-            except Exception as e:
-                logger.error(f"Income insights error: {e}")
-                parsed_response = {"error": f"Calculation failed: {str(e)}"}
+                    if response.content and len(response.content) > 0 and response.content[0].text.strip():
+                        parsed_response = json.loads(response.content[0].text)
+                    else:
+                        parsed_response = {
+                            "error": "Empty response from MCP client"}
 
-        return {"status": "success", "income_insights": parsed_response}
+                except json.JSONDecodeError as e:
+                    logger.error(f"JSON decode error in income insights: {e}")
+                    parsed_response = {"error": "Invalid JSON response"}
+                except Exception as e:
+                    logger.error(f"Income insights error: {e}")
+                    parsed_response = {"error": f"Calculation failed: {str(e)}"}
 
-    except Exception as e:
-        logger.error(f"Income insights failed: {e}")
-        return {"status": "error", "income_insights": e}
+            return {"status": "success", "income_insights": parsed_response}
+
+        except Exception as e:
+            logger.error(f"Income insights failed: {e}")
+            return {"status": "error", "income_insights": e}
+        finally:
+            await record_usage(db, usage)
+
+    return await run_request_scoped(
+        request, lambda: analysis_flights.do(key, run_analysis), deadline)
 
 
 @app.post("/banksatement-insights")
-async def banksatement_insights(email: str = Query(...), loanID: str = Query(...)):
-    content = await db["uploadedData"].find_one({"loanID": loanID, "email": email}, {"only_bs": 1, "_id": 0})
+async def banksatement_insights(
+    request: Request,
+    email: str = Query(...),
+    loanID: str = Query(...),
+    timeout: Optional[float] = Query(None, gt=0)
+):
+    deadline = request_deadline(request, timeout)
+    content = await loan_cache.get_view(db, loanID, email, "only_bs", {"only_bs": 1})
 
     if not content:
         return {"status": "Failure", "income_insights": ['Insufficient documents for bank statement insights.']}
 
+    key = ("banksatement-insights", loanID, email, "All", data_version(content))
     content = content['only_bs']
 
-    try:
-        async def run_insights():
-            try:
-                response = await mcp_client.call_tool(
-                    "bank_statement_insights",
-                    {"content": json.dumps(content)},
-                )
-                if response.content and len(response.content) > 0 and response.content[0].text.strip():
-                    parsed_response = json.loads(response.content[0].text)
-                else:
-                    parsed_response = {
-                        "error": "Empty response from MCP client"}
-            except Exception as e:
-                parsed_response = {"error": str(e)}
-            return parsed_response
-
-        parsed_response = await run_insights()
-
-        return {"status": "success", "income_insights": parsed_response}
-
-    except Exception as e:
-        logger.error(f"Income insights failed: {e}")
-        return {"status": "success", "income_insights": e}
+    async def run_insights():
+        usage = []
+        try:
+            response = await call_tool_booked(
+                "bank_statement_insights",
+                {"content": serialize_payload(content)},
+                None, usage, loanID=loanID, email=email,
+            )
+            if response.content and len(response.content) > 0 and response.content[0].text.strip():
+                parsed_response = json.loads(response.content[0].text)
+            else:
+                parsed_response = {
+                    "error": "Empty response from MCP client"}
+        except Exception as e:
+            parsed_response = {"error": str(e)}
+        finally:
+            await record_usage(db, usage)
+        return parsed_response
+
+    async def respond():
+        try:
+            parsed_response = await analysis_flights.do(key, run_insights)
+
+            return {"status": "success", "income_insights": parsed_response}
+
+        except Exception as e:
+            logger.error(f"Income insights failed: {e}")
+            return {"status": "success", "income_insights": e}
+
+    return await run_request_scoped(request, respond, deadline)
 
 
 @app.post("/income-self_emp")
 async def income_self_emp(
+    request: Request,
     email: str = Query(...),
     loanID: str = Query(...),
-    borrower: str = Query("All")
+    borrower: str = Query("All"),
+    timeout: Optional[float] = Query(None, gt=0)
 ):
     """Calculate income for previously uploaded borrower JSON"""
-    content = await db["uploadedData"].find_one(
-        {"loanID": loanID, "email": email},
-        {"cleaned_data": 1, "_id": 0}
-    )
+    deadline = request_deadline(request, timeout)
+    content = await loan_cache.get_view(
+        db, loanID, email, "cleaned_data", {"cleaned_data": 1})
 
     if not content or "cleaned_data" not in content:
         return {"status": "error", "income": {}}
@@ -544,35 +785,45 @@ async def income_self_emp(
     if not data:
         return {"status": "error", "income": {}}
 
-    # print(data)
-    try:
-        async with client_lock:
-            try:
-                response = await mcp_client.call_tool(
-                    "IC_self_income",
-                    {"content": json.dumps(data)},
-                )
+    key = ("income-self_emp", loanID, email, borrower, data_version(content))
 
-                # print('response', response)
+    async def run_analysis():
+        # print(data)
+        usage = []
+        try:
+            async with lock_wait(client_lock, "/income-self_emp"):
+                try:
+                    response = await call_tool_booked(
+                        "IC_self_income",
+                        {"content": serialize_payload(data)},
+                        None, usage, loanID=loanID, email=email, borrower=borrower,
+                    )
 
-                if response.content and len(response.content) > 0 and response.content[0].text.strip():
-                    parsed_response = json.loads(response.content[0].text)
-                else:
-                    parsed_response = {
-                        "error": "Empty response from MCP client"}
+                    # print('response', response)
 
-            except json.JSONDecodeError as e:
-                logger.error(f"JSON decode error in income calculation: {e}")
-                parsed_response = {"error": "Invalid JSON response"}
-            except Exception as e:
-                logger.error(f"Income calculation error: {e}")
-                parsed_response = {"error": f"Calculation failed: {str(e)}"}
+                    if response.content and len(response.content) > 0 and response.content[0].text.strip():
+                        parsed_response = json.loads(response.content[0].text)
+                    else:
+                        parsed_response = {
+                            "error": "Empty response from MCP client"}
 
-        return {"status": "success", "income": parsed_response}
+                except json.JSONDecodeError as e:
+                    logger.error(f"JSON decode error in income calculation: {e}")
+                    parsed_response = {"error": "Invalid JSON response"}
+                except Exception as e:
+                    logger.error(f"Income calculation error: {e}")
+                    parsed_response = {"error": f"Calculation failed: {str(e)}"}
 
-    except Exception as e:
-        logger.error(f"Self employed Income calculation failed: {e}")
-        return {"status": "success", "income": e}
+            return {"status": "success", "income": parsed_response}
+
+        except Exception as e:
+            logger.error(f"Self employed Income calculation failed: {e}")
+            return {"status": "success", "income": e}
+        finally:
+            await record_usage(db, usage)
+
+    return await run_request_scoped(
+        request, lambda: analysis_flights.do(key, run_analysis), deadline)
 
 
 @app.post("/store-analyzed-data")
@@ -582,24 +833,22 @@ async def store_analyzed_data(
     borrower: str = Body(...),
     analyzed_data: dict = Body(...)
 ):
-    existing = await db["uploadedData"].find_one({"loanID": loanID, "email": email})
-    if not existing:
-        raise HTTPException(status_code=404, detail="Record not found")
+    if not borrower:
+        raise HTTPException(status_code=400, detail="borrower must not be empty")
 
     timestamp = datetime.now().strftime("%Y-%m-%d %I:%M:%S %p")
 
-    # await db["uploadedData"].update_one(
-    #     {"loanID": loanID, "email": email},
-    #     {"$set": {"analyzed_data": analyzed_data, "updated_at": timestamp}}
-    # )
-    # Merge per borrower
-    updated_analyzed = existing.get("analyzed_data", {})
-    updated_analyzed[borrower] = analyzed_data
-
-    await db["uploadedData"].update_one(
+    # One atomic write of this borrower's entry; concurrent saves for other
+    # borrowers of the same loan touch different paths and cannot clobber it
+    result = await db["uploadedData"].update_one(
         {"loanID": loanID, "email": email},
-        {"$set": {"analyzed_data": updated_analyzed, "updated_at": timestamp}}
+        {"$set": {f"analyzed_data.{encode_key(borrower)}": analyzed_data,
+                  "updated_at": timestamp}, **VERSION_BUMP}
     )
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Record not found")
+    loan_cache.invalidate(loanID, email)
+    await upsert_loan_summary(db, loanID, email, timestamp, analyzed_data=True)
 
     return {"status": "success", "message": "Analyzed data stored"}
 
@@ -612,7 +861,10 @@ async def view_loan(req: LoanViewRequest):
     # except:
     #     raise HTTPException(status_code=400, detail="Invalid loanId format")
 
-    loan = await db["uploadedData"].find_one({"loanID": req.loanId})
+    loan = await loan_cache.get_view(
+        db, req.loanId, req.email, "view",
+        {"cleaned_data": 1, "hasModifications": 1, "analyzed_data": ANALYZED_FLAG},
+    )
 
     if not loan:
         raise HTTPException(
@@ -633,7 +885,10 @@ async def view_loan(req: LoanViewRequest):
     # except:
     #     raise HTTPException(status_code=400, detail="Invalid loanId format")
 
-    loan = await db["uploadedData"].find_one({"loanID": req.loanId})
+    loan = await loan_cache.get_view(
+        db, req.loanId, req.email, "original",
+        {"original_cleaned_data": 1, "analyzed_data": ANALYZED_FLAG},
+    )
 
     if not loan:
         raise HTTPException(
@@ -647,15 +902,44 @@ async def view_loan(req: LoanViewRequest):
 
 @app.post("/get-analyzed-data")
 async def get_analyzed_data(req: GetAnalyzedDataRequest):
-    loan = await db["uploadedData"].find_one({"loanID": req.loanId, "email": req.email})
+    loan = await loan_cache.get_view(
+        db, req.loanId, req.email, "analyzed_data", {"analyzed_data": 1})
 
     if not loan:
         raise HTTPException(status_code=404, detail="Loan not found")
 
     return {
-        "analyzed_data": loan.get("analyzed_data", {})
+        "analyzed_data": decode_keys(loan.get("analyzed_data", {}))
     }
 
+
+@app.post("/get-llm-usage")
+async def get_llm_usage(req: GetAnalyzedDataRequest):
+    """Tokens, cost and cache hits of this loan's analyses, per rule / field group."""
+    return await usage_summary(db, group_by="rule", loanID=req.loanId, email=req.email, limit=500)
+
+
+@app.post("/get-raw-data")
+async def get_raw_data(req: GetAnalyzedDataRequest):
+    """Original upload payload, fetched from the compressed blob store on demand."""
+    loan = await db["uploadedData"].find_one(
+        {"loanID": req.loanId, "email": req.email},
+        {"original_data_ref": 1, "original_data": 1, "_id": 0},
+    )
+
+    if not loan:
+        raise HTTPException(status_code=404, detail="Loan not found")
+
+    if "original_data_ref" in loan:
+        raw_json = await get_blob(db, loan["original_data_ref"]["sha256"])
+    elif "original_data" in loan:
+        # Uploaded before the blob store; not migrated yet
+        raw_json = loan["original_data"]
+    else:
+        raise HTTPException(status_code=404, detail="Raw payload not found")
+
+    return {"raw_json": raw_json}
+
 # ======================================
 #  Entrypoint
 # ======================================
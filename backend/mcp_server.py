@@ -3,7 +3,7 @@ import argparse
 from typing import List, Literal
 from dotenv import load_dotenv
 
-from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp import FastMCP, Context
 from langchain_openai import AzureChatOpenAI
 from langgraph.prebuilt import create_react_agent
 # from langchain.output_parsers import PydanticOutputParser
@@ -12,23 +12,65 @@ from langchain_core.output_parsers import PydanticOutputParser
 from langchain.tools import tool
 
 from pydantic import BaseModel
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+import asyncio
 import os
+import time
+
+from app.utils.fake_llm import FakeChatModel
+from app.utils.llm_scheduler import (
+    LLMScheduler, MetricsCallback, ScheduledChatModel, current_priority, DEFAULT_PRIORITY,
+)
+from app.utils.metrics import (
+    PrometheusMiddleware, current_tool, instrument_tool, metrics_response, report_usage, tool_usage,
+)
+from app.utils.tracing import TracingCallback, TracingMiddleware, setup_tracing, trace_tool, tracer
 
 # ======================================
 #  Environment Setup
 # ======================================
 load_dotenv(dotenv_path=".env_1")
 
-# Loading the environment variables
-azure_deployement = os.environ['AZURE_OPENAI_DEPLOYMENT']
-az_api_version = os.environ['AZURE_API_VERSION']
+# MCP_FAKE_LLM=1 swaps Azure for a local schema-echo model (no network)
+use_fake_llm = os.getenv("MCP_FAKE_LLM", "0") in ("1", "true", "True")
 
 # Initiating the LLM
-llm = AzureChatOpenAI(
-    azure_deployment=azure_deployement,
-    api_version=az_api_version,
-    temperature=0,
-    max_retries=2,
+if use_fake_llm:
+    llm = FakeChatModel(
+        latency=float(os.getenv("FAKE_LLM_LATENCY", "0")),
+        throttle_rate=float(os.getenv("FAKE_LLM_THROTTLE_RATE", "0")),
+    )
+else:
+    # Loading the environment variables
+    azure_deployement = os.environ['AZURE_OPENAI_DEPLOYMENT']
+    az_api_version = os.environ['AZURE_API_VERSION']
+
+    llm = AzureChatOpenAI(
+        azure_deployment=azure_deployement,
+        api_version=az_api_version,
+        temperature=0,
+        # 429s are retried by llm_scheduler with a shared backoff
+        max_retries=0,
+    )
+
+# Shared admission control for every LLM call made by this process
+llm_scheduler = LLMScheduler(
+    tokens_per_minute=int(os.getenv("LLM_TOKENS_PER_MINUTE", "80000")),
+    requests_per_minute=int(os.getenv("LLM_REQUESTS_PER_MINUTE", "480")),
+    max_retries=int(os.getenv("LLM_MAX_RETRIES", "4")),
+)
+# Agents call the model through the scheduler: each step is admitted, and a
+# throttled step is retried on its own
+scheduled_llm = ScheduledChatModel(model=llm, scheduler=llm_scheduler)
+
+# TRACING_EXPORTER=file|otlp|console; the sampling decision follows the caller's
+setup_tracing(
+    "income-analyzer-mcp",
+    exporter=os.getenv("TRACING_EXPORTER", "none"),
+    file_path=os.getenv("TRACING_FILE", "traces-mcp.jsonl"),
+    sample_ratio=float(os.getenv("TRACING_SAMPLE_RATIO", "1.0")),
+    otlp_endpoint=os.getenv("TRACING_OTLP_ENDPOINT", ""),
 )
 
 # MCP Server Init
@@ -50,9 +92,75 @@ def math_tool(expression: str) -> str:
         return f"null"
 
 
-agent = create_react_agent(llm, tools=[math_tool])
+agent = create_react_agent(scheduled_llm, tools=[math_tool])
+
+bank_agent = create_react_agent(scheduled_llm, tools=[math_tool])
+
+
+def request_priority(ctx: Context | None) -> str:
+    """Priority class sent by the caller in the tools/call `_meta`."""
+    if ctx is None:
+        return DEFAULT_PRIORITY
+    meta = ctx.request_context.meta
+    return getattr(meta, "priority", None) or DEFAULT_PRIORITY
+
 
-bank_agent = create_react_agent(llm, tools=[math_tool])
+def request_deadline(ctx: Context | None) -> float | None:
+    """Absolute (epoch) deadline sent by the caller in the tools/call `_meta`."""
+    if ctx is None:
+        return None
+    meta = ctx.request_context.meta
+    deadline = getattr(meta, "deadline", None)
+    return float(deadline) if deadline is not None else None
+
+
+async def run_agent(user_prompt: str, ctx: Context | None = None) -> str:
+    """Run the ReAct agent with every LLM step admitted by llm_scheduler."""
+    prompt = {
+        "messages": [
+            {"role": "user", "content": user_prompt}
+        ]
+    }
+    priority = current_priority.set(request_priority(ctx))
+    try:
+        with tracer.start_as_current_span("agent.run", attributes={"mcp.tool": current_tool.get()}):
+            callbacks = [MetricsCallback(current_tool.get(), tool_usage.get()),
+                         TracingCallback()]
+
+            run = agent.ainvoke(prompt, config={"callbacks": callbacks})
+            # Stop queueing/generating once the caller has given up on the answer.
+            # A notifications/cancelled from the client cancels this task as well.
+            deadline = request_deadline(ctx)
+            if deadline is None:
+                raw_output = await run
+            else:
+                try:
+                    raw_output = await asyncio.wait_for(run, timeout=max(0.0, deadline - time.time()))
+                except asyncio.TimeoutError:
+                    raise TimeoutError("Request deadline exceeded")
+    finally:
+        current_priority.reset(priority)
+    return raw_output['messages'][-1].content
+
+
+@mcp.custom_route("/scheduler", methods=["GET"])
+async def scheduler_stats(request: Request) -> JSONResponse:
+    """Queue depth, waits and throttling counters of llm_scheduler."""
+    return JSONResponse(llm_scheduler.stats())
+
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def metrics(request: Request):
+    """Prometheus exposition: tool and LLM call latency, token counts."""
+    return metrics_response()
+
+
+def http_app():
+    """Streamable-HTTP app with per-route HTTP metrics and server spans."""
+    app = mcp.streamable_http_app()
+    app.add_middleware(TracingMiddleware)
+    app.add_middleware(PrometheusMiddleware)
+    return app
 # ======================================
 #  Models
 # ======================================
@@ -596,7 +704,10 @@ If the content is not enough return status as fail and add comment is commentry
 # ======================================
 
 @mcp.tool()
-async def rule_verification(rules: str, content: str):
+@report_usage
+@instrument_tool
+@trace_tool
+async def rule_verification(rules: str, content: str, ctx: Context = None):
     """
     Verify mortgage loan rules against extracted loan details.
     """
@@ -604,21 +715,17 @@ async def rule_verification(rules: str, content: str):
         user_prompt = rule_verification_prompt(rules, content)
         user_prompt += f"\n\n{rule_parser.get_format_instructions()}"
 
-        prompt = {
-            "messages": [
-                {"role": "user", "content": user_prompt}
-            ]
-        }
-
-        raw_output = await agent.ainvoke(prompt)
-        output = raw_output['messages'][-1].content
+        output = await run_agent(user_prompt, ctx)
         return rule_parser.parse(output).dict()
     except Exception as e:
         return f'Error: {e}'
 
 
 @mcp.tool()
-async def income_calculator(fields: List[str], content: str):
+@report_usage
+@instrument_tool
+@trace_tool
+async def income_calculator(fields: List[str], content: str, ctx: Context = None):
     """
     Income calculation tool for mortgage loan files.
     """
@@ -626,14 +733,7 @@ async def income_calculator(fields: List[str], content: str):
     try:
         ic_prompt = ic_calculation_prompt(fields, content)
         ic_prompt += f"\n\n{ic_parser.get_format_instructions()}"
-        prompt = {
-            "messages": [
-                {"role": "user", "content": ic_prompt}
-            ]
-        }
-
-        raw_output = await agent.ainvoke(prompt)
-        output = raw_output['messages'][-1].content
+        output = await run_agent(ic_prompt, ctx)
 
         return ic_parser.parse(output).dict()
 
@@ -642,19 +742,15 @@ async def income_calculator(fields: List[str], content: str):
 
 
 @mcp.tool()
-async def income_insights(content: str):
+@report_usage
+@instrument_tool
+@trace_tool
+async def income_insights(content: str, ctx: Context = None):
 
     try:
         insight_prompt = loan_insights_prompt(content)
         insight_prompt += f"\n\n{insight_parser.get_format_instructions()}"
-        prompt = {
-            "messages": [
-                {"role": "user", "content": insight_prompt}
-            ]
-        }
-
-        raw_output = await agent.ainvoke(prompt)
-        output = raw_output['messages'][-1].content
+        output = await run_agent(insight_prompt, ctx)
 
         return insight_parser.parse(output).dict()
 
@@ -663,19 +759,15 @@ async def income_insights(content: str):
 
 
 @mcp.tool()
-async def bank_statement_insights(content: str):
+@report_usage
+@instrument_tool
+@trace_tool
+async def bank_statement_insights(content: str, ctx: Context = None):
 
     try:
         insight_prompt = bank_statemnt_prompt(content)
         insight_prompt += f"\n\n{bank_parser.get_format_instructions()}"
-        prompt = {
-            "messages": [
-                {"role": "user", "content": insight_prompt}
-            ]
-        }
-
-        raw_output = await agent.ainvoke(prompt)
-        output = raw_output['messages'][-1].content
+        output = await run_agent(insight_prompt, ctx)
 
         return bank_parser.parse(output).dict()
 
@@ -684,23 +776,20 @@ async def bank_statement_insights(content: str):
 
 
 @mcp.tool()
-async def IC_self_income(content):
+@report_usage
+@instrument_tool
+@trace_tool
+async def IC_self_income(content, ctx: Context = None):
 
     try:
         self_emp_prompt = self_employment_prompt(content)
         self_emp_prompt += f"\n\n{IC_self_parser.get_format_instructions()}"
-        prompt = {
-            "messages": [
-                {"role": "user", "content": self_emp_prompt}
-            ]
-        }
-
-        raw_output = await agent.ainvoke(prompt)
-        output = raw_output['messages'][-1].content
+        output = await run_agent(self_emp_prompt, ctx)
 
         data = IC_self_parser.parse(output).dict()
 
-        data['value'] = math_tool(data['final_math_formula'])
+        with tracer.start_as_current_span("agent.tool math_tool", attributes={"tool.name": "math_tool"}):
+            data['value'] = math_tool(data['final_math_formula'])
 
         return data
 
@@ -721,4 +810,4 @@ if __name__ == "__main__":
                         help="Port to listen on")
     args = parser.parse_args()
 
-    uvicorn.run(mcp.streamable_http_app, host=args.host, port=args.port)
+    uvicorn.run(http_app, host=args.host, port=args.port, factory=True)
@@ -0,0 +1,60 @@
+import os
+import socket
+import threading
+import time
+
+import pytest
+import uvicorn
+from mongomock_motor import AsyncMongoMockClient
+
+# app.config requires these; tests never reach a real server or mailbox
+for name, value in {
+    "DB_URL": "mongodb://localhost:27017",
+    "DB_NAME": "income_analyzer_test",
+    "JWT_SECRET": "test-secret",
+    "JWT_ALGORITHM": "HS256",
+    "JWT_EXPIRE_MINUTES": "60",
+    "EMAIL_USER": "test@example.com",
+    "EMAIL_PASS": "test",
+}.items():
+    os.environ.setdefault(name, value)
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def mongo():
+    """A fresh in-memory database (mongomock-motor) per test."""
+    return AsyncMongoMockClient()["income_analyzer_test"]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class ThreadedServer:
+    """uvicorn serving an ASGI app from a background thread, for tests."""
+
+    def __init__(self, app, port: int):
+        self.port = port
+        self.url = f"http://127.0.0.1:{port}"
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        deadline = time.monotonic() + 10
+        while not self.server.started:
+            if time.monotonic() > deadline or not self.thread.is_alive():
+                raise RuntimeError(f"Test server on {self.port} did not start")
+            time.sleep(0.02)
+        return self
+
+    def stop(self):
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
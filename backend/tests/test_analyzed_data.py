@@ -0,0 +1,74 @@
+"""
+/store-analyzed-data saves one borrower with a single $set on
+analyzed_data.<encoded borrower>: concurrent saves for the borrowers of one
+loan must all survive, whatever characters their names contain.
+"""
+import asyncio
+
+import pytest
+
+import main
+from app.utils.mongo_keys import decode_key, decode_keys, encode_key
+
+pytestmark = pytest.mark.anyio
+
+LOAN_ID, EMAIL = "L-1", "analyst@example.com"
+AWKWARD_NAMES = ["John Smith Jr.", "$ALICE", "50% Owner", "a.b.c", "%2E", "Mary $. Jones", "$", "."]
+
+
+@pytest.mark.parametrize("name", AWKWARD_NAMES + ["Plain Name", "%252E", "$$x.$y"])
+def test_encode_key_round_trips(name):
+    key = encode_key(name)
+    assert "." not in key
+    assert not key.startswith("$")
+    assert decode_key(key) == name
+
+
+def test_encoded_keys_stay_distinct():
+    names = AWKWARD_NAMES + ["John Smith Jr%2E", "%24ALICE"]
+    assert len({encode_key(n) for n in names}) == len(names)
+
+
+@pytest.fixture
+async def loan(mongo, monkeypatch):
+    monkeypatch.setattr(main, "db", mongo)
+    await mongo["uploadedData"].insert_one({
+        "username": "analyst", "email": EMAIL, "loanID": LOAN_ID,
+        "file_name": "loan.json", "cleaned_data": {}, "version": 1,
+    })
+    main.loan_cache.invalidate(LOAN_ID, EMAIL)
+    yield mongo
+    main.loan_cache.invalidate(LOAN_ID, EMAIL)
+
+
+async def test_concurrent_saves_lose_no_borrower(loan):
+    borrowers = AWKWARD_NAMES + [f"Borrower {i}" for i in range(100)]
+
+    await asyncio.gather(*(
+        main.store_analyzed_data(
+            email=EMAIL, loanID=LOAN_ID, borrower=name,
+            analyzed_data={"borrower": name, "income": len(name)})
+        for name in borrowers
+    ))
+
+    stored = (await main.get_analyzed_data(
+        main.GetAnalyzedDataRequest(email=EMAIL, loanId=LOAN_ID)))["analyzed_data"]
+    assert stored == {name: {"borrower": name, "income": len(name)} for name in borrowers}
+
+    # One flat map keyed by encoded name: no name was split into a nested path
+    doc = await loan["uploadedData"].find_one({"loanID": LOAN_ID})
+    assert set(doc["analyzed_data"]) == {encode_key(n) for n in borrowers}
+    assert decode_keys(doc["analyzed_data"]) == stored
+    assert doc["version"] == 1 + len(borrowers)
+
+
+async def test_saving_a_borrower_again_replaces_only_that_entry(loan):
+    for income in (1, 2):
+        await main.store_analyzed_data(
+            email=EMAIL, loanID=LOAN_ID, borrower="John Smith Jr.", analyzed_data={"income": income})
+    await main.store_analyzed_data(
+        email=EMAIL, loanID=LOAN_ID, borrower="$ALICE", analyzed_data={"income": 3})
+
+    stored = (await main.get_analyzed_data(
+        main.GetAnalyzedDataRequest(email=EMAIL, loanId=LOAN_ID)))["analyzed_data"]
+    assert stored == {"John Smith Jr.": {"income": 2}, "$ALICE": {"income": 3}}
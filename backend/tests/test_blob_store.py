@@ -0,0 +1,30 @@
+"""Blob store round trip and the migration of inline original_data."""
+import pytest
+
+from app.services.blob_store import get_blob, migrate_inline_payloads, put_blob, zstandard
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.mark.parametrize("codec", [
+    "gzip", pytest.param("zstd", marks=pytest.mark.skipif(zstandard is None, reason="zstandard not installed"))])
+async def test_identical_payloads_are_stored_once(mongo, codec):
+    payload = {"pages": [{"text": "é" * 1000}]}
+    first = await put_blob(mongo, payload, codec)
+    assert await put_blob(mongo, payload, codec) == first
+    assert await get_blob(mongo, first["sha256"]) == payload
+    assert await mongo["rawBlobs"].count_documents({}) == 1
+
+
+async def test_migration_moves_payloads_and_bumps_the_version(mongo):
+    await mongo["uploadedData"].insert_many([
+        {"loanID": f"L-{i}", "email": "e", "original_data": {"n": i}, "version": 3} for i in range(3)])
+
+    report = await migrate_inline_payloads(mongo, batch=2, codec="gzip")
+
+    assert report["moved"] == 3
+    async for loan in mongo["uploadedData"].find():
+        assert "original_data" not in loan
+        # Cached views of the loan were read before the move
+        assert loan["version"] == 4
+        assert await get_blob(mongo, loan["original_data_ref"]["sha256"]) == {"n": int(loan["loanID"][2:])}
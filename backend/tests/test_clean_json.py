@@ -0,0 +1,53 @@
+"""/clean-json inserts the loan first and stores its raw payload only once the insert succeeded."""
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+import main
+from app.services import blob_store
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def db(mongo, monkeypatch):
+    monkeypatch.setattr(main, "db", mongo)
+    await mongo["uploadedData"].create_index([("username", 1), ("loanID", 1)], unique=True)
+    return mongo
+
+
+def upload(raw_json: dict):
+    req = main.CleanJsonRequest(
+        username="analyst", email="analyst@example.com", loanID="L-1",
+        file_name="loan.json", raw_json=raw_json)
+    return main.clean_json(req, Request({"type": "http", "headers": []}))
+
+
+async def test_upload_stores_the_record_and_its_payload(db):
+    await upload({"export": 1})
+
+    loan = await db["uploadedData"].find_one({"loanID": "L-1"})
+    assert await blob_store.get_blob(db, loan["original_data_ref"]["sha256"]) == {"export": 1}
+    assert await db["loanSummaries"].count_documents({"loanID": "L-1"}) == 1
+
+
+async def test_duplicate_upload_is_409_and_stores_no_blob(db):
+    await upload({"export": 1})
+
+    with pytest.raises(HTTPException) as error:
+        await upload({"export": 2})
+    assert error.value.status_code == 409
+    assert await db["uploadedData"].count_documents({}) == 1
+    assert await db[blob_store.BLOBS].count_documents({}) == 1
+
+
+async def test_failed_blob_write_takes_the_record_back_out(db, monkeypatch):
+    async def failing_store(*args):
+        raise RuntimeError("disk full")
+    monkeypatch.setattr(blob_store, "store_encoded_blob", failing_store)
+
+    with pytest.raises(HTTPException) as error:
+        await upload({"export": 1})
+    assert error.value.status_code == 500
+    assert await db["uploadedData"].count_documents({}) == 0
+    assert await db["loanSummaries"].count_documents({}) == 0
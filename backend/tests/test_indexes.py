@@ -0,0 +1,62 @@
+"""
+Index specs against the registered query shapes: every query the code base
+sends must be served by an index from app/db.py, so a new unindexed query
+fails here instead of as a COLLSCAN in production.
+"""
+import pytest
+
+from app import db as app_db
+from app.db import INDEXES, ensure_indexes
+from app.utils.index_advisor import QUERY_SHAPES, QueryShape, index_serving
+
+pytestmark = pytest.mark.anyio
+
+SHAPES = {shape.name: shape for shape in QUERY_SHAPES}
+
+
+@pytest.mark.parametrize("name", [n for n, s in SHAPES.items() if not s.full_scan])
+def test_query_shape_is_served_by_an_index(name):
+    assert index_serving(SHAPES[name], INDEXES) is not None
+
+
+@pytest.mark.parametrize("name", [n for n, s in SHAPES.items() if s.full_scan])
+def test_declared_full_scans_still_scan(name):
+    # An index now serves it: drop full_scan so the check guards it again
+    assert index_serving(SHAPES[name], INDEXES) is None
+
+
+def test_unindexed_and_unbounded_shapes_are_caught():
+    assert index_serving(QueryShape(
+        name="by file name", collection="uploadedData", filter={"file_name": "f"}), INDEXES) is None
+    # A trailing index field alone cannot bound the scan
+    assert index_serving(QueryShape(
+        name="by email", collection="uploadedData", filter={"email": "e"}), INDEXES) is None
+    # Sorting on a field outside the index prefix means an in-memory sort
+    assert index_serving(QueryShape(
+        name="by status, newest", collection="tasks",
+        filter={"status": "done"}, sort={"finished_at": -1}), INDEXES) is None
+
+
+@pytest.fixture
+def db(mongo, monkeypatch):
+    monkeypatch.setattr(app_db, "db", mongo)
+    return mongo
+
+
+async def test_ensure_indexes_creates_then_finds_every_index(db):
+    first = await ensure_indexes()
+    assert len(first["created"]) == len(INDEXES)
+    assert first["failed"] == first["mismatched"] == []
+
+    second = await ensure_indexes()
+    assert second["created"] == []
+    assert sorted(second["present"]) == sorted(first["created"])
+
+
+async def test_ensure_indexes_reports_an_index_that_lost_unique(db):
+    # e.g. created by hand without the unique option
+    await db["users"].create_index([("email", 1)], name="email")
+
+    report = await ensure_indexes()
+    assert report["mismatched"] == ["users.email"]
+    assert "users.email" not in report["present"] + report["created"]
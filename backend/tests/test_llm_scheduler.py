@@ -0,0 +1,142 @@
+"""LLMScheduler and ScheduledChatModel against the fake chat model."""
+import asyncio
+import time
+
+import openai
+import pytest
+
+from app.utils.fake_llm import FakeChatModel, throttle_error
+from app.utils.llm_scheduler import LLMScheduler, ScheduledChatModel, current_priority
+
+pytestmark = pytest.mark.anyio
+
+UNLIMITED = 1_000_000
+
+
+class FlakyChatModel(FakeChatModel):
+    """Answers with a 429 (retry-after `retry_after`) for the first `failures` calls."""
+
+    failures: int = 0
+    retry_after: float = 0.2
+    calls: int = 0
+
+    def _result(self, messages):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise throttle_error(self.retry_after)
+        return super()._result(messages)
+
+
+async def test_priority_classes_then_fifo():
+    # 10 requests per second once the bucket is empty
+    scheduler = LLMScheduler(tokens_per_minute=UNLIMITED, requests_per_minute=600)
+    scheduler.requests.drain()
+    granted = []
+
+    async def call(name, priority):
+        await scheduler.acquire(1, priority)
+        granted.append(name)
+
+    tasks = []
+    for name, priority in [("batch-1", "batch"), ("batch-2", "batch"),
+                           ("interactive-1", "interactive"), ("interactive-2", "interactive")]:
+        tasks.append(asyncio.create_task(call(name, priority)))
+        await asyncio.sleep(0)
+    assert scheduler.queue_depth() == {"interactive": 2, "batch": 2}
+
+    await asyncio.gather(*tasks)
+    assert granted == ["interactive-1", "interactive-2", "batch-1", "batch-2"]
+    assert scheduler.granted == {"interactive": 2, "batch": 2}
+
+
+async def test_requests_per_minute_bucket():
+    scheduler = LLMScheduler(tokens_per_minute=UNLIMITED, requests_per_minute=600)
+    started = time.monotonic()
+    await asyncio.gather(*(scheduler.acquire(1) for _ in range(5)))
+    # A full bucket admits a burst right away
+    assert time.monotonic() - started < 0.05
+
+    scheduler.requests.drain()
+    started = time.monotonic()
+    await asyncio.gather(*(scheduler.acquire(1) for _ in range(5)))
+    assert 0.45 <= time.monotonic() - started < 1.0
+
+
+async def test_tokens_per_minute_bucket():
+    # 1000 tokens per second
+    scheduler = LLMScheduler(tokens_per_minute=60_000, requests_per_minute=UNLIMITED)
+    scheduler.tokens.drain()
+    started = time.monotonic()
+    await asyncio.gather(*(scheduler.acquire(200) for _ in range(3)))
+    assert 0.55 <= time.monotonic() - started < 1.0
+
+    # Reported usage above the estimate is charged afterwards
+    scheduler.record_usage(estimated=200, actual=700)
+    assert scheduler.tokens.wait_time(1) >= 0.45
+
+
+async def test_throttled_call_pauses_the_queue_and_is_retried_alone():
+    scheduler = LLMScheduler(tokens_per_minute=UNLIMITED, requests_per_minute=UNLIMITED)
+    model = ScheduledChatModel(model=FlakyChatModel(failures=1, retry_after=0.3), scheduler=scheduler)
+
+    started = time.monotonic()
+    answer = await model.ainvoke("hello")
+    assert answer.content == "{}"
+    assert time.monotonic() - started >= 0.3
+    assert model.model.calls == 2
+    assert scheduler.throttled == 1 and scheduler.retried == 1
+    assert scheduler.granted["interactive"] == 2
+
+
+async def test_pause_holds_back_other_callers():
+    scheduler = LLMScheduler(tokens_per_minute=UNLIMITED, requests_per_minute=UNLIMITED)
+    delay = scheduler.on_throttle(retry_after=0.3)
+    started = time.monotonic()
+    await scheduler.acquire(1, "batch")
+    assert time.monotonic() - started >= delay - 0.01
+    assert scheduler.stats()["throttled"] == 1
+
+
+async def test_gives_up_after_max_retries():
+    scheduler = LLMScheduler(tokens_per_minute=UNLIMITED, requests_per_minute=UNLIMITED, max_retries=2)
+    model = ScheduledChatModel(model=FlakyChatModel(failures=10, retry_after=0.05), scheduler=scheduler)
+
+    with pytest.raises(openai.RateLimitError):
+        await model.ainvoke("hello")
+    assert scheduler.throttled == 2 and scheduler.retried == 2
+    assert scheduler.granted["interactive"] == 3
+
+
+async def test_priority_comes_from_the_agent_run():
+    scheduler = LLMScheduler(tokens_per_minute=UNLIMITED, requests_per_minute=UNLIMITED)
+    model = ScheduledChatModel(model=FakeChatModel(), scheduler=scheduler)
+    token = current_priority.set("batch")
+    try:
+        await model.ainvoke("hello")
+    finally:
+        current_priority.reset(token)
+    assert scheduler.granted == {"interactive": 0, "batch": 1}
+
+
+async def test_sync_invoke_from_a_thread_queues_through_the_loop():
+    scheduler = LLMScheduler(tokens_per_minute=UNLIMITED, requests_per_minute=600)
+    model = ScheduledChatModel(model=FlakyChatModel(failures=1, retry_after=0.1), scheduler=scheduler)
+    await scheduler.acquire(1)  # binds the queue to this loop
+    scheduler.requests.drain()
+
+    started = time.monotonic()
+    answer = await asyncio.to_thread(model.invoke, "hello")
+    assert answer.content == "{}"
+    assert time.monotonic() - started >= 0.1
+    assert scheduler.granted["interactive"] == 3
+    assert scheduler.throttled == 1
+
+
+def test_sync_invoke_without_a_loop():
+    scheduler = LLMScheduler(tokens_per_minute=UNLIMITED, requests_per_minute=600)
+    model = ScheduledChatModel(model=FakeChatModel(), scheduler=scheduler)
+    scheduler.requests.drain()
+    started = time.monotonic()
+    assert model.invoke("hello").content == "{}"
+    assert time.monotonic() - started >= 0.09
+    assert scheduler.granted["interactive"] == 1
@@ -0,0 +1,28 @@
+"""loanSummaries upserts: a summary created by any write path reads back as UploadedDataOut."""
+import pytest
+
+from app.models.uploaded_data import UploadedDataOut
+from app.services.uploaded_data import get_uploaded_data_by_email, upsert_loan_summary
+
+pytestmark = pytest.mark.anyio
+
+EMAIL = "analyst@example.com"
+
+
+async def test_partial_write_creates_a_complete_summary(mongo):
+    # /store-analyzed-data can run before the upload's own summary exists
+    await upsert_loan_summary(mongo, "L-1", EMAIL, "2025-01-02 03:04:05 PM", analyzed_data=True)
+
+    page, _ = await get_uploaded_data_by_email(mongo, EMAIL)
+    assert page == [UploadedDataOut(
+        loanID="L-1", file_name=None, updated_at=page[0].updated_at, borrower=[], analyzed_data=True)]
+
+
+async def test_defaults_never_overwrite_existing_fields(mongo):
+    await upsert_loan_summary(
+        mongo, "L-1", EMAIL, "2025-01-02 03:04:05 PM",
+        file_name="loan.json", borrower=["Ann"], analyzed_data=False)
+    await upsert_loan_summary(mongo, "L-1", EMAIL, "2025-01-03 03:04:05 PM", analyzed_data=True)
+
+    [summary], _ = await get_uploaded_data_by_email(mongo, EMAIL)
+    assert (summary.file_name, summary.borrower, summary.analyzed_data) == ("loan.json", ["Ann"], True)
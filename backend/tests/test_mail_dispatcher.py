@@ -0,0 +1,122 @@
+"""MailDispatcher against the in-process SMTP sink (app/utils/smtp_sink.py)."""
+import asyncio
+
+import pytest
+
+from app.config import settings
+from app.services.mail_dispatcher import MailDispatcher
+from app.utils.smtp_sink import start_sink
+from tests.conftest import free_port
+
+pytestmark = pytest.mark.anyio
+
+
+class Sink:
+    def __init__(self, port: int):
+        self.port = port
+        # Messages to refuse with a temporary error, and NOOPs to answer as a timed-out relay
+        self.fail_first = 0
+        self.time_out_noops = 0
+        self.start()
+
+    def start(self):
+        self.controller, self.handler = start_sink(port=self.port)
+        handle_data, sink = self.handler.handle_DATA, self
+
+        async def failing_handle_data(server, session, envelope):
+            if sink.fail_first > 0:
+                sink.fail_first -= 1
+                return "451 Temporary failure, try again"
+            return await handle_data(server, session, envelope)
+
+        async def handle_noop(server, session, envelope, arg):
+            if sink.time_out_noops > 0:
+                sink.time_out_noops -= 1
+                return "421 Idle timeout, closing connection"
+            return "250 OK"
+        self.handler.handle_DATA = failing_handle_data
+        self.handler.handle_NOOP = handle_noop
+
+    def restart(self):
+        # Drops every open session, like a relay closing idle connections
+        self.controller.stop()
+        self.start()
+
+    def stop(self):
+        self.controller.stop()
+
+
+@pytest.fixture
+def sink(monkeypatch):
+    port = free_port()
+    monkeypatch.setattr(settings, "smtp_server", "127.0.0.1")
+    monkeypatch.setattr(settings, "smtp_port", port)
+    monkeypatch.setattr(settings, "smtp_starttls", False)
+    sink = Sink(port)
+    yield sink
+    sink.stop()
+
+
+def dispatcher(**options) -> MailDispatcher:
+    return MailDispatcher(**{"pool_size": 1, "queue_size": 100, "batch_size": 10,
+                             "max_attempts": 4, "retry_base_seconds": 0.05, **options})
+
+
+async def test_dropped_connection_is_replaced_before_sending(sink):
+    mail = dispatcher()
+    await mail.send("a@example.com", "First", "<p>1</p>")
+    sink.restart()
+
+    await asyncio.wait_for(mail.send("b@example.com", "Second", "<p>2</p>"), 5)
+    stats = mail.stats()
+    assert (stats["sent"], stats["retried"], stats["failed"], stats["connections"]) == (2, 0, 0, 2)
+    assert sink.handler.received == 1
+    await mail.stop()
+
+
+async def test_idle_connection_failing_noop_is_replaced(sink):
+    mail = dispatcher(noop_after_idle=0.0)
+    await mail.send("a@example.com", "First", "<p>1</p>")
+
+    # The relay timed the session out but the socket still looks open
+    sink.time_out_noops = 1
+
+    await asyncio.wait_for(mail.send("b@example.com", "Second", "<p>2</p>"), 5)
+    stats = mail.stats()
+    assert (stats["sent"], stats["retried"], stats["failed"]) == (2, 0, 0)
+    assert (stats["connections"], stats["stale_connections"]) == (2, 1)
+    await mail.stop()
+
+
+async def test_fresh_connection_is_not_checked(sink):
+    mail = dispatcher(noop_after_idle=60.0)
+    for n in range(3):
+        await mail.send(f"user{n}@example.com", "Hi", "<p>hi</p>")
+    stats = mail.stats()
+    assert (stats["sent"], stats["connections"], stats["stale_connections"]) == (3, 1, 0)
+    await mail.stop()
+
+
+async def test_stop_waits_for_pending_retries(sink):
+    sink.fail_first = 2
+    mail = dispatcher()
+    mail.submit("a@example.com", "Retried", "<p>1</p>")
+
+    await mail.stop(drain_timeout=5)
+    stats = mail.stats()
+    assert (stats["sent"], stats["retried"], stats["failed"]) == (1, 2, 0)
+    assert sink.handler.received == 1
+
+
+async def test_stop_counts_unsent_retries_as_failed(sink):
+    sink.fail_first = 1
+    mail = dispatcher(retry_base_seconds=60.0)
+    sent = asyncio.ensure_future(mail.send("a@example.com", "Never", "<p>1</p>"))
+    while not mail.stats()["pending_retries"]:
+        await asyncio.sleep(0.01)
+
+    await mail.stop(drain_timeout=0.2)
+    stats = mail.stats()
+    assert (stats["sent"], stats["failed"], stats["pending_retries"]) == (0, 1, 0)
+    with pytest.raises(RuntimeError, match="stopped"):
+        await sent
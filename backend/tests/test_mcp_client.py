@@ -0,0 +1,228 @@
+"""MCPClient against a stub MCP server: breaker, timeouts, reconnect backoff."""
+import asyncio
+import time
+
+import anyio
+import pytest
+from mcp.server.fastmcp import FastMCP
+
+from app.utils.MCP_Connector import CircuitBreaker, MCPClient, MCPDeadlineExceeded, MCPUnavailableError
+from tests.conftest import ThreadedServer, free_port
+
+pytestmark = pytest.mark.anyio
+
+# What the stub's slow tool saw: "started", then "finished" or "cancelled"
+events = []
+
+
+def stub_app():
+    mcp = FastMCP("stub")
+
+    @mcp.tool()
+    async def echo(text: str) -> str:
+        return text
+
+    @mcp.tool()
+    async def slow(seconds: float) -> str:
+        events.append("started")
+        try:
+            await asyncio.sleep(seconds)
+        except asyncio.CancelledError:
+            events.append("cancelled")
+            raise
+        events.append("finished")
+        return "done"
+
+    return mcp.streamable_http_app()
+
+
+@pytest.fixture(scope="module")
+def stub_server():
+    server = ThreadedServer(stub_app(), free_port()).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture(autouse=True)
+def clear_events():
+    events.clear()
+
+
+def make_client(url, **kwargs) -> MCPClient:
+    kwargs.setdefault("call_timeout", 5.0)
+    kwargs.setdefault("connect_timeout", 2.0)
+    return MCPClient(url + "/mcp", **kwargs)
+
+
+def text_of(result) -> str:
+    return result.content[0].text
+
+
+async def wait_for(predicate, timeout=5.0):
+    with anyio.fail_after(timeout):
+        while not predicate():
+            await anyio.sleep(0.02)
+
+
+async def test_call_tool_round_trip(stub_server):
+    client = make_client(stub_server.url)
+    try:
+        result = await client.call_tool("echo", {"text": "hi"})
+        assert text_of(result) == "hi"
+        assert client.stats()["connected"]
+        assert client.breaker.state == CircuitBreaker.CLOSED
+    finally:
+        await client.cleanup()
+
+
+async def test_server_down_opens_breaker_and_fails_fast():
+    client = make_client(f"http://127.0.0.1:{free_port()}", failure_threshold=2,
+                         reset_timeout=60, max_reconnect_backoff=0.05)
+    for _ in range(2):
+        with pytest.raises(MCPUnavailableError, match="connect failed"):
+            await client.call_tool("echo", {"text": "hi"})
+        await anyio.sleep(0.06)
+    assert client.breaker.state == CircuitBreaker.OPEN
+    assert client.breaker.times_opened == 1
+
+    connect_failures = client._connect_failures
+    started = time.monotonic()
+    with pytest.raises(MCPUnavailableError, match="breaker is open"):
+        await client.call_tool("echo", {"text": "hi"})
+    assert time.monotonic() - started < 0.1
+    # Rejected before any connection attempt
+    assert client._connect_failures == connect_failures
+    assert client.breaker.rejected == 1
+
+
+async def test_half_open_probe_success_closes_breaker(stub_server):
+    client = make_client(stub_server.url, failure_threshold=1, reset_timeout=0.2)
+    try:
+        client.breaker.record_failure()
+        assert client.breaker.state == CircuitBreaker.OPEN
+        await anyio.sleep(0.25)
+        assert client.breaker.state == CircuitBreaker.HALF_OPEN
+
+        result = await client.call_tool("echo", {"text": "probe"})
+        assert text_of(result) == "probe"
+        assert client.breaker.state == CircuitBreaker.CLOSED
+        assert client.breaker.consecutive_failures == 0
+    finally:
+        await client.cleanup()
+
+
+async def test_half_open_lets_a_single_probe_through(stub_server):
+    client = make_client(stub_server.url, failure_threshold=1, reset_timeout=0.2)
+    try:
+        client.breaker.record_failure()
+        await anyio.sleep(0.25)
+        probe = asyncio.create_task(client.call_tool("slow", {"seconds": 0.3}))
+        await wait_for(lambda: "started" in events)
+
+        with pytest.raises(MCPUnavailableError, match="half_open"):
+            await client.call_tool("echo", {"text": "second"})
+        assert text_of(await probe) == "done"
+        assert client.breaker.state == CircuitBreaker.CLOSED
+    finally:
+        await client.cleanup()
+
+
+async def test_half_open_probe_failure_reopens_breaker():
+    client = make_client(f"http://127.0.0.1:{free_port()}", failure_threshold=1,
+                         reset_timeout=0.2, max_reconnect_backoff=0.05)
+    with pytest.raises(MCPUnavailableError, match="connect failed"):
+        await client.call_tool("echo", {"text": "hi"})
+    assert client.breaker.state == CircuitBreaker.OPEN
+    await anyio.sleep(0.25)
+    assert client.breaker.state == CircuitBreaker.HALF_OPEN
+
+    with pytest.raises(MCPUnavailableError, match="connect failed"):
+        await client.call_tool("echo", {"text": "probe"})
+    assert client.breaker.state == CircuitBreaker.OPEN
+    assert client.breaker.times_opened == 2
+    with pytest.raises(MCPUnavailableError, match="breaker is open"):
+        await client.call_tool("echo", {"text": "hi"})
+
+
+async def test_call_timeout_cancels_the_server_side_call(stub_server):
+    client = make_client(stub_server.url, call_timeout=0.3, failure_threshold=1, reset_timeout=60)
+    try:
+        started = time.monotonic()
+        with pytest.raises(MCPUnavailableError, match="timed out"):
+            await client.call_tool("slow", {"seconds": 5})
+        assert time.monotonic() - started < 1.0
+        assert client.timeouts == 1
+        assert client.cancelled == 1
+        # A timeout counts against the server
+        assert client.breaker.state == CircuitBreaker.OPEN
+
+        # notifications/cancelled named the right request, so the tool stopped
+        await wait_for(lambda: "cancelled" in events)
+        assert "finished" not in events
+    finally:
+        await client.cleanup()
+
+
+async def test_deadline_cancels_the_call_without_charging_the_breaker(stub_server):
+    client = make_client(stub_server.url, failure_threshold=1)
+    try:
+        await client.call_tool("echo", {"text": "warm up"})
+        with pytest.raises(MCPDeadlineExceeded):
+            await client.call_tool("slow", {"seconds": 5}, deadline=time.time() + 0.3)
+        assert client.breaker.state == CircuitBreaker.CLOSED
+        assert client.timeouts == 0
+        await wait_for(lambda: "cancelled" in events)
+
+        with pytest.raises(MCPDeadlineExceeded, match="before calling"):
+            await client.call_tool("echo", {"text": "late"}, deadline=time.time() - 1)
+    finally:
+        await client.cleanup()
+
+
+async def test_caller_cancellation_cancels_the_server_side_call(stub_server):
+    client = make_client(stub_server.url)
+    try:
+        call = asyncio.create_task(client.call_tool("slow", {"seconds": 5}))
+        await wait_for(lambda: "started" in events)
+        call.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await call
+        assert client.cancelled == 1
+        await wait_for(lambda: "cancelled" in events)
+
+        # The session survives an abandoned call
+        assert text_of(await client.call_tool("echo", {"text": "after"})) == "after"
+    finally:
+        await client.cleanup()
+
+
+async def test_reconnect_backoff_window():
+    port = free_port()
+    client = make_client(f"http://127.0.0.1:{port}", failure_threshold=100, max_reconnect_backoff=0.5)
+    with pytest.raises(MCPUnavailableError, match="connect failed"):
+        await client.call_tool("echo", {"text": "hi"})
+    assert client._connect_failures == 1
+    backoff = client.stats()["reconnect_backoff_seconds"]
+    assert 0 < backoff <= 0.5
+
+    # Inside the window no connection is attempted
+    with pytest.raises(MCPUnavailableError, match="backing off"):
+        await client.call_tool("echo", {"text": "hi"})
+    assert client._connect_failures == 1
+
+    # Once it has passed, the client tries (and here fails) again with a longer window
+    await anyio.sleep(backoff + 0.05)
+    with pytest.raises(MCPUnavailableError, match="connect failed"):
+        await client.call_tool("echo", {"text": "hi"})
+    assert client._connect_failures == 2
+
+    # The server comes up: the next attempt after the window connects
+    server = ThreadedServer(stub_app(), port).start()
+    try:
+        await anyio.sleep(client.stats()["reconnect_backoff_seconds"] + 0.05)
+        assert text_of(await client.call_tool("echo", {"text": "back"})) == "back"
+        assert client._connect_failures == 0
+        assert client.reconnects == 1
+    finally:
+        await client.cleanup()
+        server.stop()
@@ -0,0 +1,28 @@
+"""report_usage: the tool result as CallToolResult text content, with its usage in _meta."""
+import json
+
+import pytest
+
+from app.utils.metrics import report_usage
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.mark.parametrize("result, text", [
+    ({"result": "Pass", "score": 0.9}, '{"result": "Pass", "score": 0.9}'),
+    ([1, "two"], '[1, "two"]'),
+    ('{"already": "json"}', '{"already": "json"}'),
+    ("Error: no data", "Error: no data"),
+])
+async def test_result_becomes_text_content(result, text):
+    @report_usage
+    async def tool():
+        return result
+
+    response = await tool()
+    [content] = response.content
+    assert (content.type, content.text) == ("text", text)
+    if not isinstance(result, str):
+        assert json.loads(content.text) == result
+    usage = response.meta["usage"]
+    assert usage["outcome"] == ("error" if text.startswith("Error") else "ok")
@@ -0,0 +1,198 @@
+"""
+run_request_scoped in front of the real MCP server (fake LLM with latency):
+a client that disconnects or runs out of time stops the agent mid-step.
+"""
+import asyncio
+import importlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+
+from app.utils.MCP_Connector import MCPClient
+from app.utils.fake_llm import FakeChatModel
+from app.utils.request_scope import CLIENT_CLOSED_REQUEST, request_deadline, run_request_scoped
+from app.utils.single_flight import SingleFlight
+from tests.conftest import ThreadedServer, free_port
+
+LLM_LATENCY = 1.0
+
+# ("step", "started" | "finished" | "cancelled", time) and ("tool", outcome, time)
+events = []
+
+
+def record(kind: str, what: str) -> None:
+    events.append((kind, what, time.monotonic()))
+
+
+def of(kind: str, what: str):
+    return [at for k, w, at in events if (k, w) == (kind, what)]
+
+
+@pytest.fixture(scope="module")
+def mcp_server():
+    os.environ["MCP_FAKE_LLM"] = "1"
+    module = importlib.import_module("mcp_server")
+    server = ThreadedServer(module.http_app(), free_port()).start()
+    yield module, server
+    server.stop()
+
+
+@pytest.fixture(autouse=True)
+def recorded_agent(mcp_server, monkeypatch):
+    """Record every LLM step and how each agent run ended."""
+    module, _ = mcp_server
+    generate, run_agent = FakeChatModel._agenerate, module.run_agent
+
+    async def recording_generate(self, *args, **kwargs):
+        record("step", "started")
+        try:
+            result = await generate(self, *args, **kwargs)
+        except asyncio.CancelledError:
+            record("step", "cancelled")
+            raise
+        record("step", "finished")
+        return result
+
+    async def recording_run_agent(*args, **kwargs):
+        try:
+            output = await run_agent(*args, **kwargs)
+        except asyncio.CancelledError:
+            record("tool", "cancelled")
+            raise
+        except TimeoutError:
+            record("tool", "deadline")
+            raise
+        record("tool", "ok")
+        return output
+
+    monkeypatch.setattr(FakeChatModel, "_agenerate", recording_generate)
+    monkeypatch.setattr(module, "run_agent", recording_run_agent)
+    monkeypatch.setattr(module.llm, "latency", LLM_LATENCY)
+    events.clear()
+    yield
+
+
+@pytest.fixture
+def api(mcp_server):
+    """A route shaped like main's analyses: one MCP tool call, request scoped."""
+    _, mcp = mcp_server
+    mcp_client = MCPClient(mcp.url + "/mcp", call_timeout=30)
+    statuses = []
+    app = FastAPI()
+
+    @app.post("/verify")
+    async def verify(request: Request, timeout: Optional[float] = None):
+        deadline = request_deadline(request, timeout)
+
+        async def respond():
+            response = await mcp_client.call_tool(
+                "rule_verification", {"rules": "Rule 1", "content": "{}"}, deadline=deadline)
+            return {"isError": response.isError}
+
+        return await run_request_scoped(request, respond, deadline)
+
+    flights = SingleFlight()
+
+    @app.post("/verify-shared")
+    async def verify_shared(request: Request, timeout: Optional[float] = None):
+        deadline = request_deadline(request, timeout)
+
+        async def run_analysis():
+            response = await mcp_client.call_tool(
+                "rule_verification", {"rules": "Rule 1", "content": "{}"})
+            return {"isError": response.isError}
+
+        return await run_request_scoped(
+            request, lambda: flights.do(("verify", "loan-1"), run_analysis), deadline)
+
+    async def record_status(scope, receive, send):
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                statuses.append(message["status"])
+            await send(message)
+        await app(scope, receive, send_with_status)
+
+    server = ThreadedServer(record_status, free_port()).start()
+    yield server, mcp_client, statuses
+    server.stop()
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "condition not met in time"
+        time.sleep(0.02)
+
+
+def assert_no_steps_after(cutoff: float) -> None:
+    # Long enough for a step that survived the cutoff to finish
+    time.sleep(LLM_LATENCY + 0.5)
+    assert of("step", "finished") == []
+    assert [at for at in of("step", "started") if at > cutoff] == []
+
+
+def test_completes_within_budget(api):
+    server, _, statuses = api
+    response = httpx.post(f"{server.url}/verify", timeout=10)
+    assert response.status_code == 200
+    assert response.json() == {"isError": False}
+    assert len(of("step", "finished")) == 1
+    assert of("tool", "ok")
+
+
+def test_client_disconnect_cancels_the_agent(api):
+    server, mcp_client, statuses = api
+    with pytest.raises(httpx.ReadTimeout):
+        httpx.post(f"{server.url}/verify", timeout=0.4)
+    disconnected = time.monotonic()
+    assert of("step", "started")
+
+    wait_for(lambda: of("tool", "cancelled"))
+    assert statuses == [CLIENT_CLOSED_REQUEST]
+    assert mcp_client.cancelled == 1
+    assert len(of("step", "cancelled")) == 1
+    assert_no_steps_after(disconnected)
+
+
+def test_short_timeout_returns_504_and_stops_the_agent(api):
+    server, _, statuses = api
+    started = time.monotonic()
+    response = httpx.post(f"{server.url}/verify", params={"timeout": 0.4}, timeout=10)
+    cutoff = time.monotonic()
+    assert response.status_code == 504
+    assert response.json() == {"detail": "Request deadline exceeded"}
+    assert cutoff - started < LLM_LATENCY
+
+    # Whichever side notices first (the API's cancellation or the deadline
+    # in _meta), the tool's agent run ends early and its step is cancelled
+    wait_for(lambda: of("tool", "cancelled") or of("tool", "deadline"))
+    assert of("tool", "ok") == []
+    assert len(of("step", "cancelled")) == 1
+    assert_no_steps_after(cutoff)
+
+
+def test_coalesced_callers_keep_their_own_deadlines(api):
+    server, _, statuses = api
+    with ThreadPoolExecutor(2) as pool:
+        impatient = pool.submit(
+            httpx.post, f"{server.url}/verify-shared", params={"timeout": 0.4}, timeout=10)
+        wait_for(lambda: of("step", "started"))
+        patient = pool.submit(
+            httpx.post, f"{server.url}/verify-shared", params={"timeout": 10}, timeout=10)
+
+        assert impatient.result().status_code == 504
+        # The first caller's deadline neither cuts the shared run short...
+        response = patient.result()
+    assert response.status_code == 200
+    assert response.json() == {"isError": False}
+
+    # ...nor starts a second one
+    assert len(of("step", "started")) == 1
+    assert len(of("step", "finished")) == 1
+    assert of("tool", "ok")
+    assert sorted(statuses) == [200, 504]
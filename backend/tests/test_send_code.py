@@ -0,0 +1,82 @@
+"""
+verify_otp_code checks and records each attempt in one atomic
+find_one_and_update; concurrent submissions must not break its invariants.
+"""
+import asyncio
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from app.models.user import VerifyCodeRequest
+from app.services import send_code
+from app.services.send_code import MAX_ATTEMPTS, VERIFY_ERRORS
+
+pytestmark = pytest.mark.anyio
+
+EMAIL, CODE = "user@example.com", "123456"
+CONCURRENCY = 50
+
+
+@pytest.fixture
+async def codes(mongo, monkeypatch):
+    monkeypatch.setattr(send_code, "get_db", lambda: mongo)
+    await send_code._upsert_code_record(EMAIL, CODE)
+    return mongo["verification_codes"]
+
+
+async def verify_all(codes: list) -> Counter:
+    async def one(code):
+        try:
+            await send_code.verify_otp_code(VerifyCodeRequest(email=EMAIL, code=code))
+            return "verified"
+        except HTTPException as e:
+            return e.detail
+
+    return Counter(await asyncio.gather(*(one(code) for code in codes)))
+
+
+async def test_concurrent_right_codes_verify_exactly_once(codes):
+    assert await verify_all([CODE] * CONCURRENCY) == Counter(
+        {"verified": 1, VERIFY_ERRORS["used"]: CONCURRENCY - 1})
+
+
+async def test_wrong_guesses_are_counted_exactly_and_capped(codes):
+    counts = await verify_all(["000000"] * CONCURRENCY)
+
+    assert counts == Counter({VERIFY_ERRORS["invalid"]: MAX_ATTEMPTS,
+                              VERIFY_ERRORS["locked"]: CONCURRENCY - MAX_ATTEMPTS})
+    assert (await codes.find_one({"email": EMAIL}))["attempts"] == MAX_ATTEMPTS
+    # Locked out: the right code no longer helps
+    assert await verify_all([CODE]) == Counter({VERIFY_ERRORS["locked"]: 1})
+
+
+async def test_right_code_wins_before_the_lockout(codes):
+    await verify_all(["000000"] * (MAX_ATTEMPTS - 1))
+    assert await verify_all([CODE]) == Counter({"verified": 1})
+    assert (await codes.find_one({"email": EMAIL}))["attempts"] == MAX_ATTEMPTS - 1
+
+
+@pytest.mark.parametrize("code", ["$code", "$$ROOT", "$attempts"])
+async def test_field_path_code_is_just_a_wrong_code(codes, code):
+    assert await verify_all([code]) == Counter({VERIFY_ERRORS["invalid"]: 1})
+    assert (await codes.find_one({"email": EMAIL}))["attempts"] == 1
+
+
+async def test_expired_code_is_rejected(codes):
+    await codes.update_one(
+        {"email": EMAIL}, {"$set": {"expiresAt": datetime.utcnow() - timedelta(seconds=1)}})
+    assert await verify_all([CODE] * CONCURRENCY) == Counter({VERIFY_ERRORS["expired"]: CONCURRENCY})
+
+
+async def test_new_code_resets_attempts(codes):
+    await verify_all(["000000"] * MAX_ATTEMPTS)
+    await send_code._upsert_code_record(EMAIL, "654321")
+    assert await verify_all(["654321"]) == Counter({"verified": 1})
+
+
+async def test_unknown_email_has_no_code(codes):
+    with pytest.raises(HTTPException) as error:
+        await send_code.verify_otp_code(VerifyCodeRequest(email="other@example.com", code=CODE))
+    assert error.value.detail == "No verification code found."
@@ -19,7 +19,10 @@ const authApi = {
     signup: (data) => axiosClient.post("/auth/signup", data),
 
     // Admin APIs
-    getAllUsers: () => axiosClient.get("/admin/users"),
+    // One page: { users, next_cursor }. params: { limit, cursor, status, type }
+    getUsersPage: (params) => axiosClient.get("/admin/users", { params }),
+    // { count }. params: { status, type }
+    getUsersCount: (params) => axiosClient.get("/admin/users/count", { params }),
     updateUserStatus: (userId, status) =>
         axiosClient.put(`/admin/users/${userId}/status`, { status }),
     deleteUser: (userId) =>
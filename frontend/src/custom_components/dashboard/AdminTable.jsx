@@ -17,9 +17,20 @@ export default function AdminTable() {
     const [initialLoading, setInitialLoading] = useState(true); // only true on first mount
     const [currentPage, setCurrentPage] = useState(1);
     const [pageSize, setPageSize] = useState(10);
-    const [users, setUsers] = useState([]);
+    const [users, setUsers] = useState([]); // current page only
+    const [totalCount, setTotalCount] = useState(0);
+    // cursors[i] opens page i + 1; pages are reached by following next_cursor
+    const [cursors, setCursors] = useState([null]);
+    const [statusFilter, setStatusFilter] = useState("");
+    const [typeFilter, setTypeFilter] = useState("");
+    const [showFilters, setShowFilters] = useState(false);
     const [actionInProgress, setActionInProgress] = useState(false); // toggles during approve/reject/delete
 
+    // Latest paging/filter state, for handlers the grid captured when it was created
+    const queryRef = useRef({});
+    queryRef.current = { currentPage, cursors, pageSize, statusFilter, typeFilter };
+    const requestSeq = useRef(0);
+
     // Defensive transform: handle missing/invalid input
     const transformUserData = (usersArray) => {
         try {
@@ -86,26 +97,43 @@ export default function AdminTable() {
         }
     };
 
-    // Fetch users from backend
-    // suppressLoader=true -> do not show the initial spinner (used for action refresh)
-    const fetchUsers = async ({ suppressLoader = false } = {}) => {
+    // Fetch one page of users (and the filtered total) from the backend
+    // page/pageCursors default to the current page; filters and page size come from queryRef
+    // suppressLoader=true -> do not show the initial spinner (used for paging and action refresh)
+    const fetchUsers = async ({ page, pageCursors, suppressLoader = false } = {}) => {
+        const query = queryRef.current;
+        const targetPage = page || query.currentPage;
+        const known = pageCursors || query.cursors;
+        const filters = {};
+        if (query.statusFilter) filters.status = query.statusFilter;
+        if (query.typeFilter) filters.type = query.typeFilter;
+        const seq = ++requestSeq.current;
+
         if (!suppressLoader) setInitialLoading(true);
         try {
-            const response = await authApi.getAllUsers();
-            const rawUsers = response && response.users ? response.users : [];
-            const transformedData = transformUserData(rawUsers);
-            setUsers(transformedData);
-
-            // If grid is already initialized, update row data directly so grid doesn't get re-created
-            if (gridApi && typeof gridApi.setRowData === "function") {
-                try {
-                    gridApi.setRowData(transformedData);
-                } catch (innerErr) {
-                    // fallback
-                    console.warn("gridApi.setRowData failed, ignoring", innerErr);
-                }
+            const [pageResponse, countResponse] = await Promise.all([
+                authApi.getUsersPage({ ...filters, limit: query.pageSize, cursor: known[targetPage - 1] || undefined }),
+                authApi.getUsersCount(filters),
+            ]);
+            // A newer page or filter request has been issued meanwhile
+            if (seq !== requestSeq.current) return;
+
+            const rawUsers = pageResponse && pageResponse.users ? pageResponse.users : [];
+            if (rawUsers.length === 0 && targetPage > 1) {
+                // The last user of a trailing page was removed: show the page before it
+                await fetchUsers({ page: targetPage - 1, pageCursors: known, suppressLoader: true });
+                return;
             }
+
+            // Later pages may have shifted; keep cursors up to this page plus its next_cursor
+            const nextCursors = known.slice(0, targetPage);
+            if (pageResponse.next_cursor) nextCursors.push(pageResponse.next_cursor);
+            setCursors(nextCursors);
+            setCurrentPage(targetPage);
+            setTotalCount(countResponse && typeof countResponse.count === "number" ? countResponse.count : rawUsers.length);
+            setUsers(transformUserData(rawUsers));
         } catch (error) {
+            if (seq !== requestSeq.current) return;
             console.error("Error fetching users:", error);
             toast.error("Failed to load users");
             setUsers([]); // safe fallback so component doesn't crash
@@ -260,11 +288,13 @@ export default function AdminTable() {
         } else {
             setIsLoaded(true);
         }
+    }, []);
 
-        // initial fetch (show spinner)
-        fetchUsers({ suppressLoader: false });
+    // First page again whenever the filters or the page size change (spinner only on mount)
+    useEffect(() => {
+        fetchUsers({ page: 1, pageCursors: [null], suppressLoader: !initialLoading });
         // eslint-disable-next-line react-hooks/exhaustive-deps
-    }, []);
+    }, [pageSize, statusFilter, typeFilter]);
 
     const columnDefs = useMemo(
         () => [
@@ -423,9 +453,7 @@ export default function AdminTable() {
                     resizable: true,
                     suppressMenu: true,
                 },
-                pagination: true,
-                paginationPageSize: pageSize,
-                suppressPaginationPanel: true,
+                // Rows are one server page; paging happens in the footer below
                 domLayout: "normal",
                 rowHeight: 48,
                 headerHeight: 48,
@@ -433,9 +461,6 @@ export default function AdminTable() {
                 onGridReady: (params) => {
                     setGridApi(params.api);
                     params.api.sizeColumnsToFit();
-                    params.api.addEventListener("paginationChanged", () => {
-                        setCurrentPage(params.api.paginationGetCurrentPage() + 1);
-                    });
                     // Re-size on window resize
                     window.addEventListener("resize", () => {
                         params.api.sizeColumnsToFit();
@@ -494,7 +519,7 @@ export default function AdminTable() {
             // create the grid once
             window.agGrid.createGrid(gridRef.current, gridOptions);
         }
-    }, [isLoaded, columnDefs, filteredData, gridApi, pageSize, users]);
+    }, [isLoaded, columnDefs, filteredData, gridApi, users]);
 
     // keep grid rows in sync when filteredData changes
     useEffect(() => {
@@ -511,6 +536,21 @@ export default function AdminTable() {
         }
     }, [filteredData, gridApi]);
 
+    const totalPages = Math.max(1, Math.ceil(totalCount / pageSize));
+    // Keyset pagination: a page can be opened once the cursor leading to it is known
+    const canOpenPage = (page) => page >= 1 && page <= totalPages && cursors[page - 1] !== undefined;
+    const goToPage = (page) => {
+        if (page === currentPage || !canOpenPage(page)) return;
+        fetchUsers({ page, suppressLoader: true });
+    };
+    const firstItem = users.length ? (currentPage - 1) * pageSize + 1 : 0;
+    const lastItem = (currentPage - 1) * pageSize + users.length;
+    const filterLabel = [
+        statusFilter && statusFilter.charAt(0).toUpperCase() + statusFilter.slice(1),
+        typeFilter && (typeFilter === "company" ? "Broker Company" : "Broker"),
+    ].filter(Boolean).join(", ") || "All";
+    const filterSelectStyle = { padding: "6px 12px", fontSize: "14px", border: "1px solid #d1d5db", borderRadius: "4px", background: "white", cursor: "pointer", color: "#374151" };
+
     // show spinner only for the initial load
     if (!isLoaded || initialLoading) {
         return (
@@ -527,7 +567,7 @@ export default function AdminTable() {
                 <h2 style={{ fontSize: 24, fontWeight: 700, margin: 0 }} className="custom-font-jura">User Management</h2>
 
                 <span style={{ display: "flex", padding: "4px", width: "60px", justifyContent: "center", alignItems: "center", gap: 8, alignSelf: "stretch", borderRadius: "999px", background: "#E0E0E0" }}>
-                    {filteredData.length}
+                    {totalCount}
                 </span>
 
                 <div style={{ display: "flex", gap: "12px", alignItems: "center" }}>
@@ -536,17 +576,41 @@ export default function AdminTable() {
                         <input placeholder="Search loan, borrower etc." value={searchText} onChange={(e) => setSearchText(e.target.value)} className="custom-font-jura" style={{ width: "100%", border: "none", outline: "none", padding: "10px 14px 10px 42px", borderRadius: 8, fontSize: 15 }} />
                     </div>
 
-                    <button className="custom-font-jura" style={{ background: "white", border: "1px solid #e5e7eb", borderRadius: 8, padding: "10px 16px", cursor: "pointer", display: "flex", alignItems: "center", gap: "8px", fontSize: 15, color: "#303030" }}>
-                        <img src={FilterIcon} alt="Filter" />
-                        Filter
-                    </button>
+                    <div style={{ position: "relative" }}>
+                        <button onClick={() => setShowFilters((open) => !open)} className="custom-font-jura" style={{ background: "white", border: "1px solid #e5e7eb", borderRadius: 8, padding: "10px 16px", cursor: "pointer", display: "flex", alignItems: "center", gap: "8px", fontSize: 15, color: "#303030" }}>
+                            <img src={FilterIcon} alt="Filter" />
+                            Filter
+                        </button>
+
+                        {showFilters && (
+                            <div className="custom-font-jura" style={{ position: "absolute", top: "calc(100% + 8px)", left: 0, zIndex: 10, display: "flex", flexDirection: "column", gap: "12px", padding: "16px", minWidth: 220, background: "white", border: "1px solid #e5e7eb", borderRadius: 8, boxShadow: "0 4px 12px rgba(0,0,0,0.08)" }}>
+                                <label style={{ display: "flex", flexDirection: "column", gap: "4px", fontSize: "14px", color: "#374151" }}>
+                                    Status
+                                    <select value={statusFilter} onChange={(e) => setStatusFilter(e.target.value)} style={filterSelectStyle}>
+                                        <option value="">All</option>
+                                        <option value="pending">Pending</option>
+                                        <option value="active">Active</option>
+                                        <option value="inactive">Inactive</option>
+                                    </select>
+                                </label>
+                                <label style={{ display: "flex", flexDirection: "column", gap: "4px", fontSize: "14px", color: "#374151" }}>
+                                    Company Type
+                                    <select value={typeFilter} onChange={(e) => setTypeFilter(e.target.value)} style={filterSelectStyle}>
+                                        <option value="">All</option>
+                                        <option value="individual">Broker</option>
+                                        <option value="company">Broker Company</option>
+                                    </select>
+                                </label>
+                            </div>
+                        )}
+                    </div>
 
                     <div style={{ width: "1px", height: "24px", background: "#D0D0D0" }} />
                 </div>
 
                 <div style={{ background: "#E0E0E0", justifyContent: "center", borderRadius: "999px", padding: "6px 12px", display: "flex", alignItems: "center", gap: "8px" }}>
-                    <span className="custom-font-jura" style={{ color: "#303030", textAlign: "center", fontSize: "normal", fontWeight: 400, lineHeight: "18px" }}>All</span>
-                    <button className="custom-font-jura" style={{ background: "transparent", border: "none", cursor: "pointer", color: "#9ca3af", fontSize: 16, padding: 0, display: "flex", alignItems: "center" }}>✕</button>
+                    <span className="custom-font-jura" style={{ color: "#303030", textAlign: "center", fontSize: "normal", fontWeight: 400, lineHeight: "18px" }}>{filterLabel}</span>
+                    <button onClick={() => { setStatusFilter(""); setTypeFilter(""); }} disabled={!statusFilter && !typeFilter} title="Clear filters" className="custom-font-jura" style={{ background: "transparent", border: "none", cursor: "pointer", color: "#9ca3af", fontSize: 16, padding: 0, display: "flex", alignItems: "center" }}>✕</button>
                 </div>
             </div>
 
@@ -606,13 +670,8 @@ export default function AdminTable() {
                         <span style={{ fontSize: "14px", color: "#374151", fontWeight: 500 }}>Items per page:</span>
                         <div style={{ position: "relative" }}>
                             <select value={pageSize} onChange={(e) => {
-                                const newSize = Number(e.target.value);
-                                setPageSize(newSize);
-                                setCurrentPage(1);
-                                if (gridApi) {
-                                    gridApi.paginationSetPageSize(newSize);
-                                    gridApi.paginationGoToPage(0);
-                                }
+                                // Refetches the first page (see the filter/page size effect)
+                                setPageSize(Number(e.target.value));
                             }} style={{ appearance: "none", padding: "6px 32px 6px 12px", fontSize: "14px", border: "1px solid #d1d5db", borderRadius: "4px", background: "white", cursor: "pointer", minWidth: "70px", color: "#374151" }}>
                                 <option value={10}>10</option>
                                 <option value={20}>20</option>
@@ -622,14 +681,13 @@ export default function AdminTable() {
                         </div>
 
                         <span style={{ fontSize: "14px", color: "#9ca3af", marginLeft: "8px" }}>
-                            {Math.min((currentPage - 1) * pageSize + 1, filteredData.length)} - {Math.min(currentPage * pageSize, filteredData.length)} of {filteredData.length} items
+                            {firstItem} - {lastItem} of {totalCount} items
                         </span>
                     </div>
 
                     <div style={{ display: "flex", alignItems: "center", gap: "4px" }}>
                         {/* page number buttons */}
                         {(() => {
-                            const totalPages = Math.ceil(filteredData.length / pageSize);
                             const pages = [];
                             pages.push(1);
                             if (currentPage > 3) pages.push("...");
@@ -645,11 +703,9 @@ export default function AdminTable() {
                                 }
                                 const isFirstThree = page <= 3;
                                 const isActive = currentPage === page;
+                                const reachable = canOpenPage(page);
                                 return (
-                                    <button key={page} onClick={() => {
-                                        setCurrentPage(page);
-                                        if (gridApi) gridApi.paginationGoToPage(page - 1);
-                                    }} style={{ minWidth: "36px", height: "36px", padding: "6px 12px", fontSize: "14px", border: "none", borderRadius: "6px", background: isActive ? "#3b82f6" : (isFirstThree ? "#e0f2fe" : "transparent"), color: isActive ? "white" : "#374151", cursor: "pointer", fontWeight: isActive ? 600 : 400, transition: "all 0.2s" }}>
+                                    <button key={page} onClick={() => goToPage(page)} disabled={!reachable && !isActive} style={{ minWidth: "36px", height: "36px", padding: "6px 12px", fontSize: "14px", border: "none", borderRadius: "6px", background: isActive ? "#3b82f6" : (isFirstThree ? "#e0f2fe" : "transparent"), color: isActive ? "white" : (reachable ? "#374151" : "#d1d5db"), cursor: reachable || isActive ? "pointer" : "not-allowed", fontWeight: isActive ? 600 : 400, transition: "all 0.2s" }}>
                                         {page}
                                     </button>
                                 );
@@ -658,22 +714,9 @@ export default function AdminTable() {
 
                         <div style={{ width: "1px", height: "24px", background: "#e5e7eb", margin: "0 8px" }} />
 
-                        <button onClick={() => {
-                            if (currentPage > 1) {
-                                const newPage = currentPage - 1;
-                                setCurrentPage(newPage);
-                                if (gridApi) gridApi.paginationGoToPage(newPage - 1);
-                            }
-                        }} disabled={currentPage === 1} style={{ border: "none", background: "transparent", cursor: currentPage === 1 ? "not-allowed" : "pointer", color: currentPage === 1 ? "#d1d5db" : "#374151", fontSize: "24px", padding: "0 8px", display: "flex", alignItems: "center" }}>‹</button>
-
-                        <button onClick={() => {
-                            const totalPages = Math.ceil(filteredData.length / pageSize);
-                            if (currentPage < totalPages) {
-                                const newPage = currentPage + 1;
-                                setCurrentPage(newPage);
-                                if (gridApi) gridApi.paginationGoToPage(newPage - 1);
-                            }
-                        }} disabled={currentPage === Math.ceil(filteredData.length / pageSize)} style={{ border: "none", background: "transparent", cursor: currentPage === Math.ceil(filteredData.length / pageSize) ? "not-allowed" : "pointer", color: currentPage === Math.ceil(filteredData.length / pageSize) ? "#d1d5db" : "#374151", fontSize: "24px", padding: "0 8px", display: "flex", alignItems: "center" }}>›</button>
+                        <button onClick={() => goToPage(currentPage - 1)} disabled={currentPage === 1} style={{ border: "none", background: "transparent", cursor: currentPage === 1 ? "not-allowed" : "pointer", color: currentPage === 1 ? "#d1d5db" : "#374151", fontSize: "24px", padding: "0 8px", display: "flex", alignItems: "center" }}>‹</button>
+
+                        <button onClick={() => goToPage(currentPage + 1)} disabled={!canOpenPage(currentPage + 1)} style={{ border: "none", background: "transparent", cursor: canOpenPage(currentPage + 1) ? "pointer" : "not-allowed", color: canOpenPage(currentPage + 1) ? "#374151" : "#d1d5db", fontSize: "24px", padding: "0 8px", display: "flex", alignItems: "center" }}>›</button>
                     </div>
                 </div>
             </div>